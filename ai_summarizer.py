@@ -3,35 +3,358 @@ AI Summarization Module for Project Tracker
 Uses Hugging Face transformers for generating project summaries
 """
 
-try:
+from collections import OrderedDict
+from datetime import datetime
+import hashlib
+import importlib.util
+import json
+import os
+import threading
+import time
+
+# Only probe for the libraries here; importing them (and the model) is deferred to load()
+AI_AVAILABLE = all(importlib.util.find_spec(name) is not None for name in ('transformers', 'torch'))
+
+MODEL_NAME = "google/flan-t5-small"
+ONNX_MODEL_DIR = os.environ.get('AI_ONNX_DIR', os.path.join('models', 'flan-t5-small-onnx'))
+
+SUMMARY_INSTRUCTION = (
+    "Summarize the following software project update in 3-4 sentences. "
+    "Highlight overall progress, milestone status, and risk posture in a professional tone."
+)
+GENERATION_KWARGS = {
+    'max_length': 220,
+    'min_length': 80,
+    'do_sample': False,
+}
+
+CONTEXT_TOKEN_BUDGET = int(os.environ.get('AI_CONTEXT_TOKENS', 512))  # flan-t5 input window
+
+def _parse_date(value):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+def _normalize(value):
+    """Upper-case enum-style form of a status/severity, e.g. 'In Progress' -> 'IN_PROGRESS'"""
+    return (value or '').upper().replace(' ', '_')
+
+# Rule analyzer shared by the fallback summary and the recommendations
+def _new_facts(project, now):
+    """Per-project facts before any milestone or risk is counted"""
+    status = project.get('status') or 'Unknown'
+    return {
+        'as_of': now,
+        'name': project.get('name') or 'Unknown Project',
+        'owner': project.get('owner') or 'Unknown',
+        'description': project.get('description'),
+        'status': _normalize(status),
+        'status_label': status.replace('_', ' ').title(),
+        'completion': project.get('completion_percentage') or 0,
+        'start_date': _parse_date(project.get('start_date')),
+        'deadline': _parse_date(project.get('deadline')),
+        'milestones_total': 0,
+        'milestones_completed': 0,
+        'milestones_in_progress': 0,
+        'milestones_pending': 0,
+        'delayed_milestones': 0,
+        'delayed_names': [],
+        'risks_total': 0,
+        'high_open_risks': 0,
+        'open_risks': 0,
+        'open_risk_names': [],
+    }
+
+def _add_milestone(facts, name, status):
+    status = _normalize(status)
+    facts['milestones_total'] += 1
+    if status == 'COMPLETED':
+        facts['milestones_completed'] += 1
+    elif status == 'IN_PROGRESS':
+        facts['milestones_in_progress'] += 1
+    elif status == 'PENDING':
+        facts['milestones_pending'] += 1
+    elif status == 'DELAYED':
+        facts['delayed_milestones'] += 1
+        if len(facts['delayed_names']) < 3:
+            facts['delayed_names'].append(name or 'Unnamed milestone')
+
+def _add_risk(facts, name, severity, status):
+    facts['risks_total'] += 1
+    if _normalize(status) == 'CLOSED':
+        return
+    facts['open_risks'] += 1
+    if _normalize(severity) == 'HIGH':
+        facts['high_open_risks'] += 1
+    if len(facts['open_risk_names']) < 3:
+        facts['open_risk_names'].append(name or 'Unnamed risk')
+
+def analyze_project(project, milestones, risks, now=None):
+    """
+    Compute every fact the rule-based summary needs in one pass over the data
+    
+    Args:
+        project: Project dictionary (as returned by to_dict)
+        milestones: List of milestone dictionaries
+        risks: List of risk dictionaries
+        now: Reference time for deadline checks (defaults to utcnow)
+    
+    Returns:
+        Dictionary of counts, parsed dates and the first delayed/open names
+    """
+    facts = _new_facts(project, now or datetime.utcnow())
+    for milestone in milestones:
+        _add_milestone(facts, milestone.get('name'), milestone.get('status'))
+    for risk in risks:
+        _add_risk(facts, risk.get('name'), risk.get('severity'), risk.get('status', 'Open'))
+    return facts
+
+def analyze_portfolio(session, now=None):
+    """
+    Analyze every project with three column-only queries instead of per-project loads
+    
+    Milestone and risk rows are streamed in (project_id, id) order and folded into
+    the per-project facts in a single sweep.
+    
+    Returns:
+        Dictionary of project id -> facts, ordered by project id
+    """
+    from sqlalchemy import select
+    from models import Project, Milestone, Risk
+    
+    now = now or datetime.utcnow()
+    projects = session.execute(
+        select(
+            Project.id, Project.name, Project.owner, Project.description, Project.status,
+            Project.start_date, Project.deadline, Project.completion_percentage,
+        ).order_by(Project.id)
+    )
+    portfolio = {}
+    for row in projects:
+        project = row._asdict()
+        project['status'] = row.status.value if row.status else None
+        project['start_date'] = row.start_date.isoformat() if row.start_date else None
+        project['deadline'] = row.deadline.isoformat() if row.deadline else None
+        portfolio[row.id] = _new_facts(project, now)
+    
+    milestones = session.execute(
+        select(Milestone.project_id, Milestone.name, Milestone.status)
+        .order_by(Milestone.project_id, Milestone.id)
+        .execution_options(yield_per=1000)
+    )
+    for project_id, name, status in milestones:
+        if project_id in portfolio:
+            _add_milestone(portfolio[project_id], name, status.value if status else None)
+    
+    risks = session.execute(
+        select(Risk.project_id, Risk.name, Risk.severity, Risk.status)
+        .order_by(Risk.project_id, Risk.id)
+        .execution_options(yield_per=1000)
+    )
+    for project_id, name, severity, status in risks:
+        if project_id in portfolio:
+            _add_risk(portfolio[project_id], name, severity.value if severity else None, status)
+    
+    return portfolio
+
+# Inference backends
+#
+# Each loader returns a transformers summarization pipeline (callable on a string or
+# a list of strings, with a .tokenizer), so ProjectSummarizer is backend-agnostic.
+
+def _load_pipeline_backend(model_name):
+    """Reference fp32 PyTorch pipeline"""
     from transformers import pipeline
+    
+    return pipeline("summarization", model=model_name, tokenizer=model_name, device=-1)
+
+def _load_quantized_backend(model_name):
+    """PyTorch model with Linear layers dynamically quantized to int8 for CPU inference"""
     import torch
-    AI_AVAILABLE = True
-except ImportError:
-    AI_AVAILABLE = False
-    print("Warning: Transformers library not available. AI features will be disabled.")
+    from transformers import AutoModelForSeq2SeqLM, AutoTokenizer, pipeline
+    
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
+    model.eval()
+    quantized = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return pipeline("summarization", model=quantized, tokenizer=tokenizer, device=-1)
+
+def _load_onnx_backend(model_name):
+    """ONNX Runtime export of the model (requires `optimum[onnxruntime]`), exported once to AI_ONNX_DIR"""
+    from optimum.onnxruntime import ORTModelForSeq2SeqLM
+    from transformers import AutoTokenizer, pipeline
+    
+    if os.path.isdir(ONNX_MODEL_DIR):
+        model = ORTModelForSeq2SeqLM.from_pretrained(ONNX_MODEL_DIR)
+        tokenizer = AutoTokenizer.from_pretrained(ONNX_MODEL_DIR)
+    else:
+        model = ORTModelForSeq2SeqLM.from_pretrained(model_name, export=True)
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model.save_pretrained(ONNX_MODEL_DIR)
+        tokenizer.save_pretrained(ONNX_MODEL_DIR)
+    return pipeline("summarization", model=model, tokenizer=tokenizer, device=-1)
+
+BACKENDS = {
+    'pipeline': _load_pipeline_backend,
+    'quantized': _load_quantized_backend,
+    'onnx': _load_onnx_backend,
+}
+
+class SummaryCache:
+    """
+    LRU cache of generated summaries keyed by a hash of the summarizer inputs
+    
+    Edits change the project/milestone/risk dicts (including their updated_at),
+    so stale entries are never hit. With `persistent=True` entries are also kept
+    in the `ai_summaries` table so they survive restarts and are shared by workers.
+    """
+    
+    def __init__(self, maxsize=256, persistent=False):
+        self.maxsize = maxsize
+        self.persistent = persistent
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def make_key(project_data, milestones_data, risks_data, mode):
+        """Hash the inputs together with the summary mode and the current date"""
+        payload = {
+            'project': project_data,
+            'milestones': milestones_data,
+            'risks': risks_data,
+            'mode': mode,
+            # Day counts and deadline recommendations depend on today's date
+            'date': datetime.utcnow().date().isoformat(),
+        }
+        encoded = json.dumps(payload, sort_keys=True, default=str).encode('utf-8')
+        return hashlib.sha256(encoded).hexdigest()
+    
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        
+        if not self.persistent:
+            return None
+        summary = self._load(key)
+        if summary is not None:
+            self._remember(key, summary)
+        return summary
+    
+    def set(self, key, summary, project_id=None):
+        self._remember(key, summary)
+        if self.persistent:
+            self._store(key, summary, project_id)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def _remember(self, key, summary):
+        with self._lock:
+            self._entries[key] = summary
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+    
+    def _load(self, key):
+        from db import Session
+        from models import AISummary
+        
+        session = Session()
+        try:
+            entry = session.get(AISummary, key)
+            return entry.summary if entry else None
+        except Exception as e:
+            print(f"Warning: Could not read summary cache: {e}")
+            return None
+        finally:
+            session.close()
+    
+    def _store(self, key, summary, project_id):
+        from db import Session
+        from models import AISummary
+        
+        session = Session()
+        try:
+            session.merge(AISummary(content_hash=key, project_id=project_id, summary=summary))
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            print(f"Warning: Could not persist summary cache entry: {e}")
+        finally:
+            session.close()
 
 class ProjectSummarizer:
     """Generates AI-powered summaries for projects"""
     
-    def __init__(self):
+    def __init__(self, cache=None, backend=None):
         self.summarizer = None
         self.initialized = False
+        self.cache = cache if cache is not None else SummaryCache(
+            maxsize=int(os.environ.get('AI_SUMMARY_CACHE_SIZE', 256)),
+            persistent=os.environ.get('AI_SUMMARY_CACHE_PERSIST', '').lower() in ('1', 'true', 'yes'),
+        )
         
-        if AI_AVAILABLE:
+        self.model_name = MODEL_NAME
+        self.backend = backend or os.environ.get('AI_BACKEND', 'pipeline')
+        self.load_error = None
+        self._load_lock = threading.Lock()  # Held for the whole model load
+        self._warm_lock = threading.Lock()  # Guards starting the warm-up thread only
+        self._load_thread = None
+    
+    def load(self):
+        """Load the summarization pipeline in the calling thread (no-op once loaded)"""
+        with self._load_lock:
+            if self.initialized or self.load_error:
+                return self.initialized
+            
+            if not AI_AVAILABLE:
+                self.load_error = "Transformers library not available"
+                print("Warning: Transformers library not available. AI features will be disabled.")
+                return False
+            
+            if self.backend not in BACKENDS:
+                self.load_error = f"Unknown AI backend '{self.backend}' (expected one of {', '.join(BACKENDS)})"
+                print(f"Warning: {self.load_error}")
+                return False
+            
             try:
                 # Use a lighter-weight summarization model to reduce download size
-                model_name = "google/flan-t5-small"
-                self.summarizer = pipeline(
-                    "summarization",
-                    model=model_name,
-                    tokenizer=model_name,
-                    device=-1,
-                )
+                self.summarizer = BACKENDS[self.backend](self.model_name)
                 self.initialized = True
             except Exception as e:
                 print(f"Warning: Could not initialize AI summarizer: {e}")
+                self.load_error = str(e)
                 self.initialized = False
+            return self.initialized
+    
+    def warm_up(self):
+        """Start loading the model in a background thread; returns immediately"""
+        with self._warm_lock:
+            if self.initialized or self.load_error or self._load_thread is not None:
+                return
+            self._load_thread = threading.Thread(target=self.load, name='summarizer-warm-up', daemon=True)
+            self._load_thread.start()
+    
+    @property
+    def loading(self):
+        return self._load_thread is not None and self._load_thread.is_alive()
+    
+    def status(self):
+        """Readiness information for the /api/ai/status endpoint"""
+        return {
+            'available': AI_AVAILABLE,
+            'ready': self.initialized,
+            'loading': self.loading,
+            'model': self.model_name,
+            'backend': self.backend,
+            'error': self.load_error,
+        }
     
     def generate_summary(self, project_data, milestones_data, risks_data):
         """
@@ -43,106 +366,302 @@ class ProjectSummarizer:
             risks_data: List of risk dictionaries
         
         Returns:
-            String containing the generated summary
+            String containing the generated summary; the rule-based summary is
+            served while the model is still loading in the background
         """
-        recommendations = self._generate_recommendations(project_data, milestones_data, risks_data)
-
         if not self.initialized:
-            body = self._generate_basic_body(project_data, milestones_data, risks_data)
-            return self._format_output(body, recommendations)
+            self.warm_up()
         
-        # Build context text
-        context = self._build_context(project_data, milestones_data, risks_data)
+        mode = f'ai:{self.backend}' if self.initialized else 'basic'
+        key = self.cache.make_key(project_data, milestones_data, risks_data, mode)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        
+        summary, cacheable = self._generate_summary(project_data, milestones_data, risks_data)
+        if cacheable:
+            self.cache.set(key, summary, project_id=project_data.get('id'))
+        return summary
+    
+    def _generate_summary(self, project_data, milestones_data, risks_data):
+        """
+        Run the model (or the rule-based fallback) without consulting the cache
+        
+        Returns:
+            Tuple of (summary, cacheable); fallbacks caused by model errors are not cached
+        """
+        facts = analyze_project(project_data, milestones_data, risks_data)
+        recommendations = self._generate_recommendations(project_data, milestones_data, risks_data, facts=facts)
 
+        if not self.initialized:
+            body = self._generate_basic_body(project_data, milestones_data, risks_data, facts=facts)
+            return self._format_output(body, recommendations), True
+        
         try:
             # Generate summary using AI model
-            instruction = (
-                "Summarize the following software project update in 3-4 sentences. "
-                "Highlight overall progress, milestone status, and risk posture in a professional tone."
-            )
-            input_text = f"{instruction}\n\n{context}"
             summary = self.summarizer(
-                input_text,
-                max_length=220,
-                min_length=80,
-                do_sample=False
+                self._model_input(project_data, milestones_data, risks_data),
+                **GENERATION_KWARGS
             )
             summary_text = summary[0]['summary_text'].strip()
         except Exception as e:
             print(f"Error generating AI summary: {e}")
-            summary_text = self._generate_basic_body(project_data, milestones_data, risks_data)
+            summary_text = self._generate_basic_body(project_data, milestones_data, risks_data, facts=facts)
+            return self._format_output(summary_text, recommendations), False
 
-        return self._format_output(summary_text, recommendations)
+        return self._format_output(summary_text, recommendations), True
     
-    def _build_context(self, project, milestones, risks):
-        """Build context text from project data"""
-        context_parts = []
+    def generate_summaries(self, batch, batch_size=8):
+        """
+        Generate summaries for many projects, running the model in padded batches
         
-        # Project information
-        context_parts.append(f"Project Name: {project.get('name', 'Unknown')}")
-        context_parts.append(f"Owner: {project.get('owner', 'Unknown')}")
-        context_parts.append(f"Status: {project.get('status', 'Unknown')}")
-        context_parts.append(f"Completion Percentage: {project.get('completion_percentage', 0)}%")
+        Inputs are sorted by token length and grouped so each padded batch holds
+        similarly sized texts. Cached projects are answered without the model, and
+        any item whose batch fails is retried alone, then falls back to the
+        rule-based summary.
+        
+        Args:
+            batch: Iterable of (project_data, milestones_data, risks_data) tuples
+            batch_size: Number of inputs per model call
+        
+        Returns:
+            Dictionary with 'results' (per-item project_id, summary, source and
+            latency_ms, in input order) and 'stats' (counts, total seconds and
+            items per second)
+        """
+        started = time.perf_counter()
+        items = list(batch)
+        results = [None] * len(items)
+        
+        if not self.initialized:
+            self.warm_up()
+        mode = f'ai:{self.backend}' if self.initialized else 'basic'
+        
+        pending = []
+        for index, (project_data, milestones_data, risks_data) in enumerate(items):
+            item_started = time.perf_counter()
+            key = self.cache.make_key(project_data, milestones_data, risks_data, mode)
+            cached = self.cache.get(key)
+            if cached is not None:
+                results[index] = self._batch_result(project_data, cached, 'cache', item_started)
+            elif mode == 'basic':
+                summary, _ = self._generate_summary(project_data, milestones_data, risks_data)
+                self.cache.set(key, summary, project_id=project_data.get('id'))
+                results[index] = self._batch_result(project_data, summary, 'basic', item_started)
+            else:
+                pending.append((index, key, self._model_input(project_data, milestones_data, risks_data)))
+        
+        if pending:
+            # Length-bucketing: sort by token count so each batch pads to a similar length
+            lengths = self._token_lengths([text for _, _, text in pending])
+            pending = [item for _, item in sorted(zip(lengths, pending), key=lambda pair: pair[0])]
+            
+            for start in range(0, len(pending), batch_size):
+                chunk = pending[start:start + batch_size]
+                chunk_started = time.perf_counter()
+                try:
+                    outputs = self.summarizer(
+                        [text for _, _, text in chunk],
+                        batch_size=len(chunk),
+                        truncation=True,
+                        **GENERATION_KWARGS
+                    )
+                    texts = [output['summary_text'].strip() for output in outputs]
+                except Exception as e:
+                    print(f"Error generating AI summaries for batch: {e}")
+                    texts = [None] * len(chunk)
+                # Latency of a batched call is shared by its items
+                share = (time.perf_counter() - chunk_started) / len(chunk)
+                
+                for (index, key, text), summary_text in zip(chunk, texts):
+                    project_data, milestones_data, risks_data = items[index]
+                    item_started = time.perf_counter() - share
+                    if summary_text is None:
+                        summary, cacheable = self._generate_summary(project_data, milestones_data, risks_data)
+                        source = 'ai' if cacheable else 'fallback'
+                    else:
+                        recommendations = self._generate_recommendations(project_data, milestones_data, risks_data)
+                        summary, cacheable, source = self._format_output(summary_text, recommendations), True, 'ai'
+                    if cacheable:
+                        self.cache.set(key, summary, project_id=project_data.get('id'))
+                    results[index] = self._batch_result(project_data, summary, source, item_started)
         
+        elapsed = time.perf_counter() - started
+        sources = {}
+        for result in results:
+            sources[result['source']] = sources.get(result['source'], 0) + 1
+        return {
+            'results': results,
+            'stats': {
+                'items': len(results),
+                'sources': sources,
+                'batch_size': batch_size,
+                'total_seconds': round(elapsed, 3),
+                'items_per_second': round(len(results) / elapsed, 2) if elapsed > 0 else None,
+            }
+        }
+    
+    def _batch_result(self, project_data, summary, source, started):
+        return {
+            'project_id': project_data.get('id'),
+            'summary': summary,
+            'source': source,
+            'latency_ms': round((time.perf_counter() - started) * 1000, 2),
+        }
+    
+    def _token_lengths(self, texts):
+        """Token counts used to bucket inputs by length (characters if no tokenizer)"""
+        tokenizer = getattr(self.summarizer, 'tokenizer', None)
+        if tokenizer is None:
+            return [len(text) for text in texts]
+        return [len(ids) for ids in tokenizer(texts, truncation=False)['input_ids']]
+    
+    def _model_input(self, project_data, milestones_data, risks_data):
+        """Instruction plus project context packed into the model's token budget"""
+        # +1 for the end-of-sequence token the tokenizer appends
+        budget = CONTEXT_TOKEN_BUDGET - self._count_tokens([SUMMARY_INSTRUCTION])[0] - 1
+        context = self._build_context(project_data, milestones_data, risks_data, budget=budget)
+        return f"{SUMMARY_INSTRUCTION}\n\n{context}"
+    
+    def _count_tokens(self, lines):
+        """Token count of each line, measured with the model tokenizer when it is loaded"""
+        tokenizer = getattr(self.summarizer, 'tokenizer', None)
+        if tokenizer is None or not lines:
+            # Rough estimate for English text with the T5 vocabulary
+            return [max(1, len(line) // 4) for line in lines]
+        return [len(ids) for ids in tokenizer(lines, add_special_tokens=False)['input_ids']]
+    
+    def _build_context(self, project, milestones, risks, budget=None):
+        """
+        Build context text from project data, most informative facts first
+        
+        Candidate lines are grouped by priority: project header, aggregate counts,
+        delayed/overdue milestones, open high risks, the description, other open
+        risks, upcoming milestones and finally completed milestones. Groups are
+        packed in that order until `budget` tokens are used, so the model sees the
+        facts that matter instead of a truncated milestone list.
+        """
+        now = datetime.utcnow()
+        
+        # Project information
+        header = [
+            f"Project Name: {project.get('name', 'Unknown')}",
+            f"Owner: {project.get('owner', 'Unknown')}",
+            f"Status: {project.get('status', 'Unknown')}",
+            f"Completion Percentage: {project.get('completion_percentage', 0)}%",
+        ]
         if project.get('start_date'):
-            context_parts.append(f"Start Date: {project.get('start_date')}")
+            header.append(f"Start Date: {project.get('start_date')}")
         if project.get('deadline'):
-            context_parts.append(f"Deadline: {project.get('deadline')}")
-        if project.get('description'):
-            context_parts.append(f"Project Description: {project['description']}")
+            deadline_line = f"Deadline: {project.get('deadline')}"
+            deadline_dt = _parse_date(project.get('deadline'))
+            if deadline_dt and _normalize(project.get('status')) != 'COMPLETED':
+                if deadline_dt < now:
+                    deadline_line += f" (overdue by {(now - deadline_dt).days} days)"
+                else:
+                    deadline_line += f" ({(deadline_dt - now).days} days remaining)"
+            header.append(deadline_line)
         
         # Milestones
-        if milestones:
-            context_parts.append(f"Milestones ({len(milestones)} total):")
-            for milestone in milestones:
-                status = milestone.get('status', 'Unknown')
-                name = milestone.get('name', 'Unknown')
-                target_date = milestone.get('target_date')
-                milestone_line = f"- {name} ({status}"
-                if target_date:
-                    milestone_line += f", target {target_date}"
-                milestone_line += ")"
-                context_parts.append(milestone_line)
+        counts = {}
+        delayed, upcoming, completed = [], [], []
+        for milestone in milestones:
+            status = _normalize(milestone.get('status'))
+            counts[status] = counts.get(status, 0) + 1
+            target_dt = _parse_date(milestone.get('target_date'))
+            if status == 'COMPLETED':
+                completed.append((_parse_date(milestone.get('completion_date')) or target_dt or datetime.min, milestone))
+            elif status == 'DELAYED' or (target_dt and target_dt < now):
+                delayed.append((target_dt or datetime.min, milestone))
+            else:
+                upcoming.append((target_dt or datetime.max, milestone))
+        
+        def milestone_line(milestone):
+            line = f"- {milestone.get('name', 'Unknown')} ({milestone.get('status', 'Unknown')}"
+            if milestone.get('target_date'):
+                line += f", target {milestone.get('target_date')}"
+            return line + ")"
         
         # Risks
+        high_open, other_open = [], []
+        for risk in risks:
+            if _normalize(risk.get('status', 'Open')) == 'CLOSED':
+                continue
+            (high_open if _normalize(risk.get('severity')) == 'HIGH' else other_open).append(risk)
+        
+        def risk_line(risk):
+            return (
+                f"- {risk.get('name', 'Unknown')} "
+                f"(severity {risk.get('severity')}, status {risk.get('status', 'Unknown')}) "
+                f"{risk.get('description', '') or ''}"
+            ).rstrip()
+        
+        aggregates = []
+        if milestones:
+            aggregates.append(
+                f"Milestones ({len(milestones)} total): {counts.get('COMPLETED', 0)} completed, "
+                f"{counts.get('IN_PROGRESS', 0)} in progress, {counts.get('PENDING', 0)} pending, "
+                f"{len(delayed)} delayed or overdue."
+            )
         if risks:
-            high_risks = [r for r in risks if r.get('severity') == 'HIGH']
-            context_parts.append(f"Risks ({len(risks)} total, {len(high_risks)} high severity):")
-            for risk in risks[:3]:  # Include up to top 3 risks
-                context_parts.append(
-                    f"- {risk.get('name', 'Unknown')} "
-                    f"(severity {risk.get('severity')}, status {risk.get('status', 'Unknown')}) "
-                    f"{risk.get('description', '')}"
-                )
-        
-        return "\n".join(context_parts)
-    
-    def _generate_basic_body(self, project, milestones, risks):
-        """Generate a structured summary without using AI"""
-        from datetime import datetime
+            aggregates.append(
+                f"Risks ({len(risks)} total, {len(high_open)} open high severity, "
+                f"{len(high_open) + len(other_open)} open)."
+            )
         
-        def parse_date(value):
-            if not value:
-                return None
-            try:
-                return datetime.fromisoformat(value)
-            except ValueError:
-                return None
+        groups = [
+            (None, header),
+            (None, aggregates),
+            ("Delayed or overdue milestones:", [milestone_line(m) for _, m in sorted(delayed, key=lambda item: item[0])]),
+            ("Open high-severity risks:", [risk_line(r) for r in high_open]),
+            (None, [f"Project Description: {project['description']}"] if project.get('description') else []),
+            ("Other open risks:", [risk_line(r) for r in other_open]),
+            ("Upcoming milestones:", [milestone_line(m) for _, m in sorted(upcoming, key=lambda item: item[0])]),
+            ("Completed milestones:", [milestone_line(m) for _, m in sorted(completed, key=lambda item: item[0], reverse=True)]),
+        ]
+        
+        if budget is None:
+            lines = []
+            for title, items in groups:
+                if items:
+                    lines.extend(([title] if title else []) + items)
+            return "\n".join(lines)
+        
+        # Measure every candidate line with one tokenizer call, then pack greedily
+        candidates = [line for title, items in groups for line in ([title] if title else []) + items]
+        costs = dict(zip(candidates, self._count_tokens(candidates)))
+        
+        lines = []
+        remaining = budget
+        for title, items in groups:
+            section = []
+            title_cost = costs[title] if title else 0
+            for line in items:
+                cost = costs[line] + (title_cost if not section else 0)
+                if cost > remaining:
+                    break
+                section.append(line)
+                remaining -= cost
+            if section:
+                lines.extend(([title] if title else []) + section)
+        
+        return "\n".join(lines)
+    
+    def _generate_basic_body(self, project, milestones, risks, facts=None):
+        """Generate a structured summary without using AI"""
+        facts = facts or analyze_project(project, milestones, risks)
         
         def format_date(value):
             return value.strftime('%Y-%m-%d') if value else None
         
-        now = datetime.utcnow()
         paragraphs = []
         
-        name = project.get('name', 'Unknown Project')
-        status = (project.get('status', 'Unknown') or 'Unknown').replace('_', ' ').title()
-        completion = project.get('completion_percentage', 0)
-        owner = project.get('owner', 'Unknown')
-        description = project.get('description')
-        
-        start_dt = parse_date(project.get('start_date'))
-        deadline_dt = parse_date(project.get('deadline'))
+        name = facts['name']
+        status = facts['status_label']
+        completion = facts['completion']
+        start_dt = facts['start_date']
+        deadline_dt = facts['deadline']
+        now = facts['as_of']
         
         timeline_parts = []
         if start_dt:
@@ -150,11 +669,11 @@ class ProjectSummarizer:
         if deadline_dt:
             timeline_parts.append(f"targeting a deadline of {format_date(deadline_dt)}")
         
-        sentence = f"{name} led by {owner} is currently {status.lower()} at {completion:.0f}% completion."
+        sentence = f"{name} led by {facts['owner']} is currently {status.lower()} at {completion:.0f}% completion."
         if timeline_parts:
             sentence += " It " + " and ".join(timeline_parts) + "."
         
-        if deadline_dt and status.lower() != "completed":
+        if deadline_dt and facts['status'] != 'COMPLETED':
             if deadline_dt < now:
                 overdue_days = (now - deadline_dt).days
                 sentence += f" The project is overdue by {overdue_days} day(s)."
@@ -162,47 +681,31 @@ class ProjectSummarizer:
                 remaining_days = (deadline_dt - now).days
                 sentence += f" There are {remaining_days} day(s) remaining until the deadline."
         
-        if description:
-            sentence += f" The team is focused on {description}."
+        if facts['description']:
+            sentence += f" The team is focused on {facts['description']}."
         
         paragraphs.append(sentence)
         
-        if milestones:
-            total = len(milestones)
-            completed = sum(1 for m in milestones if m.get('status') == 'COMPLETED')
-            in_progress = sum(1 for m in milestones if m.get('status') == 'IN_PROGRESS')
-            pending = sum(1 for m in milestones if m.get('status') == 'PENDING')
-            delayed = [m for m in milestones if m.get('status') == 'DELAYED']
-            
+        if facts['milestones_total']:
             milestone_sentence = (
-                f"{completed} of {total} milestones are complete, "
-                f"{in_progress} in progress, and {pending} pending."
+                f"{facts['milestones_completed']} of {facts['milestones_total']} milestones are complete, "
+                f"{facts['milestones_in_progress']} in progress, and {facts['milestones_pending']} pending."
             )
-            if delayed:
-                names = ", ".join(m.get('name', 'Unnamed milestone') for m in delayed[:3])
+            if facts['delayed_milestones']:
+                names = ", ".join(facts['delayed_names'])
                 milestone_sentence += f" Attention is needed on delayed milestone(s): {names}."
             paragraphs.append(milestone_sentence)
         else:
             paragraphs.append("No milestones have been defined yet.")
         
-        if risks:
-            def is_high(risk):
-                severity = (risk.get('severity', '') or '').upper()
-                status = (risk.get('status', '') or '').upper()
-                return severity == 'HIGH' and status != 'CLOSED'
-            
-            def is_open(risk):
-                status = (risk.get('status', '') or '').upper()
-                return status != 'CLOSED'
-            
-            high_risks = [r for r in risks if is_high(r)]
-            open_risks = [r for r in risks if is_open(r)]
+        if facts['risks_total']:
+            high_risks = facts['high_open_risks']
             risk_sentence = (
-                f"There are {len(risks)} logged risks"
-                f"{' with ' + str(len(high_risks)) + ' high severity item(s)' if high_risks else ''}."
+                f"There are {facts['risks_total']} logged risks"
+                f"{' with ' + str(high_risks) + ' high severity item(s)' if high_risks else ''}."
             )
-            if open_risks:
-                top_risk_names = ", ".join(r.get('name', 'Unnamed risk') for r in open_risks[:3])
+            if facts['open_risks']:
+                top_risk_names = ", ".join(facts['open_risk_names'])
                 risk_sentence += f" Active risks include: {top_risk_names}."
             paragraphs.append(risk_sentence)
         else:
@@ -210,55 +713,56 @@ class ProjectSummarizer:
         
         return "\n\n".join(paragraphs)
 
-    def _generate_recommendations(self, project, milestones, risks):
-        from datetime import datetime
-        
-        def parse_date(value):
-            if not value:
-                return None
-            try:
-                return datetime.fromisoformat(value)
-            except ValueError:
-                return None
+    def _generate_recommendations(self, project, milestones, risks, facts=None):
+        facts = facts or analyze_project(project, milestones, risks)
         
         recommendations = []
-        completion = project.get('completion_percentage', 0) or 0
-        status = (project.get('status', '') or '').upper()
-        deadline_dt = parse_date(project.get('deadline'))
-        now = datetime.utcnow()
+        status = facts['status']
         
-        if deadline_dt and status != 'COMPLETED':
-            days_to_deadline = (deadline_dt - now).days
+        if facts['deadline'] and status != 'COMPLETED':
+            days_to_deadline = (facts['deadline'] - facts['as_of']).days
             if days_to_deadline < 0:
                 recommendations.append("Escalate the overdue timeline and realign deliverables with stakeholders.")
             elif days_to_deadline <= 14:
                 recommendations.append("Hold a schedule review to ensure remaining scope fits the upcoming deadline.")
         
-        if completion < 50 and status not in ('NOT_STARTED', 'COMPLETED'):
+        if facts['completion'] < 50 and status not in ('NOT_STARTED', 'COMPLETED'):
             recommendations.append("Accelerate execution—completion is below 50%, so consider rebalancing resources.")
         
-        delayed_milestones = [m for m in milestones if m.get('status') == 'DELAYED']
-        if delayed_milestones:
-            names = ", ".join(m.get('name', 'Unnamed milestone') for m in delayed_milestones[:3])
+        if facts['delayed_milestones']:
+            names = ", ".join(facts['delayed_names'])
             recommendations.append(f"Resolve blockers for delayed milestone(s): {names}.")
         
-        high_risks = [
-            r for r in risks
-            if (r.get('severity', '') or '').upper() == 'HIGH'
-            and (r.get('status', '') or '').upper() != 'CLOSED'
-        ]
-        if high_risks:
+        if facts['high_open_risks']:
             recommendations.append("Address high-severity risks immediately and update mitigation plans.")
         
-        open_risks = [
-            r for r in risks
-            if (r.get('status', 'Open') or 'Open').upper() != 'CLOSED'
-        ]
-        if not recommendations and not open_risks:
+        if not recommendations and not facts['open_risks']:
             recommendations.append("Maintain current pace and continue regular status reviews.")
         
         return recommendations
 
+    def portfolio_report(self, session, now=None):
+        """
+        Rule-based summary of every project, built from a single analyzer sweep
+        
+        Args:
+            session: Database session
+            now: Reference time for deadline checks (defaults to utcnow)
+        
+        Returns:
+            List of dictionaries with project_id, summary and recommendations
+        """
+        report = []
+        for project_id, facts in analyze_portfolio(session, now=now).items():
+            recommendations = self._generate_recommendations(None, None, None, facts=facts)
+            body = self._generate_basic_body(None, None, None, facts=facts)
+            report.append({
+                'project_id': project_id,
+                'summary': self._format_output(body, recommendations),
+                'recommendations': recommendations,
+            })
+        return report
+
     def _format_output(self, body, recommendations):
         body = body.strip()
         if not recommendations:
@@ -267,7 +771,7 @@ class ProjectSummarizer:
         recommendation_lines = "\n".join(f"- {item}" for item in recommendations)
         return f"{body}\n\nRecommendations:\n{recommendation_lines}"
 
-# Global instance
+# Global instance (cheap to create; the model loads on first use or via warm_up())
 summarizer = ProjectSummarizer()
 
 
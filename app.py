@@ -1,33 +1,70 @@
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, Response, render_template, request, jsonify
 from flask_cors import CORS
-from sqlalchemy import create_engine, func
-from sqlalchemy.orm import sessionmaker
-from models import Base, Project, Milestone, Risk, ProjectStatus, MilestoneStatus, RiskSeverity
+from sqlalchemy import func, case, and_, or_, not_, select, insert, update, delete
+from sqlalchemy.orm import selectinload
+from models import Project, Milestone, Risk, ProjectStatus, MilestoneStatus, RiskSeverity
+from kpi_engine import read_kpis, recalculate_completion, record_bulk_changes
+from jira_csv_export import iter_jira_csv
+from db import Session, init_db
+from data_version import GLOBAL, TRACKED_TABLES, data_versions
+from events import change_events, format_sse
+from summary_worker import QueueFullError, worker_pool
 from datetime import datetime, timedelta
+import base64
 import csv
+import functools
+import hashlib
 import io
+import json
+import multiprocessing
 import os
+import sys
+import time
 
 app = Flask(__name__)
 CORS(app)
 
-# Database setup
-engine = create_engine('sqlite:///projecttracker.db', echo=False)
-Base.metadata.create_all(engine)
-Session = sessionmaker(bind=engine)
+# Database setup (engine, pooling and KPI snapshot tracking live in db.py)
+init_db()
 
 # Helper function to get session
 def get_session():
     return Session()
 
-# Helper function to calculate project completion
-def calculate_completion(project, session):
-    milestones = session.query(Milestone).filter_by(project_id=project.id).all()
-    if not milestones:
-        return project.completion_percentage
-    
-    completed = sum(1 for m in milestones if m.status == MilestoneStatus.COMPLETED)
-    return (completed / len(milestones)) * 100 if milestones else 0
+# Conditional GET: ETags come from the data version counters (see data_version.py)
+ETAG_CLOCK_SECONDS = int(os.getenv('ETAG_CLOCK_SECONDS', '300'))
+
+def conditional_get(*tables, clock=False):
+    """
+    Give a GET endpoint a strong ETag derived from the data versions of `tables`
+
+    A request whose If-None-Match matches gets 304 before the view runs, so an
+    unchanged poll costs neither a query nor serialization. With `clock` (True,
+    or a predicate over the query arguments), the ETag also changes every
+    ETAG_CLOCK_SECONDS, for payloads that move with the time of day (average
+    delay, days overdue).
+    """
+    def decorate(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            # Read before the view: a racing write yields an older ETag on newer data, which the next poll re-fetches
+            versions = data_versions.get(Session)
+            parts = [request.full_path] + [f'{table}:{versions[table]}' for table in tables]
+            if clock is True or (callable(clock) and clock(request.args)):
+                parts.append(str(int(time.time()) // ETAG_CLOCK_SECONDS))
+            etag = hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()
+            
+            if request.if_none_match.contains(etag):
+                response = Response(status=304)
+            else:
+                response = app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.cache_control.no_cache = True  # Always revalidate
+            return response
+        return wrapper
+    return decorate
 
 # Routes
 @app.route('/')
@@ -43,12 +80,95 @@ def projects_page():
     return render_template('projects.html')
 
 # API Routes - Projects
+PROJECTS_PAGE_SIZE = 50
+PROJECTS_MAX_PAGE_SIZE = 500
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor, order):
+    """Decode a next_cursor token for `order`; raises ValueError unless it is well formed"""
+    values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    if not isinstance(values, dict) or type(values.get('id')) is not int:
+        raise ValueError('malformed cursor')
+    if order == 'updated_at':
+        if not isinstance(values.get('updated_at'), str):
+            raise ValueError('malformed cursor')
+        values['updated_at'] = datetime.fromisoformat(values['updated_at'])
+    return values
+
+def parse_bool(value):
+    return value.lower() in ('1', 'true', 'yes')
+
+def filter_projects(query, args, now=None):
+    """Apply the owner/status/deadline/overdue filters shared by project listings"""
+    if args.get('owner'):
+        query = query.filter(Project.owner == args['owner'])
+    if args.get('status'):
+        query = query.filter(Project.status == ProjectStatus[args['status'].upper().replace(' ', '_')])
+    if args.get('deadline_from'):
+        query = query.filter(Project.deadline >= datetime.fromisoformat(args['deadline_from']))
+    if args.get('deadline_to'):
+        query = query.filter(Project.deadline <= datetime.fromisoformat(args['deadline_to']))
+    if args.get('overdue'):
+        now = now or datetime.utcnow()
+        overdue = and_(
+            Project.deadline < now,
+            or_(Project.status.is_(None), Project.status != ProjectStatus.COMPLETED)
+        )
+        query = query.filter(overdue if parse_bool(args['overdue']) else not_(overdue))
+    return query
+
 @app.route('/api/projects', methods=['GET'])
+@conditional_get('projects', clock=lambda args: 'overdue' in args)
 def get_projects():
+    """
+    List projects one keyset page at a time
+    
+    Query parameters: owner, status, deadline_from, deadline_to, overdue, limit,
+    order ('id' ascending or 'updated_at' newest first) and the opaque cursor
+    returned as next_cursor by the previous page.
+    """
     session = get_session()
     try:
-        projects = session.query(Project).all()
-        return jsonify([p.to_dict() for p in projects])
+        args = request.args
+        limit = min(max(int(args.get('limit', PROJECTS_PAGE_SIZE)), 1), PROJECTS_MAX_PAGE_SIZE)
+        order = args.get('order', 'id')
+        if order not in ('id', 'updated_at'):
+            return jsonify({'error': f'Unsupported order: {order}'}), 400
+        
+        query = filter_projects(session.query(Project), args)
+        cursor = decode_cursor(args['cursor'], order) if args.get('cursor') else None
+        
+        if order == 'id':
+            if cursor:
+                query = query.filter(Project.id > cursor['id'])
+            query = query.order_by(Project.id)
+        else:
+            if cursor:
+                updated_at = cursor['updated_at']
+                query = query.filter(or_(
+                    Project.updated_at < updated_at,
+                    and_(Project.updated_at == updated_at, Project.id < cursor['id'])
+                ))
+            query = query.order_by(Project.updated_at.desc(), Project.id.desc())
+        
+        projects = query.limit(limit + 1).all()
+        next_cursor = None
+        if len(projects) > limit:
+            projects = projects[:limit]
+            last = projects[-1]
+            if order == 'id':
+                next_cursor = encode_cursor({'id': last.id})
+            else:
+                next_cursor = encode_cursor({'updated_at': last.updated_at.isoformat(), 'id': last.id})
+        
+        return jsonify({
+            'projects': [p.to_dict() for p in projects],
+            'next_cursor': next_cursor
+        })
+    except (KeyError, ValueError) as e:
+        return jsonify({'error': f'Invalid query parameter: {e}'}), 400
     finally:
         session.close()
 
@@ -76,6 +196,7 @@ def create_project():
         session.close()
 
 @app.route('/api/projects/<int:project_id>', methods=['GET'])
+@conditional_get('projects')
 def get_project(project_id):
     session = get_session()
     try:
@@ -137,6 +258,7 @@ def delete_project(project_id):
 
 # API Routes - Milestones
 @app.route('/api/milestones', methods=['GET'])
+@conditional_get('milestones')
 def get_milestones():
     session = get_session()
     try:
@@ -164,13 +286,10 @@ def create_milestone():
         if 'completion_date' in data and data['completion_date']:
             milestone.completion_date = datetime.fromisoformat(data['completion_date'])
         session.add(milestone)
-        session.commit()
         
-        # Update project completion percentage
-        project = session.query(Project).filter_by(id=data['project_id']).first()
-        if project:
-            project.completion_percentage = calculate_completion(project, session)
-            session.commit()
+        # Update project completion percentage in the same transaction
+        recalculate_completion(session, [milestone.project_id])
+        session.commit()
         
         return jsonify(milestone.to_dict()), 201
     except Exception as e:
@@ -200,13 +319,10 @@ def update_milestone(milestone_id):
             milestone.status = MilestoneStatus[data['status'].upper().replace(' ', '_')]
         
         milestone.updated_at = datetime.utcnow()
-        session.commit()
         
-        # Update project completion percentage
-        project = session.query(Project).filter_by(id=milestone.project_id).first()
-        if project:
-            project.completion_percentage = calculate_completion(project, session)
-            session.commit()
+        # Update project completion percentage in the same transaction
+        recalculate_completion(session, [milestone.project_id])
+        session.commit()
         
         return jsonify(milestone.to_dict())
     except Exception as e:
@@ -224,13 +340,10 @@ def delete_milestone(milestone_id):
             return jsonify({'error': 'Milestone not found'}), 404
         project_id = milestone.project_id
         session.delete(milestone)
-        session.commit()
         
-        # Update project completion percentage
-        project = session.query(Project).filter_by(id=project_id).first()
-        if project:
-            project.completion_percentage = calculate_completion(project, session)
-            session.commit()
+        # Update project completion percentage in the same transaction
+        recalculate_completion(session, [project_id])
+        session.commit()
         
         return jsonify({'message': 'Milestone deleted successfully'})
     except Exception as e:
@@ -239,8 +352,127 @@ def delete_milestone(milestone_id):
     finally:
         session.close()
 
+def milestone_fields(data):
+    """Convert the writable milestone keys present in a request payload into column values"""
+    fields = {}
+    if 'project_id' in data:
+        fields['project_id'] = data['project_id']
+    if 'name' in data:
+        fields['name'] = data['name']
+    if 'description' in data:
+        fields['description'] = data['description']
+    if 'target_date' in data:
+        fields['target_date'] = datetime.fromisoformat(data['target_date'])
+    if 'completion_date' in data:
+        fields['completion_date'] = datetime.fromisoformat(data['completion_date']) if data['completion_date'] else None
+    if 'status' in data:
+        fields['status'] = MilestoneStatus[data['status'].upper().replace(' ', '_')]
+    return fields
+
+def bulk_delete_ids(data, updates):
+    """Deduplicated delete ids of a bulk request; a row may be updated once or deleted, not both"""
+    update_ids = [u['id'] for u in updates]
+    duplicates = sorted({i for i in update_ids if update_ids.count(i) > 1})
+    if duplicates:
+        raise ValueError(f"update: ids listed more than once: {duplicates}")
+    delete_ids = list(dict.fromkeys(int(i) for i in data.get('delete', [])))
+    overlap = sorted(set(update_ids) & set(delete_ids))
+    if overlap:
+        raise ValueError(f"ids both updated and deleted: {overlap}")
+    return delete_ids
+
+def load_bulk_targets(session, model, columns, ids):
+    """Fetch the current tracked columns of every id in one query, failing on unknown ids"""
+    rows = {}
+    if ids:
+        for row in session.execute(select(model.id, *columns).where(model.id.in_(ids))):
+            rows[row.id] = row._asdict()
+    missing = sorted(set(ids) - set(rows))
+    if missing:
+        raise LookupError(f"{model.__name__} not found: {missing}")
+    return rows
+
+@app.route('/api/milestones/bulk', methods=['POST'])
+def bulk_milestones():
+    """
+    Create, update and delete many milestones in one transaction
+    
+    Body: {"create": [milestone, ...], "update": [{"id": ..., field: value}, ...], "delete": [id, ...]}
+    Completion is recomputed once for every project touched by the batch.
+    """
+    session = get_session()
+    try:
+        data = request.json or {}
+        now = datetime.utcnow()
+        
+        creates = []
+        for index, item in enumerate(data.get('create', [])):
+            try:
+                fields = {'description': '', 'status': MilestoneStatus.PENDING, 'completion_date': None}
+                fields.update(milestone_fields(item))
+                fields['project_id'] = item['project_id']
+                fields['name'] = item['name']
+                fields['target_date'] = datetime.fromisoformat(item['target_date'])
+            except (KeyError, ValueError, TypeError, AttributeError) as e:
+                raise ValueError(f"create[{index}]: {e}")
+            creates.append(fields)
+        
+        updates = []
+        for index, item in enumerate(data.get('update', [])):
+            try:
+                fields = milestone_fields(item)
+                fields['id'] = int(item['id'])
+            except (KeyError, ValueError, TypeError, AttributeError) as e:
+                raise ValueError(f"update[{index}]: {e}")
+            fields['updated_at'] = now
+            updates.append(fields)
+        
+        delete_ids = bulk_delete_ids(data, updates)
+        
+        existing = load_bulk_targets(
+            session, Milestone, [Milestone.project_id, Milestone.status],
+            [u['id'] for u in updates] + delete_ids
+        )
+        affected_projects = {row['project_id'] for row in existing.values()}
+        affected_projects.update(fields['project_id'] for fields in creates)
+        affected_projects.update(u['project_id'] for u in updates if 'project_id' in u)
+        
+        created_ids = []
+        if creates:
+            created_ids = list(session.scalars(insert(Milestone).returning(Milestone.id, sort_by_parameter_order=True), creates))
+        if updates:
+            session.execute(update(Milestone), updates)
+        deleted_ids = []
+        if delete_ids:
+            deleted_ids = list(session.scalars(delete(Milestone).where(Milestone.id.in_(delete_ids)).returning(Milestone.id)))
+        
+        record_bulk_changes(
+            session, Milestone,
+            removed=[existing[u['id']] for u in updates] + [existing[i] for i in deleted_ids],
+            added=creates + [{**existing[u['id']], **u} for u in updates]
+        )
+        
+        # Recompute completion once for all affected projects
+        recalculate_completion(session, affected_projects)
+        
+        session.commit()
+        return jsonify({
+            'created': created_ids,
+            'updated': len(updates),
+            'deleted': len(deleted_ids)
+        })
+    except LookupError as e:
+        session.rollback()
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        session.rollback()
+        return jsonify({'error': str(e)}), 400
+    finally:
+        session.close()
+
 # API Routes - Risks
 @app.route('/api/risks', methods=['GET'])
+@conditional_get('risks')
 def get_risks():
     session = get_session()
     try:
@@ -320,84 +552,245 @@ def delete_risk(risk_id):
     finally:
         session.close()
 
-# API Routes - KPIs
-@app.route('/api/kpis', methods=['GET'])
-def get_kpis():
+def risk_fields(data):
+    """Convert the writable risk keys present in a request payload into column values"""
+    fields = {}
+    if 'project_id' in data:
+        fields['project_id'] = data['project_id']
+    if 'name' in data:
+        fields['name'] = data['name']
+    if 'description' in data:
+        fields['description'] = data['description']
+    if 'severity' in data:
+        fields['severity'] = RiskSeverity[data['severity'].upper()]
+    if 'mitigation_plan' in data:
+        fields['mitigation_plan'] = data['mitigation_plan']
+    if 'status' in data:
+        fields['status'] = data['status']
+    return fields
+
+@app.route('/api/risks/bulk', methods=['POST'])
+def bulk_risks():
+    """
+    Create, update and delete many risks in one transaction
+    
+    Body: {"create": [risk, ...], "update": [{"id": ..., field: value}, ...], "delete": [id, ...]}
+    """
     session = get_session()
     try:
-        projects = session.query(Project).all()
-        milestones = session.query(Milestone).all()
-        risks = session.query(Risk).all()
-        
+        data = request.json or {}
         now = datetime.utcnow()
         
-        # Calculate metrics
-        total_projects = len(projects)
-        if total_projects == 0:
-            return jsonify({
-                'projects_on_track': 0,
-                'avg_delay_percentage': 0,
-                'high_risk_count': 0,
-                'total_projects': 0,
-                'avg_completion': 0,
-                'milestone_completion': 0
-            })
-        
-        # Projects on track (not past deadline or completed)
-        on_track = sum(1 for p in projects 
-                      if p.deadline >= now or p.status == ProjectStatus.COMPLETED)
-        projects_on_track_pct = (on_track / total_projects) * 100
-        
-        # Average delay percentage
-        delays = []
-        for p in projects:
-            if p.deadline < now and p.status != ProjectStatus.COMPLETED:
-                days_past = (now - p.deadline).days
-                total_days = (p.deadline - p.start_date).days
-                if total_days > 0:
-                    delay_pct = (days_past / total_days) * 100
-                    delays.append(delay_pct)
-        avg_delay = sum(delays) / len(delays) if delays else 0
-        
-        # High risk count
-        high_risk_count = sum(1 for r in risks if r.severity == RiskSeverity.HIGH and r.status != 'Closed')
-        
-        # Average completion
-        avg_completion = sum(p.completion_percentage for p in projects) / total_projects
-        
-        # Milestone completion
-        total_milestones = len(milestones)
-        completed_milestones = sum(1 for m in milestones if m.status == MilestoneStatus.COMPLETED)
-        milestone_completion_pct = (completed_milestones / total_milestones * 100) if total_milestones > 0 else 0
+        creates = []
+        for index, item in enumerate(data.get('create', [])):
+            try:
+                fields = {'description': '', 'mitigation_plan': '', 'status': 'Open'}
+                fields.update(risk_fields(item))
+                fields['project_id'] = item['project_id']
+                fields['name'] = item['name']
+                fields['severity'] = RiskSeverity[item['severity'].upper()]
+            except (KeyError, ValueError, TypeError, AttributeError) as e:
+                raise ValueError(f"create[{index}]: {e}")
+            creates.append(fields)
+        
+        updates = []
+        for index, item in enumerate(data.get('update', [])):
+            try:
+                fields = risk_fields(item)
+                fields['id'] = int(item['id'])
+            except (KeyError, ValueError, TypeError, AttributeError) as e:
+                raise ValueError(f"update[{index}]: {e}")
+            fields['updated_at'] = now
+            updates.append(fields)
+        
+        delete_ids = bulk_delete_ids(data, updates)
+        
+        existing = load_bulk_targets(
+            session, Risk, [Risk.severity, Risk.status],
+            [u['id'] for u in updates] + delete_ids
+        )
+        
+        created_ids = []
+        if creates:
+            created_ids = list(session.scalars(insert(Risk).returning(Risk.id, sort_by_parameter_order=True), creates))
+        if updates:
+            session.execute(update(Risk), updates)
+        deleted_ids = []
+        if delete_ids:
+            deleted_ids = list(session.scalars(delete(Risk).where(Risk.id.in_(delete_ids)).returning(Risk.id)))
         
+        record_bulk_changes(
+            session, Risk,
+            removed=[existing[u['id']] for u in updates] + [existing[i] for i in deleted_ids],
+            added=creates + [{**existing[u['id']], **u} for u in updates]
+        )
+        
+        session.commit()
         return jsonify({
-            'projects_on_track': round(projects_on_track_pct, 2),
-            'avg_delay_percentage': round(avg_delay, 2),
-            'high_risk_count': high_risk_count,
-            'total_projects': total_projects,
-            'avg_completion': round(avg_completion, 2),
-            'milestone_completion': round(milestone_completion_pct, 2)
+            'created': created_ids,
+            'updated': len(updates),
+            'deleted': len(deleted_ids)
         })
+    except LookupError as e:
+        session.rollback()
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        session.rollback()
+        return jsonify({'error': str(e)}), 400
     finally:
         session.close()
 
-# Export to CSV
-@app.route('/api/export/csv', methods=['GET'])
-def export_csv():
+# API Routes - KPIs
+@app.route('/api/kpis', methods=['GET'])
+@conditional_get(*TRACKED_TABLES, clock=True)
+def get_kpis():
     session = get_session()
     try:
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
+        kpis = read_kpis(session)
+        session.commit()
+        return jsonify(kpis)
+    finally:
+        session.close()
+
+# API Routes - Dashboard
+DASHBOARD_OVERDUE_LIMIT = 10
+DASHBOARD_MAX_OVERDUE_LIMIT = 100
+DASHBOARD_RECENT_LIMIT = 10
+
+def dashboard_series(session, overdue_limit=DASHBOARD_OVERDUE_LIMIT, now=None):
+    """
+    Aggregated chart series for the dashboard, computed with GROUP BY queries
+
+    The result size depends on the number of statuses, owners and severities,
+    not on the number of projects.
+    """
+    now = now or datetime.utcnow()
+
+    status_rows = session.execute(
+        select(Project.status, func.count(Project.id)).group_by(Project.status)
+    ).all()
+    status_counts = {}
+    for status, count in status_rows:
+        # NULL status is treated as Not Started, as on the project listing
+        status = status or ProjectStatus.NOT_STARTED
+        status_counts[status] = status_counts.get(status, 0) + count
+
+    owner_rows = session.execute(
+        select(Project.owner, func.count(Project.id), func.avg(func.coalesce(Project.completion_percentage, 0.0)))
+        .group_by(Project.owner)
+        .order_by(Project.owner)
+    ).all()
+
+    open_risk = or_(Risk.status.is_(None), Risk.status != 'Closed')
+    severity_rows = session.execute(
+        select(Risk.severity, func.count(Risk.id), func.sum(case((open_risk, 1), else_=0)))
+        .group_by(Risk.severity)
+    ).all()
+    severity_counts = {severity: (total, open_count or 0) for severity, total, open_count in severity_rows}
+
+    overdue = and_(
+        Project.deadline < now,
+        or_(Project.status.is_(None), Project.status != ProjectStatus.COMPLETED)
+    )
+    overdue_total = session.execute(select(func.count(Project.id)).where(overdue)).scalar()
+    overdue_rows = session.execute(
+        select(Project.id, Project.name, Project.owner, Project.status, Project.deadline, Project.completion_percentage)
+        .where(overdue)
+        .order_by(Project.deadline, Project.id)
+        .limit(overdue_limit)
+    ).all()
+
+    return {
+        'status_distribution': [
+            {'status': status.value, 'count': status_counts[status]}
+            for status in ProjectStatus if status_counts.get(status)
+        ],
+        'completion_by_owner': [
+            {'owner': owner, 'projects': count, 'avg_completion': round(avg_completion or 0, 2)}
+            for owner, count, avg_completion in owner_rows
+        ],
+        'risk_severity': [
+            {'severity': severity.value, 'count': severity_counts.get(severity, (0, 0))[0],
+             'open': severity_counts.get(severity, (0, 0))[1]}
+            for severity in (RiskSeverity.HIGH, RiskSeverity.MEDIUM, RiskSeverity.LOW)
+        ],
+        'overdue': {
+            'total': overdue_total,
+            'projects': [
+                {
+                    'id': row.id,
+                    'name': row.name,
+                    'owner': row.owner,
+                    'status': row.status.value if row.status else None,
+                    'deadline': row.deadline.isoformat(),
+                    'days_overdue': (now - row.deadline).days,
+                    'completion_percentage': row.completion_percentage
+                }
+                for row in overdue_rows
+            ]
+        }
+    }
+
+@app.route('/api/dashboard', methods=['GET'])
+@conditional_get(*TRACKED_TABLES, clock=True)
+def get_dashboard():
+    """
+    Everything the dashboard page renders, in one response
+
+    Query parameters: overdue_limit (default 10, at most 100).
+    """
+    session = get_session()
+    try:
+        overdue_limit = min(max(int(request.args.get('overdue_limit', DASHBOARD_OVERDUE_LIMIT)), 1),
+                            DASHBOARD_MAX_OVERDUE_LIMIT)
+        kpis = read_kpis(session)
+        session.commit()
+
+        recent = (
+            session.query(Project)
+            .order_by(Project.updated_at.desc(), Project.id.desc())
+            .limit(DASHBOARD_RECENT_LIMIT)
+            .all()
+        )
+        payload = dashboard_series(session, overdue_limit)
+        payload['kpis'] = kpis
+        payload['recent_projects'] = [p.to_dict() for p in recent]
+        return jsonify(payload)
+    except ValueError as e:
+        return jsonify({'error': f'Invalid query parameter: {e}'}), 400
+    finally:
+        session.close()
+
+# Export to CSV
+EXPORT_BATCH_SIZE = 500
+
+def iter_export_csv(session, batch_size=EXPORT_BATCH_SIZE):
+    """Yield the project export as CSV text chunks, one chunk per batch of projects"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    
+    def flush():
+        chunk = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return chunk
+    
+    try:
         # Write header
         writer.writerow(['Project Name', 'Owner', 'Status', 'Start Date', 'Deadline', 
                         'Completion %', 'Milestone Name', 'Milestone Status', 'Risk Name', 
                         'Risk Severity', 'Risk Status'])
         
-        projects = session.query(Project).all()
-        for project in projects:
-            milestones = session.query(Milestone).filter_by(project_id=project.id).all()
-            risks = session.query(Risk).filter_by(project_id=project.id).all()
+        # Milestones and risks arrive through one IN-query each per batch of projects
+        projects = (
+            session.query(Project)
+            .options(selectinload(Project.milestones), selectinload(Project.risks))
+            .order_by(Project.id)
+            .yield_per(batch_size)
+        )
+        for count, project in enumerate(projects, start=1):
+            milestones = project.milestones
+            risks = project.risks
             
             max_rows = max(len(milestones), len(risks), 1)
             
@@ -416,18 +809,95 @@ def export_csv():
                     risks[i].status if i < len(risks) else ''
                 ]
                 writer.writerow(row)
+            
+            if count % batch_size == 0:
+                yield flush()
         
-        output.seek(0)
-        return send_file(
-            io.BytesIO(output.getvalue().encode('utf-8')),
-            mimetype='text/csv',
-            as_attachment=True,
-            download_name='project_export.csv'
-        )
+        yield flush()
     finally:
         session.close()
 
+@app.route('/api/export/csv', methods=['GET'])
+def export_csv():
+    # The session is closed by the generator once the response has been streamed
+    return Response(
+        iter_export_csv(get_session()),
+        mimetype='text/csv',
+        headers={'Content-Disposition': 'attachment; filename=project_export.csv'}
+    )
+
+@app.route('/api/export/jira', methods=['GET'])
+def export_jira():
+    """Jira import CSV, streamed; optional query args: project_key (default PT), assignee"""
+    project_key = request.args.get('project_key', 'PT')
+    assignee = request.args.get('assignee') or None
+    filename = f'jira_import_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
+    return Response(
+        iter_jira_csv(get_session(), project_key=project_key, assignee=assignee),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+# Server-rendered KPI charts (the kpi.py registry), cached until the data changes
+@app.route('/api/charts/<name>.<fmt>', methods=['GET'])
+def get_chart(name, fmt):
+    try:
+        from chart_cache import chart_cache
+    except ImportError:
+        return jsonify({'error': 'Chart rendering dependencies not installed'}), 501
+    
+    try:
+        chart = chart_cache.get(name, fmt, data_versions.get(Session)[GLOBAL])
+    except KeyError:
+        return jsonify({'error': 'Chart not found'}), 404
+    except Exception:
+        # A renderer that cannot draw this data (e.g. all-empty columns) has nothing to show
+        app.logger.exception('Could not render chart %s.%s', name, fmt)
+        return jsonify({'error': 'Chart could not be rendered from the current data'}), 404
+    if chart['data'] is None:
+        return jsonify({'error': 'No data for this chart yet'}), 404
+    
+    response = Response(chart['data'], mimetype=chart['mimetype'])
+    response.set_etag(chart['etag'])
+    response.last_modified = chart['last_modified']
+    response.cache_control.no_cache = True  # Revalidate with If-None-Match; unchanged charts get 304
+    return response.make_conditional(request)
+
+# Server-Sent Events: project, milestone and risk changes pushed to open pages
+EVENTS_HEARTBEAT_SECONDS = int(os.getenv('EVENTS_HEARTBEAT_SECONDS', '15'))
+EVENTS_RETRY_MS = 5000
+
+@app.route('/api/events', methods=['GET'])
+def stream_events():
+    """
+    Stream change events as text/event-stream
+
+    Each event is named after its table ('projects', 'milestones', 'risks') and
+    carries {type, op, id, project_id, data}; op is created, updated, deleted
+    (data is null) or bulk (reload the table). A 'resync' event means events
+    were missed and the client should reload everything.
+    """
+    def stream():
+        with change_events.subscribe() as subscription:
+            yield f'retry: {EVENTS_RETRY_MS}\n\n'
+            while True:
+                change = subscription.get(timeout=EVENTS_HEARTBEAT_SECONDS)
+                # Comment lines keep proxies from closing an idle stream
+                yield format_sse(change) if change is not None else ': keepalive\n\n'
+    
+    response = Response(stream(), mimetype='text/event-stream')
+    response.cache_control.no_cache = True
+    response.headers['X-Accel-Buffering'] = 'no'  # Disable nginx response buffering
+    return response
+
 # AI Summarization (Optional)
+def queue_full_response(error):
+    """503 telling the client to retry once the worker pool has room"""
+    response = jsonify({'error': str(error)})
+    response.status_code = 503
+    response.headers['Retry-After'] = '5'
+    return response
+
 @app.route('/api/ai/summarize/<int:project_id>', methods=['POST'])
 def summarize_project(project_id):
     session = get_session()
@@ -439,7 +909,21 @@ def summarize_project(project_id):
         milestones = session.query(Milestone).filter_by(project_id=project_id).all()
         risks = session.query(Risk).filter_by(project_id=project_id).all()
         
+        if worker_pool.enabled:
+            # The worker processes own the model; never load a second copy in this process
+            project_dict = project.to_dict()
+            milestones_dict = [m.to_dict() for m in milestones]
+            risks_dict = [r.to_dict() for r in risks]
+            session.close()
+            try:
+                return jsonify(worker_pool.run(project_dict, milestones_dict, risks_dict))
+            except QueueFullError as e:
+                return queue_full_response(e)
+            except TimeoutError:
+                return jsonify({'error': 'Summary did not finish in time; use /api/ai/jobs for long summaries'}), 504
+        
         # Use AI summarizer if available
+        summarizer = None
         try:
             from ai_summarizer import summarizer
             project_dict = project.to_dict()
@@ -465,10 +949,146 @@ Risks: {len(risks)} total
 - Low: {sum(1 for r in risks if r.severity == RiskSeverity.LOW)}
             """
         
-        return jsonify({'summary': summary.strip()})
+        return jsonify({'summary': summary.strip(), 'model_ready': bool(summarizer and summarizer.initialized)})
     finally:
         session.close()
 
+AI_BULK_MAX_PROJECTS = 5000
+
+@app.route('/api/ai/summarize', methods=['POST'])
+def summarize_projects():
+    """
+    Summarize many projects in one call using the batched pipeline
+    
+    Body (optional): {"project_ids": [...], "batch_size": 8}; all projects when ids are omitted.
+    Runs as one job on the worker pool when it is enabled.
+    """
+    summarizer = None
+    if not worker_pool.enabled:
+        try:
+            from ai_summarizer import summarizer
+        except ImportError:
+            return jsonify({'error': 'AI module not installed'}), 501
+    
+    session = get_session()
+    try:
+        data = request.get_json(silent=True) or {}
+        batch_size = max(int(data.get('batch_size', 8)), 1)
+        
+        query = (
+            session.query(Project)
+            .options(selectinload(Project.milestones), selectinload(Project.risks))
+            .order_by(Project.id)
+        )
+        if data.get('project_ids'):
+            query = query.filter(Project.id.in_([int(i) for i in data['project_ids']]))
+        projects = query.limit(AI_BULK_MAX_PROJECTS + 1).all()
+        if len(projects) > AI_BULK_MAX_PROJECTS:
+            return jsonify({'error': f'At most {AI_BULK_MAX_PROJECTS} projects per request'}), 400
+        
+        batch = [
+            (p.to_dict(), [m.to_dict() for m in p.milestones], [r.to_dict() for r in p.risks])
+            for p in projects
+        ]
+        session.close()
+        
+        if worker_pool.enabled:
+            return jsonify(worker_pool.run_batch(batch, batch_size=batch_size))
+        report = summarizer.generate_summaries(batch, batch_size=batch_size)
+        report['model_ready'] = summarizer.initialized
+        return jsonify(report)
+    except QueueFullError as e:
+        return queue_full_response(e)
+    except TimeoutError:
+        return jsonify({'error': 'Summaries did not finish in time; request fewer projects'}), 504
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    finally:
+        session.close()
+
+@app.route('/api/ai/status', methods=['GET'])
+def ai_status():
+    if worker_pool.enabled:
+        # The model lives in the worker processes, not in this one
+        return jsonify(worker_pool.model_status())
+    try:
+        from ai_summarizer import summarizer
+    except ImportError:
+        return jsonify({'available': False, 'ready': False, 'loading': False, 'model': None, 'error': 'AI module not installed'})
+    return jsonify(summarizer.status())
+
+@app.route('/api/ai/report', methods=['GET'])
+@conditional_get(*TRACKED_TABLES, clock=True)
+def portfolio_report():
+    """Rule-based summary and recommendations for every project, without the model"""
+    try:
+        from ai_summarizer import summarizer
+    except ImportError:
+        return jsonify({'error': 'AI module not installed'}), 501
+
+    session = get_session()
+    try:
+        return jsonify({'projects': summarizer.portfolio_report(session)})
+    finally:
+        session.close()
+
+# Asynchronous summary jobs served by the worker process pool
+@app.route('/api/ai/jobs', methods=['POST'])
+def create_summary_job():
+    if not worker_pool.enabled:
+        return jsonify({'error': 'Summary workers are disabled (AI_WORKERS=0)'}), 501
+    
+    session = get_session()
+    try:
+        data = request.get_json(silent=True) or {}
+        project = session.query(Project).filter_by(id=data.get('project_id')).first()
+        if not project:
+            return jsonify({'error': 'Project not found'}), 404
+        
+        job_id = worker_pool.submit(
+            project.to_dict(),
+            [m.to_dict() for m in project.milestones],
+            [r.to_dict() for r in project.risks]
+        )
+        response = jsonify({'job_id': job_id, 'status': 'queued'})
+        response.status_code = 202
+        response.headers['Location'] = f'/api/ai/jobs/{job_id}'
+        return response
+    except QueueFullError as e:
+        return queue_full_response(e)
+    finally:
+        session.close()
+
+@app.route('/api/ai/jobs/<job_id>', methods=['GET'])
+def get_summary_job(job_id):
+    job = worker_pool.status(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+def warm_up_summarizer():
+    """Start loading the summarization model in the background so no request waits for it"""
+    if worker_pool.enabled:
+        worker_pool.start()
+        return
+    try:
+        from ai_summarizer import summarizer
+    except ImportError:
+        return
+    summarizer.warm_up()
+
+def is_spawned_child():
+    """
+    True inside a spawned worker process, including while it re-runs the parent's
+    main module (parent_process() is only set once that bootstrap has finished)
+    """
+    # multiprocessing aliases __mp_main__ to __main__; they differ only during that re-run
+    return multiprocessing.parent_process() is not None or sys.modules.get('__mp_main__') is not sys.modules.get('__main__')
+
+# Spawned worker processes re-import this module; only the parent process warms up
+if not is_spawned_child() and os.environ.get('AI_WARMUP', 'true').lower() in ('1', 'true', 'yes'):
+    warm_up_summarizer()
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
 
@@ -0,0 +1,101 @@
+"""
+Power BI Export Benchmark
+Times the Power BI export on synthetic databases of increasing size
+
+Each size gets its own throwaway SQLite database with 1 project per 100 rows and
+the rest split 60/40 between milestones and risks. Query and CSV time per row
+should stay flat as the row count grows, i.e. the export scales linearly.
+
+Usage:
+    python benchmark_powerbi_export.py --rows 10000 100000 1000000
+"""
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session as OrmSession
+from models import Base, Project, Milestone, Risk, ProjectStatus, MilestoneStatus, RiskSeverity
+from chart_data import build_frames
+from powerbi_csv_export import write_powerbi_csv
+from datetime import datetime, timedelta
+import argparse
+import os
+import random
+import tempfile
+import time
+
+INSERT_BATCH_SIZE = 50000
+
+
+def seed(engine, rows, rng):
+    """Insert `rows` projects + milestones + risks with executemany batches"""
+    now = datetime.utcnow()
+    project_count = max(rows // 100, 1)
+    milestone_count = (rows - project_count) * 3 // 5
+    risk_count = rows - project_count - milestone_count
+    statuses = list(ProjectStatus)
+    milestone_statuses = list(MilestoneStatus)
+    severities = list(RiskSeverity)
+
+    def batches(count, make_row):
+        for start in range(0, count, INSERT_BATCH_SIZE):
+            yield [make_row(i) for i in range(start, min(start + INSERT_BATCH_SIZE, count))]
+
+    with engine.begin() as connection:
+        for batch in batches(project_count, lambda i: {
+            'name': f'Project {i}', 'owner': f'Owner {i % 25}', 'description': 'Synthetic project',
+            'status': rng.choice(statuses), 'start_date': now - timedelta(days=rng.randint(0, 365)),
+            'deadline': now + timedelta(days=rng.randint(-90, 365)),
+            'completion_percentage': rng.random() * 100, 'created_at': now, 'updated_at': now,
+        }):
+            connection.execute(insert(Project), batch)
+        for batch in batches(milestone_count, lambda i: {
+            'project_id': i % project_count + 1, 'name': f'Milestone {i}',
+            'target_date': now + timedelta(days=rng.randint(-180, 365)),
+            'status': rng.choice(milestone_statuses), 'created_at': now, 'updated_at': now,
+        }):
+            connection.execute(insert(Milestone), batch)
+        for batch in batches(risk_count, lambda i: {
+            'project_id': i % project_count + 1, 'name': f'Risk {i}', 'severity': rng.choice(severities),
+            'status': rng.choice(['Open', 'Mitigated', 'Closed']), 'created_at': now, 'updated_at': now,
+        }):
+            connection.execute(insert(Risk), batch)
+
+
+def run(rows, workdir, rng):
+    """Seed a fresh database with `rows` rows and time the export steps"""
+    path = os.path.join(workdir, f'bench_{rows}.db')
+    engine = create_engine(f'sqlite:///{path}')
+    Base.metadata.create_all(engine)
+    seed(engine, rows, rng)
+
+    with OrmSession(engine) as session:
+        started = time.perf_counter()
+        frames = build_frames(session)
+        query_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        write_powerbi_csv(frames, f'bench_{rows}', output_dir=workdir)
+        csv_seconds = time.perf_counter() - started
+
+    engine.dispose()
+    return sum(len(df) for df in frames.values()), query_seconds, csv_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the Power BI export at several sizes')
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000, 1000000],
+                        help='Total rows (projects + milestones + risks) per run')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"{'Rows':>10}{'Query s':>10}{'CSV s':>10}{'Total s':>10}{'us/row':>10}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for rows in args.rows:
+            exported, query_seconds, csv_seconds = run(rows, workdir, rng)
+            total = query_seconds + csv_seconds
+            print(f"{exported:>10}{query_seconds:>10.2f}{csv_seconds:>10.2f}{total:>10.2f}"
+                  f"{1e6 * total / exported:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
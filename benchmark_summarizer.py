@@ -0,0 +1,138 @@
+"""
+Summarizer Backend Benchmark
+Compares CPU latency, memory footprint and output parity of the AI backends
+
+Each backend is loaded in a fresh process so memory numbers are not polluted by the
+others. Parity is measured against the reference `pipeline` backend on the same inputs.
+
+Usage:
+    python benchmark_summarizer.py --backends pipeline quantized onnx --projects 20
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from sqlalchemy.orm import selectinload
+import argparse
+import difflib
+import multiprocessing
+import os
+import statistics
+import time
+
+
+def _rss_mb():
+    """Current resident set size of this process in MB"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+
+
+def load_inputs(limit):
+    """Model inputs for the first `limit` projects in the database"""
+    from ai_summarizer import ProjectSummarizer
+    from db import Session
+    from models import Project
+
+    session = Session()
+    try:
+        projects = (
+            session.query(Project)
+            .options(selectinload(Project.milestones), selectinload(Project.risks))
+            .order_by(Project.id)
+            .limit(limit)
+            .all()
+        )
+        builder = ProjectSummarizer()
+        return [
+            builder._model_input(p.to_dict(), [m.to_dict() for m in p.milestones], [r.to_dict() for r in p.risks])
+            for p in projects
+        ]
+    finally:
+        session.close()
+
+
+def run_backend(backend, inputs, warmup):
+    """Load one backend and time it on every input (runs inside a worker process)"""
+    from ai_summarizer import BACKENDS, GENERATION_KWARGS, MODEL_NAME
+
+    rss_before = _rss_mb()
+    started = time.perf_counter()
+    summarizer = BACKENDS[backend](MODEL_NAME)
+    load_seconds = time.perf_counter() - started
+    rss_loaded = _rss_mb()
+
+    for text in inputs[:warmup]:
+        summarizer(text, truncation=True, **GENERATION_KWARGS)
+
+    latencies = []
+    outputs = []
+    for text in inputs:
+        started = time.perf_counter()
+        result = summarizer(text, truncation=True, **GENERATION_KWARGS)
+        latencies.append((time.perf_counter() - started) * 1000)
+        outputs.append(result[0]['summary_text'].strip())
+
+    return {
+        'backend': backend,
+        'load_seconds': load_seconds,
+        'model_rss_mb': rss_loaded - rss_before,
+        'peak_rss_mb': _rss_mb(),
+        'latencies_ms': latencies,
+        'outputs': outputs,
+    }
+
+
+def parity(reference, outputs):
+    """Exact-match rate and mean token similarity of `outputs` against `reference`"""
+    exact = sum(1 for a, b in zip(reference, outputs) if a == b)
+    similarity = [
+        difflib.SequenceMatcher(None, a.split(), b.split()).ratio()
+        for a, b in zip(reference, outputs)
+    ]
+    return exact / len(reference), statistics.mean(similarity)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark summarizer inference backends')
+    parser.add_argument('--backends', nargs='+', default=['pipeline', 'quantized', 'onnx'])
+    parser.add_argument('--projects', type=int, default=20, help='Number of projects to summarize')
+    parser.add_argument('--warmup', type=int, default=2, help='Untimed warm-up inputs per backend')
+    args = parser.parse_args()
+
+    inputs = load_inputs(args.projects)
+    if not inputs:
+        print("No projects found. Run sample_data.py first.")
+        return
+
+    backends = args.backends if 'pipeline' in args.backends else ['pipeline'] + args.backends
+    results = {}
+    for backend in backends:
+        print(f"Running {backend} backend on {len(inputs)} inputs...")
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            try:
+                results[backend] = executor.submit(run_backend, backend, inputs, args.warmup).result()
+            except Exception as e:
+                print(f"  - {backend} failed: {e}")
+
+    reference = results.get('pipeline')
+    print("-" * 96)
+    print(f"{'Backend':<12}{'Load s':>8}{'Model MB':>10}{'Peak MB':>9}{'p50 ms':>9}{'p95 ms':>9}"
+          f"{'Items/s':>9}{'Exact':>8}{'Similarity':>12}")
+    for backend, result in results.items():
+        latencies = result['latencies_ms']
+        exact, similarity = parity(reference['outputs'], result['outputs']) if reference else (float('nan'),) * 2
+        print(f"{backend:<12}{result['load_seconds']:>8.1f}{result['model_rss_mb']:>10.0f}{result['peak_rss_mb']:>9.0f}"
+              f"{percentile(latencies, 50):>9.0f}{percentile(latencies, 95):>9.0f}"
+              f"{1000 * len(latencies) / sum(latencies):>9.2f}{exact:>8.0%}{similarity:>12.3f}")
+
+
+if __name__ == '__main__':
+    main()
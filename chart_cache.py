@@ -0,0 +1,85 @@
+"""
+Chart Image Cache for Project Tracker
+Renders the kpi.py charts on demand for the API and keeps the bytes until the data changes
+
+Entries are keyed by chart and format and stamped with the data version (see
+data_version.py) plus the UTC date, since day-based columns such as Days
+Remaining change without any write.
+"""
+
+from datetime import datetime
+import hashlib
+import io
+import threading
+
+MIMETYPES = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+
+
+class ChartCache:
+    """Rendered chart bytes per (chart, format), reused while the data version is unchanged"""
+
+    def __init__(self):
+        self._images = {}
+        self._tables = None  # (stamp, tables) shared by every chart of one data version
+        # pyplot keeps global state, so renders are serialized
+        self._lock = threading.Lock()
+
+    def get(self, name, fmt, version, load_tables=None):
+        """
+        Rendered chart for the given data version, rendering it if needed
+
+        Args:
+            name: Chart name without extension, e.g. 'status_distribution'
+            fmt: 'png' or 'svg'
+            version: Current data version
+            load_tables: Callable returning the chart tables (defaults to the live database)
+
+        Returns:
+            Dictionary with data (None when the chart has nothing to draw), etag and last_modified
+
+        Raises:
+            KeyError: for unknown charts or formats
+        """
+        from kpi import CHARTS, render_chart
+
+        filename = f'{name}.png'
+        if filename not in CHARTS or fmt not in MIMETYPES:
+            raise KeyError(f'{name}.{fmt}')
+
+        stamp = (version, datetime.utcnow().date())
+        with self._lock:
+            entry = self._images.get((name, fmt))
+            if entry is not None and entry['stamp'] == stamp:
+                return entry
+
+            tables = self._tables_for(stamp, load_tables)
+            buffer = io.BytesIO()
+            data = buffer.getvalue() if render_chart(filename, tables, buffer, format=fmt) else None
+            entry = {
+                'stamp': stamp,
+                'data': data,
+                'etag': hashlib.sha256(data).hexdigest() if data is not None else None,
+                'last_modified': datetime.utcnow().replace(microsecond=0),
+                'mimetype': MIMETYPES[fmt],
+            }
+            self._images[(name, fmt)] = entry
+            return entry
+
+    def _tables_for(self, stamp, load_tables):
+        if self._tables is None or self._tables[0] != stamp:
+            if load_tables is None:
+                from chart_data import load_db_tables as load_tables
+            self._tables = (stamp, load_tables())
+        return self._tables[1]
+
+    def clear(self):
+        with self._lock:
+            self._images.clear()
+            self._tables = None
+
+
+# Global instance used by the Flask app
+chart_cache = ChartCache()
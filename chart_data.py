@@ -0,0 +1,221 @@
+"""
+Chart Data Source for Project Tracker
+Loads the projects, milestones and risks tables as typed DataFrames for charts and exports
+
+Tables come either straight from the database (one pd.read_sql query per table,
+chunked for large tables) or from the newest Power BI export files in docs/.
+Both sources produce the same columns and types.
+"""
+
+from models import Project, Milestone, Risk, ProjectStatus, MilestoneStatus, RiskSeverity
+from sqlalchemy import select
+from sqlalchemy.orm import Session as OrmSession
+from datetime import datetime
+from pathlib import Path
+import pandas as pd
+
+# Rows fetched per round trip when reading from the database
+CHUNK_SIZE = 50000
+
+# Export files: the newest typed Parquet export (python powerbi_csv_export.py --format parquet),
+# falling back to the CSV export below
+DOCS_DIR = Path('docs')
+PROJECTS_FILE = 'powerbi_projects_20251110_123837.csv'
+MILESTONES_FILE = 'powerbi_milestones_20251110_123837.csv'
+RISKS_FILE = 'powerbi_risks_20251110_123837.csv'
+
+BOOLEAN_COLUMNS = {
+    'projects': ['Is Overdue', 'Is On Track'],
+    'milestones': ['Is Overdue', 'Is Completed'],
+    'risks': ['Is High Risk', 'Is Open'],
+}
+
+SEVERITY_LEVELS = {
+    RiskSeverity.LOW: 1,
+    RiskSeverity.MEDIUM: 2,
+    RiskSeverity.HIGH: 3
+}
+
+def _enum_values(series, enum_type):
+    """Replace enum members with their display values"""
+    return series.map({member: member.value for member in enum_type})
+
+def _read_frame(connection, statement, dates, chunksize=None):
+    """
+    Read a query into a DataFrame, fetching `chunksize` rows at a time when given
+    
+    parse_dates keeps the date columns typed even when a table is empty.
+    """
+    if not chunksize:
+        return pd.read_sql(statement, connection, parse_dates=list(dates))
+    # stream_results makes PostgreSQL use a server-side cursor instead of buffering every row
+    connection = connection.execution_options(stream_results=True)
+    chunks = list(pd.read_sql(statement, connection, parse_dates=list(dates), chunksize=chunksize))
+    if not chunks:
+        return pd.read_sql(statement.limit(0), connection, parse_dates=list(dates))
+    # A chunk of all-NULL text is object dtype; re-infer so dtypes match the single read
+    return pd.concat(chunks, ignore_index=True).infer_objects()
+
+def projects_frame(connection, now, chunksize=None):
+    """Projects table with typed date, numeric and boolean columns"""
+    df = _read_frame(connection, select(
+        Project.id.label('Project ID'),
+        Project.name.label('Project Name'),
+        Project.owner.label('Owner'),
+        Project.description.label('Description'),
+        Project.status.label('Status'),
+        Project.start_date.label('Start Date'),
+        Project.deadline.label('Deadline'),
+        Project.completion_percentage.label('Completion Percentage'),
+        Project.created_at.label('Created At'),
+        Project.updated_at.label('Updated At'),
+    ).order_by(Project.id), dates=('Start Date', 'Deadline', 'Created At', 'Updated At'), chunksize=chunksize)
+    
+    is_completed = df['Status'] == ProjectStatus.COMPLETED
+    df['Status'] = _enum_values(df['Status'], ProjectStatus)
+    df['Description'] = df['Description'].fillna('')
+    df['Completion Percentage'] = df['Completion Percentage'].astype('float64')
+    df['Days Remaining'] = (df['Deadline'] - now).dt.days
+    df['Is Overdue'] = (df['Deadline'] < now) & ~is_completed
+    df['Is On Track'] = ~df['Is Overdue'] | is_completed
+    return df[[
+        'Project ID', 'Project Name', 'Owner', 'Description', 'Status', 'Start Date', 'Deadline',
+        'Completion Percentage', 'Days Remaining', 'Is Overdue', 'Is On Track', 'Created At', 'Updated At'
+    ]]
+
+def milestones_frame(connection, now, chunksize=None):
+    """Milestones table, with the project name joined in"""
+    df = _read_frame(connection, select(
+        Milestone.id.label('Milestone ID'),
+        Milestone.project_id.label('Project ID'),
+        Project.name.label('Project Name'),
+        Milestone.name.label('Milestone Name'),
+        Milestone.description.label('Description'),
+        Milestone.target_date.label('Target Date'),
+        Milestone.completion_date.label('Completion Date'),
+        Milestone.status.label('Status'),
+        Milestone.created_at.label('Created At'),
+        Milestone.updated_at.label('Updated At'),
+    ).outerjoin(Project, Milestone.project_id == Project.id).order_by(Milestone.id),
+        dates=('Target Date', 'Completion Date', 'Created At', 'Updated At'), chunksize=chunksize)
+    
+    is_completed = df['Status'] == MilestoneStatus.COMPLETED
+    target = df['Target Date']
+    df['Status'] = _enum_values(df['Status'], MilestoneStatus)
+    df['Project Name'] = df['Project Name'].fillna('')
+    df['Description'] = df['Description'].fillna('')
+    df['Is Overdue'] = (target < now) & ~is_completed
+    df['Is Completed'] = is_completed
+    df['Days Until Target'] = (target - now).dt.days.where(target > now, 0)
+    df['Days Past Target'] = (now - target).dt.days.where(target < now, 0)
+    return df[[
+        'Milestone ID', 'Project ID', 'Project Name', 'Milestone Name', 'Description', 'Target Date',
+        'Completion Date', 'Status', 'Is Overdue', 'Is Completed', 'Days Until Target', 'Days Past Target',
+        'Created At', 'Updated At'
+    ]]
+
+def risks_frame(connection, now, chunksize=None):
+    """Risks table, with the project name joined in"""
+    df = _read_frame(connection, select(
+        Risk.id.label('Risk ID'),
+        Risk.project_id.label('Project ID'),
+        Project.name.label('Project Name'),
+        Risk.name.label('Risk Name'),
+        Risk.description.label('Description'),
+        Risk.severity.label('Severity'),
+        Risk.mitigation_plan.label('Mitigation Plan'),
+        Risk.status.label('Status'),
+        Risk.created_at.label('Created At'),
+        Risk.updated_at.label('Updated At'),
+    ).outerjoin(Project, Risk.project_id == Project.id).order_by(Risk.id),
+        dates=('Created At', 'Updated At'), chunksize=chunksize)
+    
+    df['Severity Level'] = df['Severity'].map(SEVERITY_LEVELS).fillna(0).astype('int64')
+    df['Is High Risk'] = df['Severity'] == RiskSeverity.HIGH
+    df['Severity'] = _enum_values(df['Severity'], RiskSeverity)
+    df['Is Open'] = df['Status'] == 'Open'
+    for column in ('Project Name', 'Description', 'Mitigation Plan'):
+        df[column] = df[column].fillna('')
+    return df[[
+        'Risk ID', 'Project ID', 'Project Name', 'Risk Name', 'Description', 'Severity', 'Severity Level',
+        'Mitigation Plan', 'Status', 'Is High Risk', 'Is Open', 'Created At', 'Updated At'
+    ]]
+
+def build_frames(bind, now=None, chunksize=None):
+    """
+    Load the three tables as typed DataFrames, one query per table
+    
+    Args:
+        bind: Session or Connection to read from
+        now: Reference time for the derived deadline columns (defaults to utcnow)
+        chunksize: Rows fetched per round trip (None reads each table in one go)
+    
+    Returns:
+        Dictionary with 'projects', 'milestones' and 'risks' DataFrames
+    """
+    now = now or datetime.utcnow()
+    connection = bind.connection() if isinstance(bind, OrmSession) else bind
+    return {
+        'projects': projects_frame(connection, now, chunksize),
+        'milestones': milestones_frame(connection, now, chunksize),
+        'risks': risks_frame(connection, now, chunksize),
+    }
+
+def load_db_tables(bind=None, now=None, chunksize=CHUNK_SIZE):
+    """Read the three tables from the database (the shared engine unless `bind` is given)"""
+    if bind is None:
+        from db import engine as bind
+    with bind.connect() as connection:
+        return build_frames(connection, now=now, chunksize=chunksize)
+
+def load_parquet_tables(docs_dir=DOCS_DIR):
+    """Newest Parquet export as a dict of projects/milestones/risks, or None if there is none"""
+    latest = sorted(Path(docs_dir).glob('powerbi_projects_*.parquet'))
+    if not latest:
+        return None
+    timestamp = latest[-1].stem[len('powerbi_projects_'):]
+    return {
+        name: pd.read_parquet(Path(docs_dir) / f'powerbi_{name}_{timestamp}.parquet')
+        for name in ('projects', 'milestones', 'risks')
+    }
+
+def load_csv_tables(docs_dir=DOCS_DIR):
+    """CSV export parsed into the same column types as the Parquet export"""
+    docs_dir = Path(docs_dir)
+    projects = pd.read_csv(docs_dir / PROJECTS_FILE)
+    milestones = pd.read_csv(docs_dir / MILESTONES_FILE)
+    risks = pd.read_csv(docs_dir / RISKS_FILE)
+    
+    # Parse numeric/datetime columns
+    projects['Completion Percentage'] = pd.to_numeric(projects['Completion Percentage'], errors='coerce')
+    projects['Days Remaining'] = pd.to_numeric(projects['Days Remaining'], errors='coerce')
+    projects['Start Date'] = pd.to_datetime(projects['Start Date'], errors='coerce')
+    projects['Deadline'] = pd.to_datetime(projects['Deadline'], errors='coerce')
+    
+    milestones['Target Date'] = pd.to_datetime(milestones['Target Date'], errors='coerce')
+    milestones['Completion Date'] = pd.to_datetime(milestones['Completion Date'], errors='coerce')
+    
+    risks['Severity Level'] = pd.to_numeric(risks['Severity Level'], errors='coerce')
+    
+    tables = {'projects': projects, 'milestones': milestones, 'risks': risks}
+    for name, table in tables.items():
+        for column in BOOLEAN_COLUMNS[name]:
+            table[column] = table[column] == 'Yes'
+    return tables
+
+def load_tables(source='db', **options):
+    """
+    Load the chart tables
+    
+    Args:
+        source: 'db' reads the live database; 'files' reads the newest export in docs/
+        options: Passed to load_db_tables (bind, now, chunksize) or the file loaders (docs_dir)
+    
+    Returns:
+        Dictionary with 'projects', 'milestones' and 'risks' DataFrames
+    """
+    if source == 'db':
+        return load_db_tables(**options)
+    if source == 'files':
+        return load_parquet_tables(**options) or load_csv_tables(**options)
+    raise ValueError(f'Unknown chart data source: {source}')
@@ -0,0 +1,188 @@
+"""
+Data Version Counters for Project Tracker
+Monotonic counters bumped in the same transaction as every project, milestone or risk write
+
+There is one global counter plus one per table ('projects', 'milestones',
+'risks'). Caches of derived data (rendered charts, aggregates, API ETags) store
+the versions they were built from and are reused for as long as the counters
+have not moved. The counters live in the database, so every app process and
+script sees the same values.
+
+`data_versions` keeps an in-process copy of the counters so that checking them
+costs no query. It is refreshed after every commit in this process that bumped
+a counter, and re-read from the database at most every DATA_VERSION_TTL seconds
+(default 1) to pick up writes made by other processes.
+"""
+
+from sqlalchemy import event, insert, select, update
+from models import Project, Milestone, Risk, DataVersion
+from datetime import datetime
+import os
+import threading
+import time
+
+GLOBAL = 'global'
+TRACKED_MODELS = (Project, Milestone, Risk)
+TRACKED_TABLES = tuple(model.__tablename__ for model in TRACKED_MODELS)
+
+DATA_VERSION_TTL = float(os.getenv('DATA_VERSION_TTL', '1'))
+
+# session.info key holding the tables bumped by the current transaction
+_BUMPED_KEY = 'data_version_bumped'
+
+
+def bump_data_version(session, tables=()):
+    """
+    Increment the global counter and those of `tables` inside the caller's transaction
+
+    Args:
+        session: Session whose transaction receives the update
+        tables: Names of the tracked tables that were written
+    """
+    names = [GLOBAL] + sorted(set(tables))
+    connection = session.connection()
+    now = datetime.utcnow()
+    result = connection.execute(
+        update(DataVersion)
+        .where(DataVersion.name.in_(names))
+        .values(version=DataVersion.version + 1, updated_at=now)
+    )
+    if result.rowcount < len(names):
+        # Counter rows not seeded yet; a concurrent first write may insert the same row
+        existing = set(connection.execute(
+            select(DataVersion.name).where(DataVersion.name.in_(names))
+        ).scalars())
+        connection.execute(_insert_or_bump(connection.dialect.name, now), [
+            {'name': name, 'version': 1, 'updated_at': now} for name in names if name not in existing
+        ])
+    session.info.setdefault(_BUMPED_KEY, set()).update(names)
+
+
+def _insert_or_bump(dialect, now):
+    """INSERT of new counter rows that bumps the row instead when it already exists"""
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return insert(DataVersion)
+    return dialect_insert(DataVersion).on_conflict_do_update(
+        index_elements=[DataVersion.name],
+        set_={'version': DataVersion.version + 1, 'updated_at': now},
+    )
+
+
+def seed_data_versions(connection):
+    """Create every counter row at version 0, so writes only ever UPDATE them"""
+    existing = set(connection.execute(select(DataVersion.name)).scalars())
+    missing = [name for name in (GLOBAL,) + TRACKED_TABLES if name not in existing]
+    if missing:
+        connection.execute(insert(DataVersion), [
+            {'name': name, 'version': 0, 'updated_at': None} for name in missing
+        ])
+
+
+def current_data_version(session, name=GLOBAL):
+    """
+    Current value of one counter
+
+    Returns:
+        Tuple of (version, updated_at); (0, None) before the first tracked write
+    """
+    row = session.execute(
+        select(DataVersion.version, DataVersion.updated_at).where(DataVersion.name == name)
+    ).first()
+    return (row.version, row.updated_at) if row else (0, None)
+
+
+def read_data_versions(session):
+    """All counters as {name: version}; counters never bumped read as 0"""
+    versions = dict.fromkeys((GLOBAL,) + TRACKED_TABLES, 0)
+    versions.update(session.execute(select(DataVersion.name, DataVersion.version)).all())
+    return versions
+
+
+class DataVersionCache:
+    """In-process copy of the counters, shared by every request of this process"""
+
+    def __init__(self, ttl=DATA_VERSION_TTL):
+        self.ttl = ttl
+        self._versions = None
+        self._read_at = 0.0
+        # Bumped by invalidate(); a read that started before an invalidation is not stored
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, session_factory):
+        """
+        Current counters, read from the database only when the copy is missing or expired
+
+        Args:
+            session_factory: Callable returning a new Session
+
+        Returns:
+            Dictionary of counter name -> version
+        """
+        with self._lock:
+            versions, generation = self._versions, self._generation
+            if versions is not None and time.monotonic() - self._read_at < self.ttl:
+                return versions
+
+        read_at = time.monotonic()
+        session = session_factory()
+        try:
+            versions = read_data_versions(session)
+        finally:
+            session.close()
+
+        with self._lock:
+            if generation == self._generation:
+                self._versions, self._read_at = versions, read_at
+        return versions
+
+    def invalidate(self):
+        with self._lock:
+            self._versions = None
+            self._generation += 1
+
+
+# Global instance used by the Flask app
+data_versions = DataVersionCache()
+
+
+def _bump_on_flush(session, flush_context):
+    """after_flush hook: bump once per flush that wrote a tracked row"""
+    changed = list(session.new) + list(session.deleted) + [
+        obj for obj in session.dirty if session.is_modified(obj)
+    ]
+    tables = {obj.__tablename__ for obj in changed if isinstance(obj, TRACKED_MODELS)}
+    if tables:
+        bump_data_version(session, tables)
+
+
+def _bump_on_bulk_statement(orm_execute_state):
+    """do_orm_execute hook: bulk INSERT/UPDATE/DELETE statements bypass the flush"""
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and issubclass(mapper.class_, TRACKED_MODELS):
+        bump_data_version(orm_execute_state.session, [mapper.class_.__tablename__])
+
+
+def _refresh_on_commit(session):
+    """after_commit hook: drop the in-process copy once new counters are visible"""
+    if session.info.pop(_BUMPED_KEY, None):
+        data_versions.invalidate()
+
+
+def _forget_on_rollback(session):
+    """after_rollback hook: the bumps were rolled back with the writes"""
+    session.info.pop(_BUMPED_KEY, None)
+
+
+def track_data_version(session_factory):
+    """Bump the data versions on every write made through `session_factory`"""
+    event.listen(session_factory, 'after_flush', _bump_on_flush)
+    event.listen(session_factory, 'do_orm_execute', _bump_on_bulk_statement)
+    event.listen(session_factory, 'after_commit', _refresh_on_commit)
+    event.listen(session_factory, 'after_rollback', _forget_on_rollback)
@@ -0,0 +1,294 @@
+"""
+Change Events for Project Tracker
+Publishes project, milestone and risk changes to the /api/events Server-Sent Events stream
+
+Session hooks collect the rows each transaction wrote and publish one event per
+row after the commit, so every write handler is covered. Bulk statements and
+transactions touching more than EVENTS_MAX_PER_COMMIT rows publish a single
+'bulk' event per table instead; clients reload that table.
+
+By default events are delivered in-process, which reaches the subscribers of
+this app process only. With several worker processes, set EVENTS_REDIS_URL to a
+Redis-compatible server (Redis, Valkey, KeyDB) and events go through its
+pub/sub channel instead (requires the `redis` package).
+
+Settings (environment variables):
+    EVENTS_REDIS_URL        Pub/sub server URL, e.g. redis://localhost:6379/0 (default: in-process)
+    EVENTS_CHANNEL          Pub/sub channel name (default: project-tracker:changes)
+    EVENTS_QUEUE_SIZE       Events buffered per subscriber before it is told to resync (default: 100)
+    EVENTS_MAX_PER_COMMIT   Row events per transaction before falling back to 'bulk' (default: 100)
+"""
+
+from sqlalchemy import event, select
+from models import Project, Milestone, Risk
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+REDIS_URL = os.environ.get('EVENTS_REDIS_URL')
+CHANNEL = os.environ.get('EVENTS_CHANNEL', 'project-tracker:changes')
+QUEUE_SIZE = int(os.environ.get('EVENTS_QUEUE_SIZE', 100))
+MAX_PER_COMMIT = int(os.environ.get('EVENTS_MAX_PER_COMMIT', 100))
+
+TRACKED_MODELS = (Project, Milestone, Risk)
+
+# Sent to a subscriber that may have missed events; it should reload everything
+RESYNC = {'type': 'resync'}
+
+# session.info keys holding the changes of the current transaction
+_CHANGES_KEY = 'change_events'
+_BULK_KEY = 'change_events_bulk'
+
+logger = logging.getLogger(__name__)
+
+
+def format_sse(change):
+    """Encode one event in the text/event-stream format, named after its table"""
+    return f"event: {change['type']}\ndata: {json.dumps(change)}\n\n"
+
+
+class Subscription:
+    """Bounded queue of events for one stream; use as a context manager"""
+
+    def __init__(self, broker, maxsize):
+        self._broker = broker
+        self._queue = queue.Queue(maxsize)
+        self._overflowed = False
+
+    def put(self, change):
+        try:
+            self._queue.put_nowait(change)
+        except queue.Full:
+            self._overflowed = True
+
+    def get(self, timeout=None):
+        """
+        Next event, waiting up to `timeout` seconds
+
+        Returns:
+            The event, RESYNC after events were dropped, or None on timeout
+        """
+        if self._overflowed:
+            self._overflowed = False
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            return RESYNC
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self._broker.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class EventBroker:
+    """In-process pub/sub: every published event goes to every subscriber of this process"""
+
+    def __init__(self, queue_size=QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def publish(self, change):
+        self._deliver(change)
+
+    def subscribe(self):
+        subscription = Subscription(self, self.queue_size)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def _deliver(self, change):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.put(change)
+
+
+class RedisEventBroker(EventBroker):
+    """Pub/sub through a Redis-compatible server, so events reach the subscribers of every process"""
+
+    def __init__(self, url, channel=CHANNEL, queue_size=QUEUE_SIZE):
+        import redis
+
+        super().__init__(queue_size)
+        self._redis = redis.Redis.from_url(url)
+        self._channel = channel
+        self._listener = None
+
+    def publish(self, change):
+        # Delivered locally by the listener thread, like events from other processes
+        self._redis.publish(self._channel, json.dumps(change))
+
+    def subscribe(self):
+        subscription = super().subscribe()
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name='change-events', daemon=True)
+                self._listener.start()
+        return subscription
+
+    def _listen(self):
+        """Forward channel messages to local subscribers, reconnecting after failures"""
+        import redis
+
+        while True:
+            pubsub = None
+            try:
+                pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self._channel)
+                for message in pubsub.listen():
+                    try:
+                        change = json.loads(message['data'])
+                        change['type']
+                    except (ValueError, KeyError, TypeError) as e:
+                        # Not one of ours (e.g. another publisher on the channel); skip it
+                        logger.warning('Ignoring malformed change event: %s', e)
+                        continue
+                    self._deliver(change)
+            except redis.RedisError as e:
+                logger.warning('Change event listener disconnected: %s', e)
+            except Exception:
+                # Never let the thread die: subscribers would silently stop receiving events
+                logger.exception('Change event listener failed; restarting')
+            finally:
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+            # Events published meanwhile are lost
+            self._deliver(RESYNC)
+            time.sleep(1)
+
+
+def create_broker():
+    return RedisEventBroker(REDIS_URL) if REDIS_URL else EventBroker()
+
+
+# Global instance used by the Flask app and the session hooks
+change_events = create_broker()
+
+
+def _record(session, table, op, row_id, project_id, data):
+    """Merge one row change into the transaction's pending events"""
+    changes = session.info.setdefault(_CHANGES_KEY, {})
+    if changes is None:
+        # Already over MAX_PER_COMMIT; this transaction reports 'bulk'
+        session.info[_BULK_KEY].add(table)
+        return
+
+    key = (table, row_id)
+    previous = changes.get(key)
+    if previous and previous['op'] == 'created':
+        if op == 'deleted':
+            del changes[key]  # Created and deleted in the same transaction
+            return
+        op = 'created'
+    changes[key] = {'type': table, 'op': op, 'id': row_id, 'project_id': project_id, 'data': data}
+
+    if len(changes) > MAX_PER_COMMIT:
+        session.info.setdefault(_BULK_KEY, set()).update(table for table, _ in changes)
+        session.info[_CHANGES_KEY] = None
+
+
+def _project_id(obj):
+    return obj.id if isinstance(obj, Project) else obj.project_id
+
+
+def _collect_on_flush(session, flush_context):
+    """after_flush hook: remember the latest state of every tracked row written"""
+    written = [(obj, 'created') for obj in session.new] + [
+        (obj, 'updated') for obj in session.dirty if session.is_modified(obj)
+    ] + [(obj, 'deleted') for obj in session.deleted]
+    for obj, op in written:
+        if isinstance(obj, TRACKED_MODELS):
+            data = obj.to_dict() if op != 'deleted' else None
+            _record(session, obj.__tablename__, op, obj.id, _project_id(obj), data)
+
+
+def _collect_bulk_statement(orm_execute_state):
+    """
+    do_orm_execute hook: statements that bypass the flush
+
+    UPDATE and DELETE statements matching up to MAX_PER_COMMIT rows (such as
+    recalculate_completion() for one project) report each row; INSERTs and
+    wider statements report their table as 'bulk'.
+    """
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or not issubclass(mapper.class_, TRACKED_MODELS):
+        return
+
+    session = orm_execute_state.session
+    model = mapper.class_
+    table = model.__tablename__
+    whereclause = None if orm_execute_state.is_insert else orm_execute_state.statement.whereclause
+    if whereclause is None or session.info.get(_CHANGES_KEY, {}) is None:
+        session.info.setdefault(_BULK_KEY, set()).add(table)
+        return
+
+    project_id_column = model.id if model is Project else model.project_id
+    matched = session.execute(
+        select(model.id, project_id_column).where(whereclause).limit(MAX_PER_COMMIT + 1)
+    ).all()
+    if len(matched) > MAX_PER_COMMIT:
+        session.info.setdefault(_BULK_KEY, set()).add(table)
+        return
+
+    result = orm_execute_state.invoke_statement()
+    if orm_execute_state.is_delete:
+        for row_id, project_id in matched:
+            _record(session, table, 'deleted', row_id, project_id, None)
+    elif matched:
+        rows = session.scalars(
+            select(model).where(model.id.in_([row_id for row_id, _ in matched]))
+            .execution_options(populate_existing=True)
+        )
+        for obj in rows:
+            _record(session, table, 'updated', obj.id, _project_id(obj), obj.to_dict())
+    return result
+
+
+def _publish_on_commit(session):
+    """after_commit hook: publish what the transaction wrote"""
+    changes = session.info.pop(_CHANGES_KEY, None) or {}
+    bulk = session.info.pop(_BULK_KEY, None) or set()
+    published = [{'type': table, 'op': 'bulk'} for table in sorted(bulk)] + [
+        change for (table, _), change in changes.items() if table not in bulk
+    ]
+    try:
+        for change in published:
+            change_events.publish(change)
+    except Exception as e:
+        # The transaction is already committed; clients catch up on their next resync
+        logger.warning('Could not publish change events: %s', e)
+
+
+def _forget_on_rollback(session):
+    """after_rollback hook: nothing was written"""
+    session.info.pop(_CHANGES_KEY, None)
+    session.info.pop(_BULK_KEY, None)
+
+
+def track_change_events(session_factory):
+    """Publish change events for every write committed through `session_factory`"""
+    event.listen(session_factory, 'after_flush', _collect_on_flush)
+    event.listen(session_factory, 'do_orm_execute', _collect_bulk_statement)
+    event.listen(session_factory, 'after_commit', _publish_on_commit)
+    event.listen(session_factory, 'after_rollback', _forget_on_rollback)
@@ -5,25 +5,98 @@ from reportlab.platypus import Image, Paragraph, SimpleDocTemplate, Spacer
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib import colors
 from pathlib import Path
+import argparse
+import io
+import json
+
+from chart_data import load_tables
+from kpi import CHARTS, render_chart
 
 
 def add_image(flow, path, max_width=500):
     p = Path(path)
     if not p.exists():
         return
-    img = Image(str(p))
-    # scale by width
+    add_image_data(flow, str(p), max_width)
+
+
+def add_image_data(flow, source, max_width=500, max_height=600):
+    img = Image(source)
+    # scale by width, and by height for tall charts (e.g. the heatmap on large portfolios)
     w, h = img.wrap(0, 0)
-    if w > max_width:
-        scale = max_width / w
-        img._width = w * scale
-        img._height = h * scale
+    scale = min(1, max_width / w, max_height / h)
+    if scale < 1:
+        img.drawWidth = w * scale
+        img.drawHeight = h * scale
     flow.append(img)
     flow.append(Spacer(1, 0.2 * inch))
 
 
+def chart_images(source, base_url=None):
+    """
+    Chart images for the report, in registry order
+
+    source "db" renders each chart in memory from the live database; "charts"
+    uses the PNGs already in charts/ (python kpi.py); "api" downloads them from
+    a running server (see fetch_api_charts).
+    """
+    if source == "api":
+        return fetch_api_charts(base_url)
+    if source == "charts":
+        charts_dir = Path("charts")
+        return [charts_dir / name for name in CHARTS if (charts_dir / name).exists()]
+
+    tables = load_tables("db")
+    images = []
+    for name in CHARTS:
+        buffer = io.BytesIO()
+        if render_chart(name, tables, buffer, format="png"):
+            buffer.seek(0)
+            images.append(buffer)
+    return images
+
+
+API_BASE_URL = "http://localhost:5000"
+API_CACHE_DIR = Path("charts") / "api"
+
+
+def fetch_api_charts(base_url, cache_dir=API_CACHE_DIR):
+    """
+    Download the charts from /api/charts, revalidating local copies with their ETags
+
+    Unchanged charts come back as 304 and are read from cache_dir instead of being
+    rendered or transferred again.
+    """
+    import requests
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    etags_file = cache_dir / "etags.json"
+    etags = json.loads(etags_file.read_text()) if etags_file.exists() else {}
+
+    images = []
+    for name in CHARTS:
+        path = cache_dir / name
+        headers = {"If-None-Match": etags[name]} if name in etags and path.exists() else {}
+        response = requests.get(f"{base_url}/api/charts/{name}", headers=headers, timeout=60)
+        if response.status_code == 200:
+            path.write_bytes(response.content)
+            etags[name] = response.headers.get("ETag", "")
+        elif response.status_code != 304:
+            continue  # e.g. 404 for a chart with no data yet
+        images.append(path)
+
+    etags_file.write_text(json.dumps(etags, indent=2))
+    return images
+
+
 def main():
-    charts_dir = Path("charts")
+    parser = argparse.ArgumentParser(description="Build ProjectReport.pdf")
+    parser.add_argument("--source", choices=["db", "charts", "api"], default="db",
+                        help="db: render charts from the live database; charts: use the PNGs in charts/; "
+                             "api: download them from a running server")
+    parser.add_argument("--base-url", default=API_BASE_URL, help="Server URL for --source api")
+    args = parser.parse_args()
+
     out = Path("ProjectReport.pdf")
 
     styles = getSampleStyleSheet()
@@ -53,20 +126,15 @@ def main():
     story.append(Spacer(1, 0.25 * inch))
 
     story.append(Paragraph("KPI Visualizations", styles["Title2"]))
-    for name in [
-        "status_distribution.png",
-        "completion_by_owner.png",
-        "status_by_owner.png",
-        "risk_severity.png",
-        "completion_vs_days_remaining.png",
-        "milestones_completed_over_time.png",
-        "risk_heatmap.png",
-    ]:
-        add_image(story, charts_dir / name, max_width=460)
+    for image in chart_images(args.source, args.base_url):
+        if isinstance(image, Path):
+            add_image(story, image, max_width=460)
+        else:
+            add_image_data(story, image, max_width=460)
 
     story.append(Paragraph("Notes", styles["Title2"]))
     story.append(Paragraph(
-        "All charts are generated from the latest Power BI exports under docs. Use python kpi.py to refresh visuals.",
+        "All charts are generated from the project database at report time. Use python kpi.py to refresh the images under charts.",
         styles["Body"],
     ))
 
@@ -3,15 +3,13 @@ Jira CSV Export Script
 Exports Project Tracker data to Jira-compatible CSV format
 """
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from models import Project, Milestone, Risk, ProjectStatus, MilestoneStatus, RiskSeverity
-from datetime import datetime
+from models import Project, Milestone, Risk, ExportWatermark, ProjectStatus, MilestoneStatus, RiskSeverity
+from db import Session
+from sqlalchemy import select, or_
+from datetime import datetime, timedelta
+import argparse
 import csv
-
-# Database setup
-engine = create_engine('sqlite:///projecttracker.db', echo=False)
-Session = sessionmaker(bind=engine)
+import io
 
 def map_status_to_jira(project_status):
     """Map Project Tracker status to Jira status"""
@@ -43,224 +41,344 @@ def map_priority(severity):
     }
     return priority_map.get(severity, 'Medium')
 
-def export_to_jira_csv(project_key='PT', assignee=None):
+# Jira CSV Import Headers
+# Note: Epic Name field ID may vary - you might need to adjust customfield_10011
+JIRA_HEADERS = [
+    'Work Item ID',     # Unique identifier for each issue (required)
+    'Summary',           # Issue title
+    'Work Type',        # Epic, Story, Task (required - alternative to Issue Type)
+    'Issue Type',       # Epic, Story, Task (keep for compatibility)
+    'Project Key',      # Your Jira project key
+    'Description',      # Issue description
+    'Epic Name',        # For Epics
+    'Epic Link',        # For Stories (links to Epic)
+    'Parent ID',        # Parent work item ID (required for linking)
+    'Parent',           # Alternative to Epic Link
+    'Priority',         # Highest, High, Medium, Low
+    'Status',           # To Do, In Progress, Done, etc.
+    'Labels',           # Comma-separated labels
+    'Due Date',         # YYYY-MM-DD format
+    'Assignee',         # Jira username (optional)
+    'Story Points',     # For Stories
+]
+
+# Rows fetched per round trip; on PostgreSQL this also enables a server-side cursor
+EXPORT_BATCH_SIZE = 1000
+
+# Watermark key of this exporter in the export_watermarks table
+WATERMARK_EXPORT = 'jira'
+
+# Delta exports look this far behind the watermark: updated_at is stamped when a
+# row is flushed, so a transaction committing after the previous export can carry
+# older timestamps. Rows in the overlap are exported again, which Jira treats as
+# an update thanks to the stable Work Item IDs.
+WATERMARK_OVERLAP = timedelta(minutes=5)
+
+def epic_work_id(project_id):
+    """Stable Work Item IDs, so re-exported issues update instead of duplicating"""
+    return f"EPIC-{project_id}"
+
+def story_work_id(milestone_id):
+    return f"STORY-{milestone_id}"
+
+def risk_work_id(risk_id):
+    return f"RISK-{risk_id}"
+
+def load_watermarks(session, export=WATERMARK_EXPORT):
     """
-    Export all projects, milestones, and risks to Jira CSV format
+    High-water marks of the previous export
     
-    Args:
-        project_key: Your Jira project key (default: PT)
-        assignee: Assignee username (leave None to leave unassigned)
+    Returns:
+        Dictionary of entity ('projects', 'milestones', 'risks') -> last exported updated_at
     """
-    session = Session()
+    rows = session.query(ExportWatermark).filter_by(export=export).all()
+    return {row.entity: row.high_water for row in rows}
+
+def save_watermarks(session, high_water, export=WATERMARK_EXPORT):
+    """Record the newest updated_at exported per entity (caller commits)"""
+    for entity, value in high_water.items():
+        if value is None:
+            continue
+        row = session.get(ExportWatermark, (export, entity))
+        if row is None:
+            session.add(ExportWatermark(export=export, entity=entity, high_water=value))
+        elif row.high_water is None or value > row.high_water:
+            row.high_water = value
+
+def epic_row(project, epic_work_id, project_key, assignee, now):
+    """Jira Epic row for a project"""
+    epic_name = project.name
     
-    try:
-        # Open CSV file for writing
-        filename = f'jira_import_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
-        with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.writer(csvfile)
-            
-            # Jira CSV Import Headers
-            # Note: Epic Name field ID may vary - you might need to adjust customfield_10011
-            headers = [
-                'Work Item ID',     # Unique identifier for each issue (required)
-                'Summary',           # Issue title
-                'Work Type',        # Epic, Story, Task (required - alternative to Issue Type)
-                'Issue Type',       # Epic, Story, Task (keep for compatibility)
-                'Project Key',      # Your Jira project key
-                'Description',      # Issue description
-                'Epic Name',        # For Epics
-                'Epic Link',        # For Stories (links to Epic)
-                'Parent ID',        # Parent work item ID (required for linking)
-                'Parent',           # Alternative to Epic Link
-                'Priority',         # Highest, High, Medium, Low
-                'Status',           # To Do, In Progress, Done, etc.
-                'Labels',           # Comma-separated labels
-                'Due Date',         # YYYY-MM-DD format
-                'Assignee',         # Jira username (optional)
-                'Story Points',     # For Stories
-            ]
-            
-            writer.writerow(headers)
-            
-            projects = session.query(Project).all()
-            epic_keys = {}  # Store Epic keys for linking stories
-            epic_work_ids = {}  # Store Work Item IDs for Epics (for Parent ID linking)
-            work_item_counter = 1  # Counter for unique Work Item IDs
-            
-            # First pass: Create Epics
-            for project in projects:
-                # Create Epic
-                epic_name = project.name
-                epic_key = f"{project_key}-EPIC-{project.id}"  # Temporary key for reference
-                epic_keys[project.id] = epic_name
-                epic_work_id = f"EPIC-{work_item_counter}"  # Unique Work Item ID for this Epic
-                epic_work_ids[project.id] = epic_work_id
-                work_item_counter += 1
-                
-                # Build description
-                description = f"""Owner: {project.owner}
+    # Build description
+    description = f"""Owner: {project.owner}
 Status: {project.status.value}
 Completion: {project.completion_percentage}%
 Start Date: {project.start_date.strftime('%Y-%m-%d')}
 Deadline: {project.deadline.strftime('%Y-%m-%d')}
 
 {project.description or 'No description provided'}"""
-                
-                # Determine priority based on deadline
-                now = datetime.now()
-                days_remaining = (project.deadline - now).days
-                if days_remaining < 0:
-                    priority = 'Highest'
-                elif days_remaining < 15:
-                    priority = 'High'
-                else:
-                    priority = 'Medium'
-                
-                # Build labels
-                labels = ['project-tracker', project.status.value.lower().replace(' ', '-')]
-                if project.completion_percentage >= 80:
-                    labels.append('high-completion')
-                
-                row = [
-                    epic_work_id,          # Work Item ID
-                    epic_name,              # Summary
-                    'Epic',                 # Work Type
-                    'Epic',                 # Issue Type (for compatibility)
-                    project_key,            # Project Key
-                    description,           # Description
-                    epic_name,             # Epic Name (required for Epic type)
-                    '',                    # Epic Link (not needed for Epics)
-                    '',                    # Parent ID (Epics have no parent)
-                    '',                    # Parent (alternative)
-                    priority,             # Priority
-                    map_status_to_jira(project.status.value),  # Status
-                    ','.join(labels),      # Labels
-                    project.deadline.strftime('%Y-%m-%d'),  # Due Date
-                    assignee or '',        # Assignee
-                    '',                    # Story Points (not for Epics)
-                ]
-                writer.writerow(row)
-            
-            # Second pass: Create Stories (from Milestones)
-            for project in projects:
-                milestones = session.query(Milestone).filter_by(project_id=project.id).all()
-                
-                for milestone in milestones:
-                    # Build description
-                    description = f"""Target Date: {milestone.target_date.strftime('%Y-%m-%d')}
+    
+    # Determine priority based on deadline
+    days_remaining = (project.deadline - now).days
+    if days_remaining < 0:
+        priority = 'Highest'
+    elif days_remaining < 15:
+        priority = 'High'
+    else:
+        priority = 'Medium'
+    
+    # Build labels
+    labels = ['project-tracker', project.status.value.lower().replace(' ', '-')]
+    if project.completion_percentage >= 80:
+        labels.append('high-completion')
+    
+    return [
+        epic_work_id,          # Work Item ID
+        epic_name,              # Summary
+        'Epic',                 # Work Type
+        'Epic',                 # Issue Type (for compatibility)
+        project_key,            # Project Key
+        description,           # Description
+        epic_name,             # Epic Name (required for Epic type)
+        '',                    # Epic Link (not needed for Epics)
+        '',                    # Parent ID (Epics have no parent)
+        '',                    # Parent (alternative)
+        priority,             # Priority
+        map_status_to_jira(project.status.value),  # Status
+        ','.join(labels),      # Labels
+        project.deadline.strftime('%Y-%m-%d'),  # Due Date
+        assignee or '',        # Assignee
+        '',                    # Story Points (not for Epics)
+    ]
+
+def story_row(milestone, story_work_id, epic_name, parent_work_id, project_key, assignee, now):
+    """Jira Story row for a milestone"""
+    # Build description
+    description = f"""Target Date: {milestone.target_date.strftime('%Y-%m-%d')}
 Status: {milestone.status.value}
 
 {milestone.description or 'No description provided'}"""
-                    
-                    if milestone.completion_date:
-                        description += f"\nCompleted: {milestone.completion_date.strftime('%Y-%m-%d')}"
-                    
-                    # Estimate story points based on milestone position
-                    # You can adjust this logic
-                    story_points = 5  # Default
-                    if 'Planning' in milestone.name or 'Design' in milestone.name:
-                        story_points = 3
-                    elif 'Development' in milestone.name or 'Implementation' in milestone.name:
-                        story_points = 8
-                    elif 'Testing' in milestone.name or 'QA' in milestone.name:
-                        story_points = 5
-                    elif 'Deployment' in milestone.name or 'Release' in milestone.name:
-                        story_points = 3
-                    elif 'Documentation' in milestone.name:
-                        story_points = 2
-                    
-                    # Determine priority
-                    now = datetime.now()
-                    if milestone.target_date < now and milestone.status.value != 'Completed':
-                        priority = 'Highest'
-                    elif (milestone.target_date - now).days < 7:
-                        priority = 'High'
-                    else:
-                        priority = 'Medium'
-                    
-                    labels = ['project-tracker', 'milestone', milestone.status.value.lower().replace(' ', '-')]
-                    
-                    story_work_id = f"STORY-{work_item_counter}"  # Unique Work Item ID for this Story
-                    work_item_counter += 1
-                    parent_work_id = epic_work_ids[project.id]  # Parent Epic's Work Item ID
-                    
-                    row = [
-                        story_work_id,     # Work Item ID
-                        milestone.name,   # Summary
-                        'Story',          # Work Type
-                        'Story',          # Issue Type (for compatibility)
-                        project_key,      # Project Key
-                        description,      # Description
-                        '',               # Epic Name (not for Stories)
-                        epic_keys[project.id],  # Epic Link (links to parent Epic)
-                        parent_work_id,   # Parent ID (links to Epic's Work Item ID)
-                        '',               # Parent (alternative)
-                        priority,        # Priority
-                        map_milestone_status_to_jira(milestone.status.value),  # Status
-                        ','.join(labels), # Labels
-                        milestone.target_date.strftime('%Y-%m-%d'),  # Due Date
-                        assignee or '',   # Assignee
-                        str(story_points),  # Story Points
-                    ]
-                    writer.writerow(row)
-            
-            # Third pass: Create Risk Issues
-            for project in projects:
-                risks = session.query(Risk).filter_by(project_id=project.id).all()
-                
-                for risk in risks:
-                    # Build description
-                    description = f"""Severity: {risk.severity.value}
+    
+    if milestone.completion_date:
+        description += f"\nCompleted: {milestone.completion_date.strftime('%Y-%m-%d')}"
+    
+    # Estimate story points based on milestone position
+    # You can adjust this logic
+    story_points = 5  # Default
+    if 'Planning' in milestone.name or 'Design' in milestone.name:
+        story_points = 3
+    elif 'Development' in milestone.name or 'Implementation' in milestone.name:
+        story_points = 8
+    elif 'Testing' in milestone.name or 'QA' in milestone.name:
+        story_points = 5
+    elif 'Deployment' in milestone.name or 'Release' in milestone.name:
+        story_points = 3
+    elif 'Documentation' in milestone.name:
+        story_points = 2
+    
+    # Determine priority
+    if milestone.target_date < now and milestone.status.value != 'Completed':
+        priority = 'Highest'
+    elif (milestone.target_date - now).days < 7:
+        priority = 'High'
+    else:
+        priority = 'Medium'
+    
+    labels = ['project-tracker', 'milestone', milestone.status.value.lower().replace(' ', '-')]
+    
+    return [
+        story_work_id,     # Work Item ID
+        milestone.name,   # Summary
+        'Story',          # Work Type
+        'Story',          # Issue Type (for compatibility)
+        project_key,      # Project Key
+        description,      # Description
+        '',               # Epic Name (not for Stories)
+        epic_name,        # Epic Link (links to parent Epic)
+        parent_work_id,   # Parent ID (links to Epic's Work Item ID)
+        '',               # Parent (alternative)
+        priority,        # Priority
+        map_milestone_status_to_jira(milestone.status.value),  # Status
+        ','.join(labels), # Labels
+        milestone.target_date.strftime('%Y-%m-%d'),  # Due Date
+        assignee or '',   # Assignee
+        str(story_points),  # Story Points
+    ]
+
+def risk_row(risk, risk_work_id, epic_name, parent_work_id, project_key, assignee):
+    """Jira Task row for a risk"""
+    # Build description
+    description = f"""Severity: {risk.severity.value}
 Status: {risk.status}
 
 {risk.description or 'No description provided'}"""
-                    
-                    if risk.mitigation_plan:
-                        description += f"\n\nMitigation Plan:\n{risk.mitigation_plan}"
-                    
-                    labels = ['project-tracker', 'risk', risk.severity.value.lower(), risk.status.lower()]
-                    
-                    # Map risk status to Jira status
-                    if risk.status == 'Closed':
-                        jira_status = 'Done'
-                    elif risk.status == 'Mitigated':
-                        jira_status = 'In Progress'
-                    else:
-                        jira_status = 'To Do'
-                    
-                    risk_work_id = f"RISK-{work_item_counter}"  # Unique Work Item ID for this Risk
-                    work_item_counter += 1
-                    parent_work_id = epic_work_ids[project.id]  # Parent Epic's Work Item ID
-                    
-                    row = [
-                        risk_work_id,     # Work Item ID
-                        risk.name,        # Summary
-                        'Task',           # Work Type
-                        'Task',           # Issue Type (for compatibility)
-                        project_key,      # Project Key
-                        description,      # Description
-                        '',               # Epic Name
-                        epic_keys[project.id],  # Epic Link
-                        parent_work_id,   # Parent ID (links to Epic's Work Item ID)
-                        '',               # Parent (alternative)
-                        map_priority(risk.severity.value),  # Priority
-                        jira_status,      # Status
-                        ','.join(labels), # Labels
-                        '',               # Due Date (risks don't have due dates)
-                        assignee or '',   # Assignee
-                        '',               # Story Points (not for risks)
-                    ]
-                    writer.writerow(row)
+    
+    if risk.mitigation_plan:
+        description += f"\n\nMitigation Plan:\n{risk.mitigation_plan}"
+    
+    labels = ['project-tracker', 'risk', risk.severity.value.lower(), risk.status.lower()]
+    
+    # Map risk status to Jira status
+    if risk.status == 'Closed':
+        jira_status = 'Done'
+    elif risk.status == 'Mitigated':
+        jira_status = 'In Progress'
+    else:
+        jira_status = 'To Do'
+    
+    return [
+        risk_work_id,     # Work Item ID
+        risk.name,        # Summary
+        'Task',           # Work Type
+        'Task',           # Issue Type (for compatibility)
+        project_key,      # Project Key
+        description,      # Description
+        '',               # Epic Name
+        epic_name,        # Epic Link
+        parent_work_id,   # Parent ID (links to Epic's Work Item ID)
+        '',               # Parent (alternative)
+        map_priority(risk.severity.value),  # Priority
+        jira_status,      # Status
+        ','.join(labels), # Labels
+        '',               # Due Date (risks don't have due dates)
+        assignee or '',   # Assignee
+        '',               # Story Points (not for risks)
+    ]
+
+def iter_jira_rows(session, project_key='PT', assignee=None, counts=None, batch_size=EXPORT_BATCH_SIZE,
+                   since=None):
+    """
+    Yield Jira CSV rows (header first) in a single pass over the database
+    
+    Epics stream from the projects table; stories and risk tasks stream from
+    milestone and risk queries joined to their project, ordered so they come out
+    grouped by project exactly as Jira expects. Work Item IDs derive from entity
+    ids, so nothing is kept in memory between rows. In a delta export the Epic of
+    every emitted story or risk is emitted too, even if the project is unchanged.
+    
+    Args:
+        session: Database session
+        project_key: Your Jira project key
+        assignee: Assignee username (None leaves issues unassigned)
+        counts: Optional dictionary updated with epics/stories/risks as rows are written,
+            plus 'high_water' (newest updated_at emitted per entity)
+        batch_size: Rows fetched per round trip
+        since: Optional dictionary of entity -> updated_at; only rows changed after it
+            (less WATERMARK_OVERLAP) are emitted
+    """
+    counts = counts if counts is not None else {}
+    counts.update(epics=0, stories=0, risks=0)
+    since = since or {}
+    high_water = counts['high_water'] = dict(since)
+    now = datetime.now()
+    
+    def changed(model, entity):
+        return model.updated_at > since[entity] - WATERMARK_OVERLAP if since.get(entity) else True
+    
+    def advance(entity, updated_at):
+        if updated_at and (high_water.get(entity) is None or updated_at > high_water[entity]):
+            high_water[entity] = updated_at
+    
+    yield JIRA_HEADERS
+    
+    # Epics (from Projects)
+    project_filter = changed(Project, 'projects')
+    if since:
+        # Parents of changed stories and risks, so their links resolve on import
+        project_filter = or_(
+            project_filter,
+            Project.id.in_(select(Milestone.project_id).where(changed(Milestone, 'milestones'))),
+            Project.id.in_(select(Risk.project_id).where(changed(Risk, 'risks'))),
+        )
+    projects = session.execute(
+        select(Project)
+        .where(project_filter)
+        .order_by(Project.id)
+        .execution_options(yield_per=batch_size)
+    ).scalars()
+    for project in projects:
+        yield epic_row(project, epic_work_id(project.id), project_key, assignee, now)
+        counts['epics'] += 1
+        advance('projects', project.updated_at)
+    
+    # Stories (from Milestones)
+    milestones = session.execute(
+        select(Milestone, Project.name)
+        .join(Project, Milestone.project_id == Project.id)
+        .where(changed(Milestone, 'milestones'))
+        .order_by(Project.id, Milestone.id)
+        .execution_options(yield_per=batch_size)
+    )
+    for milestone, epic_name in milestones:
+        yield story_row(milestone, story_work_id(milestone.id), epic_name, epic_work_id(milestone.project_id),
+                        project_key, assignee, now)
+        counts['stories'] += 1
+        advance('milestones', milestone.updated_at)
+    
+    # Risk Issues (from Risks)
+    risks = session.execute(
+        select(Risk, Project.name)
+        .join(Project, Risk.project_id == Project.id)
+        .where(changed(Risk, 'risks'))
+        .order_by(Project.id, Risk.id)
+        .execution_options(yield_per=batch_size)
+    )
+    for risk, epic_name in risks:
+        yield risk_row(risk, risk_work_id(risk.id), epic_name, epic_work_id(risk.project_id), project_key, assignee)
+        counts['risks'] += 1
+        advance('risks', risk.updated_at)
+
+def iter_jira_csv(session, project_key='PT', assignee=None, batch_size=EXPORT_BATCH_SIZE):
+    """Yield the Jira export as CSV text chunks of about batch_size rows each; closes the session"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    try:
+        for count, row in enumerate(iter_jira_rows(session, project_key, assignee, batch_size=batch_size), start=1):
+            writer.writerow(row)
+            if count % batch_size == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate(0)
+        yield buffer.getvalue()
+    finally:
+        session.close()
+
+def export_to_jira_csv(project_key='PT', assignee=None, since_last=False):
+    """
+    Export projects, milestones, and risks to Jira CSV format
+    
+    Args:
+        project_key: Your Jira project key (default: PT)
+        assignee: Assignee username (leave None to leave unassigned)
+        since_last: Only export items created or changed since the previous export
+    
+    Every export records its high-water marks, so a later since_last run picks
+    up where it left off. Deleted items are not represented in delta files.
+    """
+    session = Session()
+    
+    try:
+        since = load_watermarks(session) if since_last else None
+        if since:
+            print("Exporting changes since: " + ", ".join(f"{k} {v.isoformat()}" for k, v in sorted(since.items())))
         
-        print(f"Successfully exported to {filename}")
-        print(f"  - Epics: {len(projects)}")
+        # Rows are written as they stream from the database
+        suffix = '_delta' if since else ''
+        filename = f'jira_import_{datetime.now().strftime("%Y%m%d_%H%M%S")}{suffix}.csv'
+        counts = {}
+        with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerows(iter_jira_rows(session, project_key, assignee, counts=counts, since=since))
         
-        total_milestones = sum(len(session.query(Milestone).filter_by(project_id=p.id).all()) for p in projects)
-        total_risks = sum(len(session.query(Risk).filter_by(project_id=p.id).all()) for p in projects)
+        # Advance the watermark only once the file is complete
+        save_watermarks(session, counts['high_water'])
+        session.commit()
         
-        print(f"  - Stories: {total_milestones}")
-        print(f"  - Risks: {total_risks}")
-        print(f"  - Total Issues: {len(projects) + total_milestones + total_risks}")
+        print(f"Successfully exported to {filename}")
+        print(f"  - Epics: {counts['epics']}")
+        print(f"  - Stories: {counts['stories']}")
+        print(f"  - Risks: {counts['risks']}")
+        print(f"  - Total Issues: {counts['epics'] + counts['stories'] + counts['risks']}")
         print(f"\nNext steps:")
         print(f"1. Open Jira -> Issues -> Import Issues from CSV")
         print(f"2. Select the file: {filename}")
@@ -280,9 +398,16 @@ if __name__ == '__main__':
     PROJECT_KEY = 'PT'  # Change this to your Jira project key (e.g., 'PT', 'PROJ', 'TRACK')
     ASSIGNEE = None      # Set to your Jira username if you want to assign all issues, or leave None
     
+    parser = argparse.ArgumentParser(description='Export Project Tracker data to Jira CSV')
+    parser.add_argument('--project-key', default=PROJECT_KEY, help='Jira project key')
+    parser.add_argument('--assignee', default=ASSIGNEE, help='Jira username to assign every issue to')
+    parser.add_argument('--since-last', action='store_true',
+                        help='Only export items created or changed since the previous export')
+    args = parser.parse_args()
+    
     print("Exporting Project Tracker data to Jira CSV format...")
-    print(f"Project Key: {PROJECT_KEY}")
-    print(f"Assignee: {ASSIGNEE or 'Unassigned'}")
+    print(f"Project Key: {args.project_key}")
+    print(f"Assignee: {args.assignee or 'Unassigned'}")
     print("-" * 50)
     
-    export_to_jira_csv(project_key=PROJECT_KEY, assignee=ASSIGNEE)
\ No newline at end of file
+    export_to_jira_csv(project_key=args.project_key, assignee=args.assignee, since_last=args.since_last)
\ No newline at end of file
@@ -1,112 +1,145 @@
+"""
+KPI Charts for Project Tracker
+Renders the offline KPI charts in charts/ from the live database or the Power BI export
+
+Charts are registered with @chart. Renderers run in a process pool on the Agg
+backend; each worker receives the parsed tables once. A chart is re-rendered only
+when its input columns or renderer changed, as recorded in charts/manifest.json.
+
+Usage:
+    python kpi.py [--source db|files] [--workers N] [--force]
+"""
+
+import matplotlib
+matplotlib.use("Agg")
+# Fixed SVG element ids, so identical data renders identical bytes
+matplotlib.rcParams["svg.hashsalt"] = "project-tracker"
+
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
+from concurrent.futures import ProcessPoolExecutor
+from chart_data import load_tables
 from pathlib import Path
+import argparse
+import hashlib
+import inspect
+import json
+import os
 
 sns.set_theme(style="whitegrid")
 
-# Source files
-PROJECTS_FILE = "powerbi_projects_20251110_123837.csv"
-MILESTONES_FILE = "powerbi_milestones_20251110_123837.csv"
-RISKS_FILE = "powerbi_risks_20251110_123837.csv"
-
-projects = pd.read_csv(PROJECTS_FILE)
-milestones = pd.read_csv(MILESTONES_FILE)
-risks = pd.read_csv(RISKS_FILE)
-
-# Parse numeric/datetime columns
-projects["Completion Percentage"] = pd.to_numeric(projects["Completion Percentage"], errors="coerce")
-projects["Days Remaining"] = pd.to_numeric(projects["Days Remaining"], errors="coerce")
-projects["Start Date"] = pd.to_datetime(projects["Start Date"], errors="coerce")
-projects["Deadline"] = pd.to_datetime(projects["Deadline"], errors="coerce")
-
-milestones["Target Date"] = pd.to_datetime(milestones["Target Date"], errors="coerce")
-milestones["Completion Date"] = pd.to_datetime(milestones["Completion Date"], errors="coerce")
-
-risks["Severity Level"] = pd.to_numeric(risks["Severity Level"], errors="coerce")
-
-# KPI summary
-total_projects = len(projects)
-completed = (projects["Status"].str.upper() == "COMPLETED").sum()
-avg_progress = projects["Completion Percentage"].mean()
-total_risks = len(risks)
-open_high_risks = (
-    (risks["Severity"].str.upper() == "HIGH") &
-    (risks["Status"].str.upper() != "CLOSED")
-).sum()
-
-print(f"Total Projects: {total_projects}")
-print(f"Completed Projects: {completed}")
-print(f"Average Completion: {avg_progress:.1f}%")
-print(f"Total Risks Logged: {total_risks}")
-print(f"Open High-Severity Risks: {open_high_risks}")
-
 # Output folder for charts
-output_dir = Path("charts")
-output_dir.mkdir(exist_ok=True)
-
-# 1. Project status distribution (pie)
-projects["Status"].value_counts().plot.pie(autopct="%1.0f%%", ylabel="")
-plt.title("Project Status Distribution")
-plt.tight_layout()
-plt.savefig(output_dir / "status_distribution.png")
-plt.close()
-
-# 2. Average completion by owner (bar)
-(
-    projects.groupby("Owner")["Completion Percentage"]
-    .mean()
-    .sort_values()
-    .plot.barh(color="#3B82F6")
-)
-plt.title("Average Completion by Owner")
-plt.xlabel("Completion (%)")
-plt.tight_layout()
-plt.savefig(output_dir / "completion_by_owner.png")
-plt.close()
-
-# 3. Project status by owner (stacked bar)
-status_owner = (
-    projects.pivot_table(index="Owner", columns="Status",
-                         values="Project ID", aggfunc="count")
-    .fillna(0)
-)
-status_owner.plot(kind="bar", stacked=True, colormap="tab20c")
-plt.title("Project Status by Owner")
-plt.ylabel("Project Count")
-plt.tight_layout()
-plt.savefig(output_dir / "status_by_owner.png")
-plt.close()
-
-# 4. Risk severity distribution (bar)
-risks["Severity"].value_counts().reindex(["High", "Medium", "Low"]).plot.bar(
-    color=["#DC2626", "#F59E0B", "#10B981"]
-)
-plt.title("Risk Severity Distribution")
-plt.ylabel("Count")
-plt.tight_layout()
-plt.savefig(output_dir / "risk_severity.png")
-plt.close()
-
-# 5. Completion vs days remaining (scatter)
-sns.scatterplot(
-    data=projects,
-    x="Days Remaining",
-    y="Completion Percentage",
-    hue="Is On Track",
-    palette={"Yes": "#10B981", "No": "#F97316"},
-    style="Status"
-)
-plt.title("Completion vs Days Remaining")
-plt.xlabel("Days Remaining")
-plt.ylabel("Completion (%)")
-plt.tight_layout()
-plt.savefig(output_dir / "completion_vs_days_remaining.png")
-plt.close()
-
-# 6. Milestones completed over time (line)
-completed_milestones = milestones.dropna(subset=["Completion Date"])
-if not completed_milestones.empty:
+CHARTS_DIR = Path("charts")
+MANIFEST_FILE = "manifest.json"
+
+
+def print_kpi_summary(tables):
+    projects, risks = tables["projects"], tables["risks"]
+    total_projects = len(projects)
+    completed = (projects["Status"].str.upper() == "COMPLETED").sum()
+    avg_progress = projects["Completion Percentage"].mean()
+    total_risks = len(risks)
+    open_high_risks = (
+        (risks["Severity"].str.upper() == "HIGH") &
+        (risks["Status"].str.upper() != "CLOSED")
+    ).sum()
+
+    print(f"Total Projects: {total_projects}")
+    print(f"Completed Projects: {completed}")
+    print(f"Average Completion: {avg_progress:.1f}%")
+    print(f"Total Risks Logged: {total_risks}")
+    print(f"Open High-Severity Risks: {open_high_risks}")
+
+
+# Chart registry: file name -> (renderer, {table: [input columns]})
+CHARTS = {}
+
+
+def chart(filename, **inputs):
+    """
+    Register a chart renderer
+
+    The renderer draws on the current pyplot figure from the tables dict and
+    returns False when there is nothing to draw. `inputs` lists the columns it
+    reads per table; only those feed the change-detection hash.
+    """
+    def register(renderer):
+        CHARTS[filename] = (renderer, inputs)
+        return renderer
+    return register
+
+
+@chart("status_distribution.png", projects=["Status"])
+def status_distribution(tables):
+    if tables["projects"].empty:
+        return False
+    tables["projects"]["Status"].value_counts().plot.pie(autopct="%1.0f%%", ylabel="")
+    plt.title("Project Status Distribution")
+
+
+@chart("completion_by_owner.png", projects=["Owner", "Completion Percentage"])
+def completion_by_owner(tables):
+    if tables["projects"].empty:
+        return False
+    (
+        tables["projects"].groupby("Owner")["Completion Percentage"]
+        .mean()
+        .sort_values()
+        .plot.barh(color="#3B82F6")
+    )
+    plt.title("Average Completion by Owner")
+    plt.xlabel("Completion (%)")
+
+
+@chart("status_by_owner.png", projects=["Owner", "Status", "Project ID"])
+def status_by_owner(tables):
+    if tables["projects"].empty:
+        return False
+    status_owner = (
+        tables["projects"].pivot_table(index="Owner", columns="Status",
+                                       values="Project ID", aggfunc="count")
+        .fillna(0)
+    )
+    status_owner.plot(kind="bar", stacked=True, colormap="tab20c", ax=plt.gca())
+    plt.title("Project Status by Owner")
+    plt.ylabel("Project Count")
+
+
+@chart("risk_severity.png", risks=["Severity"])
+def risk_severity(tables):
+    if tables["risks"].empty:
+        return False
+    tables["risks"]["Severity"].value_counts().reindex(["High", "Medium", "Low"]).plot.bar(
+        color=["#DC2626", "#F59E0B", "#10B981"]
+    )
+    plt.title("Risk Severity Distribution")
+    plt.ylabel("Count")
+
+
+@chart("completion_vs_days_remaining.png",
+       projects=["Days Remaining", "Completion Percentage", "Is On Track", "Status"])
+def completion_vs_days_remaining(tables):
+    if tables["projects"].empty:
+        return False
+    sns.scatterplot(
+        data=tables["projects"],
+        x="Days Remaining",
+        y="Completion Percentage",
+        hue="Is On Track",
+        palette={True: "#10B981", False: "#F97316"},
+        style="Status"
+    )
+    plt.title("Completion vs Days Remaining")
+    plt.xlabel("Days Remaining")
+    plt.ylabel("Completion (%)")
+
+
+@chart("milestones_completed_over_time.png", milestones=["Completion Date"])
+def milestones_completed_over_time(tables):
+    completed_milestones = tables["milestones"].dropna(subset=["Completion Date"])
+    if completed_milestones.empty:
+        return False
     monthly_counts = (
         completed_milestones
         .groupby(completed_milestones["Completion Date"].dt.to_period("M"))
@@ -118,25 +151,137 @@ if not completed_milestones.empty:
     plt.title("Milestones Completed Per Month")
     plt.xlabel("Month")
     plt.ylabel("Count")
-    plt.tight_layout()
-    plt.savefig(output_dir / "milestones_completed_over_time.png")
-    plt.close()
 
-# 7. Risk heatmap by project and severity
-if not risks.empty:
+
+@chart("risk_heatmap.png", risks=["Project Name", "Severity", "Risk ID"])
+def risk_heatmap(tables):
+    risks = tables["risks"]
+    if risks.empty:
+        return False
     risk_matrix = (
         risks.pivot_table(index="Project Name", columns="Severity",
                           values="Risk ID", aggfunc="count")
         .fillna(0)
         .reindex(columns=["High", "Medium", "Low"])
     )
-    plt.figure(figsize=(8, max(4, 0.3 * len(risk_matrix))))
+    plt.gcf().set_size_inches(8, max(4, 0.3 * len(risk_matrix)))
     sns.heatmap(risk_matrix, annot=True, fmt=".0f", cmap="YlOrRd")
     plt.title("Risk Count by Project and Severity")
     plt.xlabel("Severity")
     plt.ylabel("Project")
-    plt.tight_layout()
-    plt.savefig(output_dir / "risk_heatmap.png")
-    plt.close()
 
-print("Charts saved to:", output_dir.resolve())
\ No newline at end of file
+
+def render_chart(name, tables, target, format=None):
+    """
+    Render one registered chart to a path or binary file object
+
+    Returns:
+        True if an image was written, False if the chart had nothing to draw
+    """
+    renderer, _ = CHARTS[name]
+    plt.figure()
+    try:
+        if renderer(tables) is False:
+            return False
+        plt.tight_layout()
+        # No timestamp in SVG output either
+        plt.savefig(target, format=format, metadata={"Date": None} if format == "svg" else None)
+        return True
+    finally:
+        plt.close("all")
+
+
+def input_hash(name, tables):
+    """Hash of a chart's renderer source and input columns"""
+    renderer, inputs = CHARTS[name]
+    digest = hashlib.sha256(inspect.getsource(renderer).encode("utf-8"))
+    for table, columns in sorted(inputs.items()):
+        frame = tables[table][columns]
+        digest.update(f"{table}:{','.join(columns)}:{len(frame)}".encode("utf-8"))
+        digest.update(pd.util.hash_pandas_object(frame, index=False).values.tobytes())
+    return digest.hexdigest()
+
+
+def load_manifest(output_dir):
+    try:
+        with open(output_dir / MANIFEST_FILE) as manifest:
+            return json.load(manifest)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+# Tables shared by every chart rendered in a worker process
+_worker_tables = None
+
+
+def _init_worker(tables):
+    global _worker_tables
+    _worker_tables = tables
+
+
+def _render_in_worker(name, path):
+    return render_chart(name, _worker_tables, path)
+
+
+def render_charts(tables, output_dir=CHARTS_DIR, workers=None, force=False):
+    """
+    Render every registered chart whose inputs changed since the last run
+
+    Args:
+        tables: Dict of projects/milestones/risks DataFrames
+        output_dir: Folder receiving the images and the manifest
+        workers: Worker processes (default: one per pending chart, up to the CPU count);
+            1 renders in this process
+        force: Re-render even when the manifest says a chart is up to date
+
+    Returns:
+        Dictionary of chart name -> 'rendered', 'unchanged' or 'empty'
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(exist_ok=True)
+    manifest = load_manifest(output_dir)
+    hashes = {name: input_hash(name, tables) for name in CHARTS}
+
+    results = {}
+    pending = []
+    for name, digest in hashes.items():
+        if not force and manifest.get(name) == digest and (output_dir / name).exists():
+            results[name] = "unchanged"
+        else:
+            pending.append(name)
+
+    workers = min(workers or os.cpu_count() or 1, len(pending))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(tables,)) as executor:
+            futures = {name: executor.submit(_render_in_worker, name, output_dir / name) for name in pending}
+            rendered = {name: future.result() for name, future in futures.items()}
+    else:
+        rendered = {name: render_chart(name, tables, output_dir / name) for name in pending}
+
+    for name, wrote in rendered.items():
+        results[name] = "rendered" if wrote else "empty"
+        manifest[name] = hashes[name]
+    with open(output_dir / MANIFEST_FILE, "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render the KPI charts")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (1 renders sequentially)")
+    parser.add_argument("--force", action="store_true", help="Re-render every chart")
+    parser.add_argument("--source", choices=["db", "files"], default="db",
+                        help="db: read the live database; files: the newest Power BI export in docs/")
+    args = parser.parse_args()
+
+    tables = load_tables(args.source)
+    print_kpi_summary(tables)
+
+    results = render_charts(tables, workers=args.workers, force=args.force)
+    for name, result in results.items():
+        print(f"  - {name}: {result}")
+    print("Charts saved to:", CHARTS_DIR.resolve())
+
+
+if __name__ == "__main__":
+    main()
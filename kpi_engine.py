@@ -0,0 +1,537 @@
+"""
+KPI Engine for Project Tracker
+Computes dashboard KPIs with grouped SQL aggregates instead of loading rows,
+and maintains the incremental `kpi_snapshot` counters read by /api/kpis
+"""
+
+from sqlalchemy import event, inspect, select, update, func, case, and_, or_, cast, Integer, Float
+from models import Project, Milestone, Risk, KpiSnapshot, ProjectStatus, MilestoneStatus, RiskSeverity
+from datetime import datetime
+import argparse
+
+SNAPSHOT_ID = 1
+EPOCH = datetime(1970, 1, 1)
+SNAPSHOT_COUNTERS = [
+    'total_projects',
+    'completion_sum',
+    'overdue_projects',
+    'delayed_projects',
+    'delay_weight_sum',
+    'delay_weighted_deadline_sum',
+    'milestones_total',
+    'milestones_completed',
+    'high_risk_count',
+]
+
+
+def _days_between(session, later, earlier):
+    """SQL expression for whole days between two datetimes (like timedelta.days for positive spans)"""
+    if session.get_bind().dialect.name == 'sqlite':
+        # CAST truncates toward zero, which matches floor() for the positive spans we keep
+        return cast(func.julianday(later) - func.julianday(earlier), Integer)
+    return cast(func.floor(func.extract('epoch', later - earlier) / 86400.0), Integer)
+
+
+def _epoch_days(session, column):
+    """SQL expression for a datetime as fractional days since the Unix epoch"""
+    if session.get_bind().dialect.name == 'sqlite':
+        return func.julianday(column) - 2440587.5
+    return func.extract('epoch', column) / 86400.0
+
+
+def _delay_percentage(session, now):
+    """
+    SQL condition selecting delayed projects, and their days past deadline as a
+    percentage of the planned span, both in whole days
+    """
+    not_completed = or_(Project.status.is_(None), Project.status != ProjectStatus.COMPLETED)
+    total_days = _days_between(session, Project.deadline, Project.start_date)
+    delayed = and_(Project.deadline < now, not_completed, total_days > 0)
+    days_past = _days_between(session, now, Project.deadline)
+    return delayed, cast(days_past, Float) / total_days * 100
+
+
+def compute_kpis(session, now=None):
+    """
+    Compute the dashboard KPIs in a single aggregate query
+
+    Args:
+        session: SQLAlchemy session
+        now: Reference time (defaults to utcnow)
+
+    Returns:
+        Dictionary with the same keys and rounding as the /api/kpis payload
+    """
+    now = now or datetime.utcnow()
+
+    delayed, delay_percentage = _delay_percentage(session, now)
+
+    total_milestones = select(func.count(Milestone.id)).scalar_subquery()
+    completed_milestones = (
+        select(func.count(Milestone.id))
+        .where(Milestone.status == MilestoneStatus.COMPLETED)
+        .scalar_subquery()
+    )
+    high_risks = (
+        select(func.count(Risk.id))
+        .where(Risk.severity == RiskSeverity.HIGH)
+        .where(or_(Risk.status.is_(None), Risk.status != 'Closed'))
+        .scalar_subquery()
+    )
+
+    row = session.execute(
+        select(
+            func.count(Project.id),
+            func.sum(case((or_(Project.deadline >= now, Project.status == ProjectStatus.COMPLETED), 1), else_=0)),
+            func.avg(case((delayed, delay_percentage))),
+            func.sum(func.coalesce(Project.completion_percentage, 0.0)),
+            total_milestones,
+            completed_milestones,
+            high_risks,
+        )
+    ).one()
+
+    total_projects, on_track, avg_delay, completion_sum, total_milestones, completed_milestones, high_risk_count = row
+    total_projects = total_projects or 0
+
+    if total_projects == 0:
+        return {
+            'projects_on_track': 0,
+            'avg_delay_percentage': 0,
+            'high_risk_count': 0,
+            'total_projects': 0,
+            'avg_completion': 0,
+            'milestone_completion': 0
+        }
+
+    total_milestones = total_milestones or 0
+    milestone_completion_pct = ((completed_milestones or 0) / total_milestones * 100) if total_milestones > 0 else 0
+
+    return {
+        'projects_on_track': round((on_track or 0) / total_projects * 100, 2),
+        'avg_delay_percentage': round(avg_delay or 0, 2),
+        'high_risk_count': high_risk_count or 0,
+        'total_projects': total_projects,
+        'avg_completion': round(completion_sum / total_projects, 2),
+        'milestone_completion': round(milestone_completion_pct, 2)
+    }
+
+
+# Incremental snapshot
+#
+# The snapshot keeps additive counters so /api/kpis is a single-row read. The only
+# time-dependent input is which projects are past their deadline; that is evaluated
+# against the snapshot's `as_of` instant. Reads roll it forward in memory by consuming
+# the deadlines that fell inside [as_of, now) from the deadline-ordered range, so
+# they never write. Write transactions lock the row and persist the roll-forward
+# before applying their deltas, which keeps that range short. Average delay counts
+# whole days past each deadline, which is not additive, so read_kpis() aggregates it
+# over the delayed projects with the same expression as compute_kpis(); the
+# counters only tell it when there are none.
+
+def _project_contribution(status, start_date, deadline, completion_percentage, as_of):
+    """Counter values a single project adds to the snapshot"""
+    contribution = {
+        'total_projects': 1,
+        'completion_sum': completion_percentage or 0.0,
+    }
+    if deadline is not None and deadline < as_of and status != ProjectStatus.COMPLETED:
+        contribution['overdue_projects'] = 1
+        total_days = (deadline - start_date).days if start_date else 0
+        if total_days > 0:
+            weight = 100.0 / total_days
+            contribution['delayed_projects'] = 1
+            contribution['delay_weight_sum'] = weight
+            contribution['delay_weighted_deadline_sum'] = weight * ((deadline - EPOCH).total_seconds() / 86400)
+    return contribution
+
+
+def _milestone_contribution(status):
+    return {
+        'milestones_total': 1,
+        'milestones_completed': 1 if status == MilestoneStatus.COMPLETED else 0,
+    }
+
+
+def _risk_contribution(severity, status):
+    return {'high_risk_count': 1 if severity == RiskSeverity.HIGH and status != 'Closed' else 0}
+
+
+def _contribution(values, as_of):
+    kind = values['__kind__']
+    if kind is Project:
+        return _project_contribution(values['status'], values['start_date'], values['deadline'],
+                                     values['completion_percentage'], as_of)
+    if kind is Milestone:
+        return _milestone_contribution(values['status'])
+    return _risk_contribution(values['severity'], values['status'])
+
+
+TRACKED_FIELDS = {
+    Project: ('status', 'start_date', 'deadline', 'completion_percentage'),
+    Milestone: ('status',),
+    Risk: ('severity', 'status'),
+}
+
+
+def _current_values(obj):
+    values = {field: getattr(obj, field) for field in TRACKED_FIELDS[type(obj)]}
+    values['__kind__'] = type(obj)
+    return values
+
+
+def _previous_values(obj):
+    """Committed values of the tracked fields, or None when history was not loaded"""
+    state = inspect(obj)
+    values = {'__kind__': type(obj)}
+    for field in TRACKED_FIELDS[type(obj)]:
+        history = state.attrs[field].history
+        if history.deleted:
+            values[field] = history.deleted[0]
+        elif history.unchanged:
+            values[field] = history.unchanged[0]
+        elif not history.added:
+            values[field] = getattr(obj, field)
+        else:
+            return None
+    return values
+
+
+def _accumulate(deltas, contribution, sign):
+    for key, value in contribution.items():
+        deltas[key] = deltas.get(key, 0) + sign * value
+
+
+def apply_snapshot_deltas(session, deltas):
+    """Add counter deltas to the snapshot row inside the caller's transaction"""
+    deltas = {key: value for key, value in deltas.items() if value}
+    if not deltas:
+        return
+    session.connection().execute(
+        update(KpiSnapshot)
+        .where(KpiSnapshot.id == SNAPSHOT_ID)
+        .values({key: getattr(KpiSnapshot, key) + value for key, value in deltas.items()})
+    )
+
+
+def mark_snapshot_stale(session):
+    """Force the next read to rebuild the snapshot (for writes that bypass delta tracking)"""
+    session.connection().execute(
+        update(KpiSnapshot).where(KpiSnapshot.id == SNAPSHOT_ID).values(stale=True)
+    )
+
+
+def _collect_snapshot_deltas(session, flush_context, instances):
+    """before_flush hook: turn pending ORM changes into snapshot counter deltas"""
+    tracked = [obj for obj in list(session.new) + list(session.dirty) + list(session.deleted)
+               if type(obj) in TRACKED_FIELDS]
+    if not tracked:
+        return
+
+    as_of = advance_snapshot(session)
+    if as_of is None:
+        return  # No snapshot yet; the first read builds it from scratch
+
+    deltas = {}
+    for obj in session.new:
+        if type(obj) in TRACKED_FIELDS:
+            _accumulate(deltas, _contribution(_current_values(obj), as_of), 1)
+    for obj in session.deleted:
+        if type(obj) in TRACKED_FIELDS:
+            previous = _previous_values(obj)
+            if previous is None:
+                mark_snapshot_stale(session)
+                return
+            _accumulate(deltas, _contribution(previous, as_of), -1)
+    for obj in session.dirty:
+        if type(obj) in TRACKED_FIELDS and session.is_modified(obj):
+            previous = _previous_values(obj)
+            if previous is None:
+                mark_snapshot_stale(session)
+                return
+            _accumulate(deltas, _contribution(previous, as_of), -1)
+            _accumulate(deltas, _contribution(_current_values(obj), as_of), 1)
+
+    apply_snapshot_deltas(session, deltas)
+
+
+def record_bulk_changes(session, model, removed=(), added=()):
+    """
+    Apply snapshot deltas for rows written with bulk statements, which skip the flush hook
+
+    Args:
+        session: Session whose transaction performs the bulk write
+        model: Project, Milestone or Risk
+        removed: Dictionaries with the tracked fields of rows before they changed or were deleted
+        added: Dictionaries with the tracked fields of rows after they were inserted or changed
+    """
+    as_of = advance_snapshot(session)
+    if as_of is None:
+        return
+
+    deltas = {}
+    for sign, rows in ((-1, removed), (1, added)):
+        for values in rows:
+            values = {field: values.get(field) for field in TRACKED_FIELDS[model]}
+            values['__kind__'] = model
+            _accumulate(deltas, _contribution(values, as_of), sign)
+    apply_snapshot_deltas(session, deltas)
+
+
+def _completion_from_milestones():
+    """Correlated SQL expression: percentage of a project's milestones that are completed"""
+    return (
+        select(
+            cast(func.sum(case((Milestone.status == MilestoneStatus.COMPLETED, 1), else_=0)), Float)
+            / func.count(Milestone.id) * 100
+        )
+        .where(Milestone.project_id == Project.id)
+        .scalar_subquery()
+    )
+
+
+def recalculate_completion(session, project_ids):
+    """
+    Recompute completion for many projects with one UPDATE statement
+
+    Projects without milestones keep their manually entered percentage. Pending ORM
+    changes are flushed first so they are counted.
+    """
+    project_ids = list(set(project_ids))
+    if not project_ids:
+        return
+    session.flush()
+
+    new_completion = _completion_from_milestones()
+    has_milestones = select(Milestone.id).where(Milestone.project_id == Project.id).exists()
+    scope = and_(Project.id.in_(project_ids), has_milestones)
+
+    # The UPDATE bypasses the flush hook, so carry its completion change into the snapshot
+    delta = session.execute(
+        select(func.sum(new_completion - func.coalesce(Project.completion_percentage, 0.0))).where(scope)
+    ).scalar()
+    session.execute(
+        update(Project).where(scope).values(completion_percentage=new_completion),
+        execution_options={'synchronize_session': 'fetch'}
+    )
+    if delta:
+        apply_snapshot_deltas(session, {'completion_sum': delta})
+
+
+def track_kpi_snapshot(session_factory):
+    """Keep the KPI snapshot in sync with every flush made through `session_factory`"""
+    event.listen(session_factory, 'before_flush', _collect_snapshot_deltas)
+
+
+def _snapshot_counters(session, as_of):
+    """Full recomputation of every snapshot counter with aggregate queries"""
+    not_completed = or_(Project.status.is_(None), Project.status != ProjectStatus.COMPLETED)
+    overdue = and_(Project.deadline < as_of, not_completed)
+    total_days = _days_between(session, Project.deadline, Project.start_date)
+    delayed = and_(overdue, total_days > 0)
+    weight = 100.0 / cast(total_days, Float)
+
+    projects = session.execute(
+        select(
+            func.count(Project.id),
+            func.coalesce(func.sum(func.coalesce(Project.completion_percentage, 0.0)), 0.0),
+            func.coalesce(func.sum(case((overdue, 1), else_=0)), 0),
+            func.coalesce(func.sum(case((delayed, 1), else_=0)), 0),
+            func.coalesce(func.sum(case((delayed, weight), else_=0.0)), 0.0),
+            func.coalesce(func.sum(case((delayed, weight * _epoch_days(session, Project.deadline)), else_=0.0)), 0.0),
+        )
+    ).one()
+    milestones = session.execute(
+        select(
+            func.count(Milestone.id),
+            func.coalesce(func.sum(case((Milestone.status == MilestoneStatus.COMPLETED, 1), else_=0)), 0),
+        )
+    ).one()
+    high_risks = session.execute(
+        select(func.count(Risk.id))
+        .where(Risk.severity == RiskSeverity.HIGH)
+        .where(or_(Risk.status.is_(None), Risk.status != 'Closed'))
+    ).scalar()
+
+    return dict(zip(SNAPSHOT_COUNTERS, list(projects) + list(milestones) + [high_risks]))
+
+
+def rebuild_snapshot(session, now=None):
+    """Recompute the snapshot from the base tables (caller commits)"""
+    now = now or datetime.utcnow()
+    snapshot = session.get(KpiSnapshot, SNAPSHOT_ID)
+    if snapshot is None:
+        snapshot = KpiSnapshot(id=SNAPSHOT_ID, as_of=now)
+        session.add(snapshot)
+    for key, value in _snapshot_counters(session, now).items():
+        setattr(snapshot, key, value)
+    snapshot.as_of = now
+    snapshot.stale = False
+    session.flush()
+    return snapshot
+
+
+def _crossed_deltas(connection, since, now):
+    """Counter deltas for unfinished projects whose deadline fell inside [since, now)"""
+    crossed = connection.execute(
+        select(Project.status, Project.start_date, Project.deadline, Project.completion_percentage)
+        .where(Project.deadline >= since)
+        .where(Project.deadline < now)
+        .where(or_(Project.status.is_(None), Project.status != ProjectStatus.COMPLETED))
+        .order_by(Project.deadline)
+    )
+    deltas = {}
+    for status, start_date, deadline, completion in crossed:
+        contribution = _project_contribution(status, start_date, deadline, completion, now)
+        contribution.pop('total_projects')
+        contribution.pop('completion_sum')
+        _accumulate(deltas, contribution, 1)
+    return deltas
+
+
+def snapshot_counters_at(session, snapshot, now):
+    """The snapshot's counters rolled forward to `now` in memory, without writing"""
+    counters = {key: getattr(snapshot, key) or 0 for key in SNAPSHOT_COUNTERS}
+    if now > snapshot.as_of:
+        for key, value in _crossed_deltas(session.connection(), snapshot.as_of, now).items():
+            counters[key] += value
+    return counters
+
+
+def advance_snapshot(session, now=None):
+    """
+    Persist the snapshot's roll-forward to `now`, holding the row's write lock from then on
+    (write transactions only)
+
+    The UPDATE only matches the as_of that was read, so a writer that raced another
+    one re-reads the row under its own lock instead of adding the same crossed
+    deadlines twice. FOR UPDATE covers PostgreSQL; on SQLite, which ignores it and
+    may serve the first SELECT outside the transaction, the guarded UPDATE is the lock.
+
+    Returns:
+        The snapshot's new as_of, or None when there is no snapshot yet
+    """
+    now = now or datetime.utcnow()
+    connection = session.connection()
+    while True:
+        as_of = connection.execute(
+            select(KpiSnapshot.as_of).where(KpiSnapshot.id == SNAPSHOT_ID).with_for_update()
+        ).scalar()
+        if as_of is None:
+            return None
+
+        values = {}
+        if now > as_of:
+            values = {key: getattr(KpiSnapshot, key) + value
+                      for key, value in _crossed_deltas(connection, as_of, now).items()}
+        # Always written, even when nothing crossed, so the lock is held until commit
+        values['as_of'] = max(now, as_of)
+        result = connection.execute(
+            update(KpiSnapshot)
+            .where(KpiSnapshot.id == SNAPSHOT_ID)
+            .where(KpiSnapshot.as_of == as_of)
+            .values(values)
+        )
+        if result.rowcount:
+            return values['as_of']
+
+
+def read_kpis(session, now=None):
+    """
+    Serve the /api/kpis payload from the snapshot, rebuilding it when missing or stale
+
+    Only a rebuild writes (the caller commits); otherwise this is a plain read.
+    """
+    now = now or datetime.utcnow()
+    snapshot = session.get(KpiSnapshot, SNAPSHOT_ID)
+    if snapshot is None or snapshot.stale:
+        snapshot = rebuild_snapshot(session, now)
+    counters = snapshot_counters_at(session, snapshot, now)
+
+    total_projects = counters['total_projects']
+    if total_projects == 0:
+        return {
+            'projects_on_track': 0,
+            'avg_delay_percentage': 0,
+            'high_risk_count': 0,
+            'total_projects': 0,
+            'avg_completion': 0,
+            'milestone_completion': 0
+        }
+
+    avg_delay = 0
+    if counters['delayed_projects'] > 0:
+        delayed, delay_percentage = _delay_percentage(session, now)
+        avg_delay = session.execute(select(func.avg(delay_percentage)).where(delayed)).scalar() or 0
+
+    milestones_total = counters['milestones_total']
+    milestone_completion_pct = (counters['milestones_completed'] / milestones_total * 100) if milestones_total > 0 else 0
+
+    return {
+        'projects_on_track': round((total_projects - counters['overdue_projects']) / total_projects * 100, 2),
+        'avg_delay_percentage': round(avg_delay, 2),
+        'high_risk_count': counters['high_risk_count'],
+        'total_projects': total_projects,
+        'avg_completion': round(counters['completion_sum'] / total_projects, 2),
+        'milestone_completion': round(milestone_completion_pct, 2)
+    }
+
+
+def verify_snapshot(session, now=None):
+    """
+    Compare the maintained counters against a full recomputation at the same instant,
+    and the /api/kpis payload served from them against compute_kpis()
+
+    A missing or stale snapshot is reported as a mismatch too. Payload mismatches
+    are keyed 'kpis.<field>'.
+    """
+    now = now or datetime.utcnow()
+    snapshot = session.get(KpiSnapshot, SNAPSHOT_ID)
+    if snapshot is None:
+        return {'kpi_snapshot': {'snapshot': 'missing', 'expected': 'present'}}
+    if snapshot.stale:
+        return {'stale': {'snapshot': True, 'expected': False}}
+    counters = snapshot_counters_at(session, snapshot, now)
+    expected = _snapshot_counters(session, now)
+    mismatches = {}
+    for key, value in expected.items():
+        actual = counters[key]
+        if abs((actual or 0) - (value or 0)) > 1e-6 * max(1.0, abs(value or 0)):
+            mismatches[key] = {'snapshot': actual, 'expected': value}
+
+    served = read_kpis(session, now)
+    for key, value in compute_kpis(session, now).items():
+        # Both sides are rounded to 2 decimals; allow one step of rounding noise
+        if abs(served[key] - value) > 0.01 + 1e-9:
+            mismatches[f'kpis.{key}'] = {'snapshot': served[key], 'expected': value}
+    return mismatches
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Maintain the incremental KPI snapshot')
+    parser.add_argument('--rebuild', action='store_true', help='Recompute the snapshot from the base tables')
+    parser.add_argument('--verify', action='store_true', help='Check the snapshot against a full recomputation')
+    args = parser.parse_args()
+
+    from db import Session, init_db
+
+    init_db()
+    session = Session()
+    try:
+        if args.rebuild:
+            rebuild_snapshot(session)
+            session.commit()
+            print("KPI snapshot rebuilt")
+        if args.verify or not args.rebuild:
+            mismatches = verify_snapshot(session)
+            session.commit()
+            if mismatches:
+                print("KPI snapshot drift detected:")
+                for key, values in mismatches.items():
+                    print(f"  - {key}: snapshot={values['snapshot']} expected={values['expected']}")
+            else:
+                print("KPI snapshot matches the base tables")
+        print(read_kpis(session))
+        session.commit()
+    finally:
+        session.close()
@@ -0,0 +1,213 @@
+"""
+Schema Migration Script
+Brings existing Project Tracker databases up to the schema declared in models.py
+
+Usage:
+    python migrate.py            Apply pending migrations
+    python migrate.py --status   List applied and pending migrations
+    python migrate.py --check    EXPLAIN the hot queries and fail if any skips its index
+"""
+
+from sqlalchemy import Column, String, DateTime, MetaData, Table, select, update, func, or_, inspect, text
+from models import (Base, Project, Milestone, Risk, KpiSnapshot, AISummary, ExportWatermark, DataVersion,
+                    ProjectStatus, MilestoneStatus, RiskSeverity)
+from db import engine
+from data_version import seed_data_versions
+from contextlib import contextmanager
+from datetime import datetime
+import argparse
+import sys
+
+# Key of the PostgreSQL advisory lock that serializes concurrent upgrades
+MIGRATION_LOCK_ID = 727001
+
+# Bookkeeping table recording which migrations ran against this database
+migration_metadata = MetaData()
+schema_migrations = Table(
+    'schema_migrations', migration_metadata,
+    Column('version', String(100), primary_key=True),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+
+def create_tables(*models):
+    """Migration step creating the tables of `models` that do not exist yet"""
+    def migration(connection):
+        Base.metadata.create_all(connection, tables=[model.__table__ for model in models])
+    return migration
+
+
+def create_indexes(*names):
+    """Migration step creating the named model indexes that do not exist yet"""
+    def migration(connection):
+        inspector = inspect(connection)
+        for table in Base.metadata.sorted_tables:
+            wanted = [index for index in table.indexes if index.name in names]
+            if not wanted:
+                continue
+            existing = {index['name'] for index in inspector.get_indexes(table.name)}
+            for index in wanted:
+                if index.name not in existing:
+                    index.create(connection)
+                    print(f"  - Created index {index.name} on {table.name}")
+    return migration
+
+
+def backfill_updated_at(connection):
+    """Stamp rows created before updated_at had a default, so keyset cursors can encode them"""
+    for model in (Project, Milestone, Risk):
+        connection.execute(
+            update(model)
+            .where(model.updated_at.is_(None))
+            .values(updated_at=func.coalesce(model.created_at, datetime.utcnow()))
+        )
+
+
+# Ordered (version, function) pairs; append new migrations, never reorder or rename
+MIGRATIONS = [
+    ('0001_create_missing_tables', create_tables(Project, Milestone, Risk, KpiSnapshot)),
+    ('0002_secondary_indexes', create_indexes(
+        'ix_projects_owner_id', 'ix_projects_status_id', 'ix_projects_deadline_id', 'ix_projects_updated_at_id',
+        'ix_milestones_project_id_status', 'ix_milestones_status',
+        'ix_risks_project_id', 'ix_risks_severity_status',
+    )),
+    ('0003_ai_summary_cache', create_tables(AISummary)),
+    ('0004_export_watermarks', create_tables(ExportWatermark)),
+    ('0005_data_versions', create_tables(DataVersion)),
+    ('0006_backfill_updated_at', backfill_updated_at),
+    ('0007_seed_data_versions', seed_data_versions),
+]
+
+
+def applied_versions(connection):
+    migration_metadata.create_all(connection)
+    return {row.version for row in connection.execute(select(schema_migrations.c.version))}
+
+
+@contextmanager
+def migration_lock(bind):
+    """
+    Transaction holding the database-wide migration lock until it ends
+
+    Every app process runs upgrade() at startup, so concurrent upgrades queue here:
+    SQLite takes the write lock up front with BEGIN IMMEDIATE, PostgreSQL a
+    transaction-scoped advisory lock.
+    """
+    with bind.connect() as connection:
+        with connection.begin():
+            dialect = connection.dialect.name
+            if dialect == 'sqlite':
+                connection.exec_driver_sql('BEGIN IMMEDIATE')
+            elif dialect == 'postgresql':
+                connection.execute(text('SELECT pg_advisory_xact_lock(:id)'), {'id': MIGRATION_LOCK_ID})
+            yield connection
+
+
+def upgrade(bind=engine):
+    """
+    Apply pending migrations, each in its own transaction under the migration lock
+
+    Returns:
+        List of versions applied by this call
+    """
+    applied = []
+    with migration_lock(bind) as connection:
+        done = applied_versions(connection)
+    for version, migration in MIGRATIONS:
+        if version in done:
+            continue
+        with migration_lock(bind) as connection:
+            # Another process may have applied it while this one waited for the lock
+            if version in applied_versions(connection):
+                continue
+            print(f"Applying {version}")
+            migration(connection)
+            connection.execute(schema_migrations.insert().values(version=version, applied_at=datetime.utcnow()))
+        applied.append(version)
+    return applied
+
+
+def hot_queries():
+    """The per-project and KPI queries that must be served from an index"""
+    now = datetime.utcnow()
+    return {
+        'milestones by project': select(Milestone).where(Milestone.project_id == 1),
+        'risks by project': select(Risk).where(Risk.project_id == 1),
+        'project completion aggregate': (
+            select(func.count(Milestone.id))
+            .where(Milestone.project_id == 1)
+            .where(Milestone.status == MilestoneStatus.COMPLETED)
+        ),
+        'completed milestones': select(func.count(Milestone.id)).where(Milestone.status == MilestoneStatus.COMPLETED),
+        'open high risks': (
+            select(func.count(Risk.id))
+            .where(Risk.severity == RiskSeverity.HIGH)
+            .where(or_(Risk.status.is_(None), Risk.status != 'Closed'))
+        ),
+        'projects by owner': select(Project).where(Project.owner == 'owner').order_by(Project.id),
+        'projects by status': select(Project).where(Project.status == ProjectStatus.IN_PROGRESS).order_by(Project.id),
+        'overdue projects': select(Project.id).where(Project.deadline < now),
+    }
+
+
+def explain(connection, statement):
+    """Return the query plan of a statement as a single lowercase string"""
+    sql = str(statement.compile(connection.engine, compile_kwargs={'literal_binds': True}))
+    if connection.dialect.name == 'sqlite':
+        rows = connection.execute(text(f"EXPLAIN QUERY PLAN {sql}"))
+        return " | ".join(str(row[-1]) for row in rows).lower()
+    rows = connection.execute(text(f"EXPLAIN {sql}"))
+    return " | ".join(str(row[0]) for row in rows).lower()
+
+
+def full_scan(dialect, plan):
+    """Whether a plan from explain() reads a whole table or index instead of searching it"""
+    if dialect == 'sqlite':
+        # 'SCAN t USING COVERING INDEX ix' still reads every entry; only SEARCH steps seek
+        return any(step.startswith('scan ') for step in plan.split(' | '))
+    return 'seq scan' in plan
+
+
+def check_query_plans(bind=engine):
+    """
+    EXPLAIN each hot query and report the ones that scan instead of seeking an index
+
+    On PostgreSQL the planner may prefer sequential scans on tiny tables, so run
+    this against a realistically sized database (or with enable_seqscan off).
+
+    Returns:
+        Dictionary of query name -> plan for the queries that need a full scan
+    """
+    failures = {}
+    with bind.connect() as connection:
+        if connection.dialect.name == 'postgresql':
+            connection.execute(text("SET enable_seqscan = off"))
+        for name, statement in hot_queries().items():
+            plan = explain(connection, statement)
+            if full_scan(connection.dialect.name, plan):
+                failures[name] = plan
+            print(f"  - {name}: {plan}")
+    return failures
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Migrate the Project Tracker schema')
+    parser.add_argument('--status', action='store_true', help='List applied and pending migrations')
+    parser.add_argument('--check', action='store_true', help='Verify the hot queries use indexes')
+    args = parser.parse_args()
+
+    if args.status:
+        with migration_lock(engine) as connection:
+            done = applied_versions(connection)
+        for version, _ in MIGRATIONS:
+            print(f"{'applied' if version in done else 'pending'}  {version}")
+    elif args.check:
+        print("Checking query plans...")
+        failures = check_query_plans()
+        if failures:
+            print(f"{len(failures)} hot queries do not use an index: {', '.join(failures)}")
+            sys.exit(1)
+        print("All hot queries use an index.")
+    else:
+        applied = upgrade()
+        print(f"Applied {len(applied)} migration(s)." if applied else "Database schema is up to date.")
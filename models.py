@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Text, ForeignKey, Enum
+from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Text, ForeignKey, Enum, Boolean, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship, sessionmaker
 from datetime import datetime
@@ -39,8 +39,16 @@ class Project(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
-    milestones = relationship("Milestone", back_populates="project", cascade="all, delete-orphan")
-    risks = relationship("Risk", back_populates="project", cascade="all, delete-orphan")
+    milestones = relationship("Milestone", back_populates="project", cascade="all, delete-orphan", order_by="Milestone.id")
+    risks = relationship("Risk", back_populates="project", cascade="all, delete-orphan", order_by="Risk.id")
+    
+    # Composite indexes backing the filtered keyset listing of /api/projects
+    __table_args__ = (
+        Index('ix_projects_owner_id', 'owner', 'id'),
+        Index('ix_projects_status_id', 'status', 'id'),
+        Index('ix_projects_deadline_id', 'deadline', 'id'),
+        Index('ix_projects_updated_at_id', 'updated_at', 'id'),
+    )
     
     def to_dict(self):
         return {
@@ -72,6 +80,11 @@ class Milestone(Base):
     # Relationships
     project = relationship("Project", back_populates="milestones")
     
+    __table_args__ = (
+        Index('ix_milestones_project_id_status', 'project_id', 'status'),
+        Index('ix_milestones_status', 'status'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -101,6 +114,11 @@ class Risk(Base):
     # Relationships
     project = relationship("Project", back_populates="risks")
     
+    __table_args__ = (
+        Index('ix_risks_project_id', 'project_id'),
+        Index('ix_risks_severity_status', 'severity', 'status'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -114,4 +132,46 @@ class Risk(Base):
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
 
+class KpiSnapshot(Base):
+    """Single-row KPI counters maintained incrementally by the write handlers"""
+    __tablename__ = 'kpi_snapshot'
+    
+    id = Column(Integer, primary_key=True)
+    total_projects = Column(Integer, nullable=False, default=0)
+    completion_sum = Column(Float, nullable=False, default=0.0)
+    overdue_projects = Column(Integer, nullable=False, default=0)  # Past deadline as of `as_of` and not completed
+    delayed_projects = Column(Integer, nullable=False, default=0)  # Overdue projects with a positive planned span
+    delay_weight_sum = Column(Float, nullable=False, default=0.0)  # Sum of 100 / span days
+    delay_weighted_deadline_sum = Column(Float, nullable=False, default=0.0)  # Sum of 100 * deadline day / span days
+    milestones_total = Column(Integer, nullable=False, default=0)
+    milestones_completed = Column(Integer, nullable=False, default=0)
+    high_risk_count = Column(Integer, nullable=False, default=0)
+    as_of = Column(DateTime, nullable=False)
+    stale = Column(Boolean, nullable=False, default=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class AISummary(Base):
+    """Persistent cache of generated project summaries keyed by a hash of their inputs"""
+    __tablename__ = 'ai_summaries'
+    
+    content_hash = Column(String(64), primary_key=True)
+    project_id = Column(Integer, index=True)
+    summary = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class ExportWatermark(Base):
+    """Highest updated_at already exported, per export and entity, for delta exports"""
+    __tablename__ = 'export_watermarks'
+    
+    export = Column(String(50), primary_key=True)  # e.g. 'jira'
+    entity = Column(String(50), primary_key=True)  # projects, milestones, risks
+    high_water = Column(DateTime, nullable=False)
+    exported_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+class DataVersion(Base):
+    """Write counters used to invalidate caches of derived data (see data_version.py)"""
+    __tablename__ = 'data_versions'
+    
+    name = Column(String(50), primary_key=True)  # 'global'
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
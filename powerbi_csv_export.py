@@ -2,178 +2,67 @@
 Power BI CSV Export Script
 Exports Project Tracker data to Power BI-friendly CSV format
 Creates separate CSV files for Projects, Milestones, and Risks (best practice for Power BI)
+
+The columnar mode (--format parquet) loads each table with one query into typed
+pandas columns and writes Parquet, optionally with gzip-compressed CSV copies.
 """
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from models import Project, Milestone, Risk, ProjectStatus, MilestoneStatus, RiskSeverity
+from chart_data import build_frames
+from db import Session
 from datetime import datetime
-import csv
+from pathlib import Path
+import argparse
 import os
 
-# Database setup
-engine = create_engine('sqlite:///projecttracker.db', echo=False)
-Session = sessionmaker(bind=engine)
+# Column formats of the classic CSV files
+CSV_DATE_COLUMNS = ['Start Date', 'Deadline', 'Target Date', 'Completion Date']
+CSV_TIMESTAMP_COLUMNS = ['Created At', 'Updated At']
+CSV_FLAG_COLUMNS = ['Is Overdue', 'Is On Track', 'Is Completed', 'Is High Risk', 'Is Open']
+
+def format_for_csv(df):
+    """Render typed columns the way the CSV export always has: day dates, Yes/No flags"""
+    df = df.copy()
+    for column in df.columns:
+        if column in CSV_DATE_COLUMNS:
+            df[column] = df[column].dt.strftime('%Y-%m-%d')
+        elif column in CSV_TIMESTAMP_COLUMNS:
+            df[column] = df[column].dt.strftime('%Y-%m-%d %H:%M:%S')
+        elif column in CSV_FLAG_COLUMNS:
+            df[column] = df[column].map({True: 'Yes', False: 'No'})
+    return df
+
+def write_powerbi_csv(frames, timestamp, output_dir='.'):
+    """
+    Write the typed tables from build_frames() as the classic Power BI CSV files
+    
+    Returns:
+        Dictionary of table name -> CSV path
+    """
+    files = {}
+    for name, df in frames.items():
+        filename = os.path.join(output_dir, f'powerbi_{name}_{timestamp}.csv')
+        format_for_csv(df).to_csv(filename, index=False, encoding='utf-8', lineterminator='\r\n')
+        files[name] = filename
+    return files
 
 def export_to_powerbi_csv():
     """
     Export all projects, milestones, and risks to Power BI-friendly CSV format
     Creates separate CSV files for each entity type (best practice for Power BI)
+    
+    Each table is read with one query (project names are joined in) and the
+    derived columns are computed over whole columns, so the cost is linear in rows.
     """
     session = Session()
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     
     try:
-        projects = session.query(Project).all()
-        milestones = session.query(Milestone).all()
-        risks = session.query(Risk).all()
-        
-        # Export Projects Table
-        projects_filename = f'powerbi_projects_{timestamp}.csv'
-        with open(projects_filename, 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.writer(csvfile)
-            
-            # Projects table headers
-            headers = [
-                'Project ID',
-                'Project Name',
-                'Owner',
-                'Description',
-                'Status',
-                'Start Date',
-                'Deadline',
-                'Completion Percentage',
-                'Days Remaining',
-                'Is Overdue',
-                'Is On Track',
-                'Created At',
-                'Updated At'
-            ]
-            writer.writerow(headers)
-            
-            now = datetime.now(datetime.UTC) if hasattr(datetime, 'UTC') else datetime.utcnow()
-            for project in projects:
-                days_remaining = (project.deadline - now).days
-                is_overdue = project.deadline < now and project.status != ProjectStatus.COMPLETED
-                is_on_track = not is_overdue or project.status == ProjectStatus.COMPLETED
-                
-                row = [
-                    project.id,
-                    project.name,
-                    project.owner,
-                    project.description or '',
-                    project.status.value,
-                    project.start_date.strftime('%Y-%m-%d'),
-                    project.deadline.strftime('%Y-%m-%d'),
-                    project.completion_percentage,
-                    days_remaining,
-                    'Yes' if is_overdue else 'No',
-                    'Yes' if is_on_track else 'No',
-                    project.created_at.strftime('%Y-%m-%d %H:%M:%S') if project.created_at else '',
-                    project.updated_at.strftime('%Y-%m-%d %H:%M:%S') if project.updated_at else ''
-                ]
-                writer.writerow(row)
-        
-        # Export Milestones Table
-        milestones_filename = f'powerbi_milestones_{timestamp}.csv'
-        with open(milestones_filename, 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.writer(csvfile)
-            
-            # Milestones table headers
-            headers = [
-                'Milestone ID',
-                'Project ID',
-                'Project Name',
-                'Milestone Name',
-                'Description',
-                'Target Date',
-                'Completion Date',
-                'Status',
-                'Is Overdue',
-                'Is Completed',
-                'Days Until Target',
-                'Days Past Target',
-                'Created At',
-                'Updated At'
-            ]
-            writer.writerow(headers)
-            
-            now = datetime.now(datetime.UTC) if hasattr(datetime, 'UTC') else datetime.utcnow()
-            for milestone in milestones:
-                project = session.query(Project).filter_by(id=milestone.project_id).first()
-                days_until_target = (milestone.target_date - now).days if milestone.target_date > now else 0
-                days_past_target = (now - milestone.target_date).days if milestone.target_date < now else 0
-                is_overdue = milestone.target_date < now and milestone.status != MilestoneStatus.COMPLETED
-                is_completed = milestone.status == MilestoneStatus.COMPLETED
-                
-                row = [
-                    milestone.id,
-                    milestone.project_id,
-                    project.name if project else '',
-                    milestone.name,
-                    milestone.description or '',
-                    milestone.target_date.strftime('%Y-%m-%d'),
-                    milestone.completion_date.strftime('%Y-%m-%d') if milestone.completion_date else '',
-                    milestone.status.value,
-                    'Yes' if is_overdue else 'No',
-                    'Yes' if is_completed else 'No',
-                    days_until_target,
-                    days_past_target,
-                    milestone.created_at.strftime('%Y-%m-%d %H:%M:%S') if milestone.created_at else '',
-                    milestone.updated_at.strftime('%Y-%m-%d %H:%M:%S') if milestone.updated_at else ''
-                ]
-                writer.writerow(row)
-        
-        # Export Risks Table
-        risks_filename = f'powerbi_risks_{timestamp}.csv'
-        with open(risks_filename, 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.writer(csvfile)
-            
-            # Risks table headers
-            headers = [
-                'Risk ID',
-                'Project ID',
-                'Project Name',
-                'Risk Name',
-                'Description',
-                'Severity',
-                'Severity Level',  # Numeric: 1=Low, 2=Medium, 3=High
-                'Mitigation Plan',
-                'Status',
-                'Is High Risk',
-                'Is Open',
-                'Created At',
-                'Updated At'
-            ]
-            writer.writerow(headers)
-            
-            severity_level_map = {
-                RiskSeverity.LOW: 1,
-                RiskSeverity.MEDIUM: 2,
-                RiskSeverity.HIGH: 3
-            }
-            
-            for risk in risks:
-                project = session.query(Project).filter_by(id=risk.project_id).first()
-                is_high_risk = risk.severity == RiskSeverity.HIGH
-                is_open = risk.status == 'Open'
-                
-                row = [
-                    risk.id,
-                    risk.project_id,
-                    project.name if project else '',
-                    risk.name,
-                    risk.description or '',
-                    risk.severity.value,
-                    severity_level_map.get(risk.severity, 0),
-                    risk.mitigation_plan or '',
-                    risk.status,
-                    'Yes' if is_high_risk else 'No',
-                    'Yes' if is_open else 'No',
-                    risk.created_at.strftime('%Y-%m-%d %H:%M:%S') if risk.created_at else '',
-                    risk.updated_at.strftime('%Y-%m-%d %H:%M:%S') if risk.updated_at else ''
-                ]
-                writer.writerow(row)
+        frames = build_frames(session)
+        files = write_powerbi_csv(frames, timestamp)
+        projects_filename = files['projects']
+        milestones_filename = files['milestones']
+        risks_filename = files['risks']
+        projects, milestones, risks = frames['projects'], frames['milestones'], frames['risks']
         
         print(f"Successfully exported Power BI data files:")
         print(f"  - Projects: {projects_filename} ({len(projects)} rows)")
@@ -201,8 +90,57 @@ def export_to_powerbi_csv():
     finally:
         session.close()
 
+def export_to_powerbi_parquet(output_dir='docs', with_csv=False):
+    """
+    Export projects, milestones, and risks as typed Parquet files
+    
+    Args:
+        output_dir: Folder receiving the files (created if missing)
+        with_csv: Also write gzip-compressed CSV copies
+    
+    Returns:
+        Dictionary of table name -> Parquet path
+    """
+    session = Session()
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    
+    try:
+        frames = build_frames(session)
+        files = {}
+        for name, df in frames.items():
+            path = output_dir / f'powerbi_{name}_{timestamp}.parquet'
+            df.to_parquet(path, index=False)
+            files[name] = str(path)
+            if with_csv:
+                df.to_csv(output_dir / f'powerbi_{name}_{timestamp}.csv.gz', index=False, compression='gzip')
+            print(f"  - {name.title()}: {path} ({len(df)} rows)")
+        
+        print(f"\nTotal records: {sum(len(df) for df in frames.values())}")
+        print("Power BI: Get Data -> Parquet, then relate the tables on Project ID.")
+        return files
+    
+    except Exception as e:
+        print(f"Error exporting to Parquet: {e}")
+        raise
+    finally:
+        session.close()
+
 if __name__ == '__main__':
-    print("Exporting Project Tracker data to Power BI CSV format...")
-    print("-" * 50)
-    export_to_powerbi_csv()
+    parser = argparse.ArgumentParser(description='Export Project Tracker data for Power BI')
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv',
+                        help='csv: the classic CSV files; parquet: typed columnar files in --output-dir')
+    parser.add_argument('--output-dir', default='docs', help='Folder for Parquet output (default: docs)')
+    parser.add_argument('--csv-gz', action='store_true', help='With --format parquet, also write .csv.gz copies')
+    args = parser.parse_args()
+    
+    if args.format == 'parquet':
+        print("Exporting Project Tracker data to Parquet...")
+        print("-" * 50)
+        export_to_powerbi_parquet(output_dir=args.output_dir, with_csv=args.csv_gz)
+    else:
+        print("Exporting Project Tracker data to Power BI CSV format...")
+        print("-" * 50)
+        export_to_powerbi_csv()
 
@@ -4,15 +4,10 @@ Creates sample projects, milestones, and risks for testing
 """
 
 from models import Project, Milestone, Risk, ProjectStatus, MilestoneStatus, RiskSeverity
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from db import Session
 from datetime import datetime, timedelta
 import random
 
-# Create database engine
-engine = create_engine('sqlite:///projecttracker.db', echo=False)
-Session = sessionmaker(bind=engine)
-
 def create_sample_data():
     """Create sample projects with milestones and risks"""
     session = Session()
@@ -0,0 +1,42 @@
+// Conditional GET for the JSON API: remembers each URL's ETag and body, sends
+// If-None-Match and serves the remembered body when the server answers 304
+const apiCache = new Map();
+
+async function fetchJSON(url) {
+    const cached = apiCache.get(url);
+    const response = await fetch(url, {
+        headers: cached ? { 'If-None-Match': cached.etag } : {},
+        cache: 'no-store'  // Revalidation is handled here, not by the browser cache
+    });
+    if (response.status === 304 && cached) {
+        return { data: cached.data, changed: false };
+    }
+    
+    const data = await response.json();
+    const etag = response.headers.get('ETag');
+    if (response.ok && etag) {
+        apiCache.set(url, { etag, data });
+    }
+    return { data, changed: true };
+}
+
+// Server-Sent Events from /api/events. `handlers` maps an event type ('projects',
+// 'milestones', 'risks', 'resync') to a function receiving the parsed change.
+// 'resync' also runs on every (re)connection, since events may have been missed
+// while disconnected. Returns null when the browser has no EventSource.
+function subscribeToChanges(handlers) {
+    if (!('EventSource' in window)) return null;
+    
+    const source = new EventSource('/api/events');
+    for (const [type, handler] of Object.entries(handlers)) {
+        source.addEventListener(type, event => handler(JSON.parse(event.data)));
+    }
+    if (handlers.resync) {
+        let connected = false;
+        source.addEventListener('open', () => {
+            if (connected) handlers.resync({ type: 'resync' });  // Reconnected
+            connected = true;
+        });
+    }
+    return source;
+}
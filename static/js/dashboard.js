@@ -1,43 +1,44 @@
-let projectsData = [];
+let dashboardData = null;
+let recentProjects = [];
+let dashboardLoadId = 0;
 
-// Load dashboard data
+// Load dashboard data (KPIs, chart series and the recent projects in one request)
 async function loadDashboard() {
+    const loadId = ++dashboardLoadId;
     try {
-        // Load KPIs
-        const kpiResponse = await fetch('/api/kpis');
-        const kpis = await kpiResponse.json();
+        const { data, changed } = await fetchJSON('/api/dashboard');
+        if (loadId !== dashboardLoadId) return;  // A newer refresh has started
+        if (!changed) return;  // 304 Not Modified: nothing to redraw
+        dashboardData = data;
         
+        const kpis = data.kpis;
         document.getElementById('onTrackPct').textContent = kpis.projects_on_track + '%';
         document.getElementById('avgDelay').textContent = kpis.avg_delay_percentage + '%';
         document.getElementById('highRiskCount').textContent = kpis.high_risk_count;
         document.getElementById('avgCompletion').textContent = kpis.avg_completion + '%';
         
-        // Load projects
-        const projectsResponse = await fetch('/api/projects');
-        projectsData = await projectsResponse.json();
-        
-        // Update charts
-        updateCharts();
-        
-        // Update projects table
+        recentProjects = data.recent_projects;
         updateProjectsTable();
+        updateCharts();
+        updateOverdueTable();
         
     } catch (error) {
         console.error('Error loading dashboard:', error);
     }
 }
 
+function completionColor(comp) {
+    if (comp >= 80) return '#198754';
+    if (comp >= 50) return '#ffc107';
+    return '#dc3545';
+}
+
 function updateCharts() {
     // Status distribution chart
-    const statusCounts = {};
-    projectsData.forEach(p => {
-        const status = p.status || 'NOT_STARTED';
-        statusCounts[status] = (statusCounts[status] || 0) + 1;
-    });
-    
+    const statuses = dashboardData.status_distribution;
     const statusData = [{
-        values: Object.values(statusCounts),
-        labels: Object.keys(statusCounts).map(s => s.replace('_', ' ')),
+        values: statuses.map(s => s.count),
+        labels: statuses.map(s => s.status),
         type: 'pie',
         marker: {
             colors: ['#6c757d', '#0d6efd', '#ffc107', '#198754', '#dc3545']
@@ -49,38 +50,81 @@ function updateCharts() {
         height: 300
     });
     
-    // Completion trends chart
+    // Average completion per owner
+    const owners = dashboardData.completion_by_owner;
     const completionData = [{
-        x: projectsData.map(p => p.name),
-        y: projectsData.map(p => p.completion_percentage || 0),
+        x: owners.map(o => o.owner),
+        y: owners.map(o => o.avg_completion),
+        text: owners.map(o => `${o.projects} project${o.projects === 1 ? '' : 's'}`),
         type: 'bar',
         marker: {
-            color: projectsData.map(p => {
-                const comp = p.completion_percentage || 0;
-                if (comp >= 80) return '#198754';
-                if (comp >= 50) return '#ffc107';
-                return '#dc3545';
-            })
+            color: owners.map(o => completionColor(o.avg_completion))
         }
     }];
     
     Plotly.newPlot('completionChart', completionData, {
-        title: 'Project Completion Percentage',
-        xaxis: { title: 'Projects' },
-        yaxis: { title: 'Completion %' },
+        title: 'Average Completion by Owner',
+        xaxis: { title: 'Owner' },
+        yaxis: { title: 'Completion %', range: [0, 100] },
         height: 300
     });
+    
+    // Risk severity, open vs. closed
+    const severities = dashboardData.risk_severity;
+    const riskData = [
+        {
+            x: severities.map(s => s.severity),
+            y: severities.map(s => s.open),
+            name: 'Open',
+            type: 'bar',
+            marker: { color: ['#dc3545', '#ffc107', '#198754'] }
+        },
+        {
+            x: severities.map(s => s.severity),
+            y: severities.map(s => s.count - s.open),
+            name: 'Closed',
+            type: 'bar',
+            marker: { color: '#adb5bd' }
+        }
+    ];
+    
+    Plotly.newPlot('riskChart', riskData, {
+        title: 'Risks by Severity',
+        barmode: 'stack',
+        yaxis: { title: 'Risks' },
+        height: 300
+    });
+}
+
+function updateOverdueTable() {
+    const overdue = dashboardData.overdue;
+    const tbody = document.getElementById('overdueTable');
+    document.getElementById('overdueTotal').textContent = overdue.total;
+    
+    if (overdue.projects.length === 0) {
+        tbody.innerHTML = '<tr><td colspan="4" class="text-center">No overdue projects</td></tr>';
+        return;
+    }
+    
+    tbody.innerHTML = overdue.projects.map(project => `
+        <tr>
+            <td><strong>${project.name}</strong></td>
+            <td>${project.owner}</td>
+            <td>${Math.round(project.completion_percentage || 0)}%</td>
+            <td class="text-danger">${project.days_overdue}</td>
+        </tr>
+    `).join('');
 }
 
 function updateProjectsTable() {
     const tbody = document.getElementById('projectsTable');
     
-    if (projectsData.length === 0) {
+    if (recentProjects.length === 0) {
         tbody.innerHTML = '<tr><td colspan="6" class="text-center">No projects found. <a href="/projects">Add a project</a></td></tr>';
         return;
     }
     
-    tbody.innerHTML = projectsData.slice(0, 10).map(project => {
+    tbody.innerHTML = recentProjects.map(project => {
         const deadline = new Date(project.deadline);
         const isOverdue = deadline < new Date() && project.status !== 'COMPLETED';
         const deadlineClass = isOverdue ? 'text-danger' : '';
@@ -110,8 +154,41 @@ function exportToCSV() {
     window.location.href = '/api/export/csv';
 }
 
-// Auto-refresh every 30 seconds
-setInterval(loadDashboard, 30000);
+// Live updates: writes are pushed over /api/events. Recent projects update in place;
+// the aggregates are re-fetched once per burst of changes (usually a cheap 304 if
+// nothing visible moved). The delay also outlasts the server's DATA_VERSION_TTL.
+const DASHBOARD_REFRESH_DELAY = 1500;
+let dashboardRefreshTimer = null;
+
+function scheduleDashboardRefresh() {
+    if (dashboardRefreshTimer) return;
+    dashboardRefreshTimer = setTimeout(() => {
+        dashboardRefreshTimer = null;
+        loadDashboard();
+    }, DASHBOARD_REFRESH_DELAY);
+}
+
+function applyProjectChange(change) {
+    if (change.op === 'created' || change.op === 'updated') {
+        // Writes bump updated_at, so the changed project is now the most recent
+        recentProjects = [change.data].concat(recentProjects.filter(p => p.id !== change.id)).slice(0, 10);
+        updateProjectsTable();
+    } else if (change.op === 'deleted') {
+        recentProjects = recentProjects.filter(p => p.id !== change.id);
+        updateProjectsTable();
+    }
+    scheduleDashboardRefresh();
+}
+
+const changeEvents = subscribeToChanges({
+    projects: applyProjectChange,
+    milestones: scheduleDashboardRefresh,
+    risks: scheduleDashboardRefresh,
+    resync: scheduleDashboardRefresh
+});
+
+// Average delay and days overdue move with the clock, not only with writes
+setInterval(loadDashboard, changeEvents ? 300000 : 30000);
 
 // Initial load
 loadDashboard();
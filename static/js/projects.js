@@ -2,24 +2,128 @@ let projects = [];
 let currentProjectId = null;
 let milestones = [];
 let risks = [];
+let projectsCursor = null;
+let projectsLoading = false;
+let projectsLoadId = 0;
+
+const PROJECTS_PAGE_SIZE = 24;
 
 // Load projects on page load
 document.addEventListener('DOMContentLoaded', function() {
     loadProjects();
+    
+    // Fetch the next page when the sentinel below the grid scrolls into view
+    const sentinel = document.getElementById('projectsSentinel');
+    if (sentinel && 'IntersectionObserver' in window) {
+        new IntersectionObserver(entries => {
+            if (entries.some(entry => entry.isIntersecting)) {
+                loadMoreProjects();
+            }
+        }, { rootMargin: '200px' }).observe(sentinel);
+    }
 });
 
+// Live updates pushed over /api/events; the reloads after this page's own writes
+// are only needed when the browser cannot subscribe
+const changeEvents = subscribeToChanges({
+    projects: applyProjectChange,
+    milestones: change => {
+        milestones = applyDetailChange(milestones, change, loadMilestones);
+        renderMilestones();
+    },
+    risks: change => {
+        risks = applyDetailChange(risks, change, loadRisks);
+        renderRisks();
+    },
+    resync: () => {
+        loadProjects();
+        if (currentProjectId !== null) {
+            loadMilestones(currentProjectId);
+            loadRisks(currentProjectId);
+        }
+    }
+});
+
+// Replace, add or remove the changed item in a list ordered by id
+function mergeChange(items, change) {
+    if (change.op === 'deleted') {
+        return items.filter(item => item.id !== change.id);
+    }
+    if (items.some(item => item.id === change.id)) {
+        return items.map(item => item.id === change.id ? change.data : item);
+    }
+    return items.concat([change.data]);
+}
+
+function applyProjectChange(change) {
+    if (change.op === 'bulk') {
+        loadProjects();
+        return;
+    }
+    // Projects beyond the loaded pages arrive with a later page
+    if (change.op !== 'deleted' && projectsCursor && !projects.some(p => p.id === change.id)) return;
+    projects = mergeChange(projects, change);
+    renderProjects();
+}
+
+// Milestones and risks are only shown for the project open in the detail modal
+function applyDetailChange(items, change, reload) {
+    if (currentProjectId === null) return items;
+    if (change.op === 'bulk') {
+        reload(currentProjectId);
+        return items;
+    }
+    return change.project_id === currentProjectId ? mergeChange(items, change) : items;
+}
+
+async function fetchProjectsPage(cursor) {
+    const url = `/api/projects?limit=${PROJECTS_PAGE_SIZE}` + (cursor ? `&cursor=${encodeURIComponent(cursor)}` : '');
+    return (await fetchJSON(url)).data;
+}
+
 async function loadProjects() {
+    const loadId = ++projectsLoadId;
+    projectsLoading = true;
     try {
-        const response = await fetch('/api/projects');
-        projects = await response.json();
+        const page = await fetchProjectsPage(null);
+        if (loadId !== projectsLoadId) return;
+        projects = page.projects;
+        projectsCursor = page.next_cursor;
         renderProjects();
     } catch (error) {
         console.error('Error loading projects:', error);
+    } finally {
+        if (loadId === projectsLoadId) projectsLoading = false;
+    }
+}
+
+async function loadMoreProjects() {
+    if (projectsLoading || !projectsCursor) return;
+    const loadId = projectsLoadId;
+    projectsLoading = true;
+    try {
+        const page = await fetchProjectsPage(projectsCursor);
+        if (loadId !== projectsLoadId) return;  // The list was reloaded meanwhile
+        projects = projects.concat(page.projects);
+        projectsCursor = page.next_cursor;
+        renderProjects();
+    } catch (error) {
+        console.error('Error loading projects:', error);
+    } finally {
+        if (loadId === projectsLoadId) projectsLoading = false;
+    }
+}
+
+function updateLoadMoreButton() {
+    const button = document.getElementById('loadMoreProjects');
+    if (button) {
+        button.classList.toggle('d-none', !projectsCursor);
     }
 }
 
 function renderProjects() {
     const container = document.getElementById('projectsContainer');
+    updateLoadMoreButton();
     
     if (projects.length === 0) {
         container.innerHTML = `
@@ -142,7 +246,7 @@ async function saveProject() {
         if (response.ok) {
             const modal = bootstrap.Modal.getInstance(document.getElementById('projectModal'));
             modal.hide();
-            loadProjects();
+            if (!changeEvents) loadProjects();
         } else {
             alert('Error saving project');
         }
@@ -168,8 +272,7 @@ async function viewProject(projectId) {
 
 async function loadMilestones(projectId) {
     try {
-        const response = await fetch(`/api/milestones?project_id=${projectId}`);
-        milestones = await response.json();
+        milestones = (await fetchJSON(`/api/milestones?project_id=${projectId}`)).data;
         renderMilestones();
     } catch (error) {
         console.error('Error loading milestones:', error);
@@ -220,8 +323,7 @@ function renderMilestones() {
 
 async function loadRisks(projectId) {
     try {
-        const response = await fetch(`/api/risks?project_id=${projectId}`);
-        risks = await response.json();
+        risks = (await fetchJSON(`/api/risks?project_id=${projectId}`)).data;
         renderRisks();
     } catch (error) {
         console.error('Error loading risks:', error);
@@ -321,7 +423,7 @@ async function saveMilestone() {
             const modal = bootstrap.Modal.getInstance(document.getElementById('milestoneModal'));
             modal.hide();
             await loadMilestones(currentProjectId);
-            loadProjects(); // Refresh to update completion %
+            if (!changeEvents) loadProjects(); // Otherwise the completion change arrives as an event
         } else {
             alert('Error saving milestone');
         }
@@ -342,7 +444,7 @@ async function deleteMilestone(milestoneId) {
         const response = await fetch(`/api/milestones/${milestoneId}`, { method: 'DELETE' });
         if (response.ok) {
             await loadMilestones(currentProjectId);
-            loadProjects(); // Refresh to update completion %
+            if (!changeEvents) loadProjects(); // Otherwise the completion change arrives as an event
         }
     } catch (error) {
         console.error('Error deleting milestone:', error);
@@ -435,13 +537,48 @@ async function generateSummary() {
     summaryDiv.innerHTML = '<div class="spinner-border" role="status"><span class="visually-hidden">Generating...</span></div>';
     
     try {
-        const response = await fetch(`/api/ai/summarize/${currentProjectId}`, { method: 'POST' });
-        const data = await response.json();
-        
+        const data = await requestSummary(currentProjectId);
         summaryDiv.innerHTML = `<pre class="mb-0">${data.summary}</pre>`;
     } catch (error) {
         console.error('Error generating summary:', error);
-        summaryDiv.innerHTML = '<p class="text-danger">Error generating summary</p>';
+        const message = document.createElement('p');
+        message.className = 'text-danger';
+        message.textContent = `Error generating summary: ${error.message}`;
+        summaryDiv.replaceChildren(message);
+    }
+}
+
+// Queue a summary job on the worker pool and poll until it finishes;
+// fall back to the synchronous endpoint only when workers are disabled
+async function requestSummary(projectId, retries = 3) {
+    const response = await fetch('/api/ai/jobs', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ project_id: projectId })
+    });
+    if (response.status === 501 || response.status === 404) {
+        const fallback = await fetch(`/api/ai/summarize/${projectId}`, { method: 'POST' });
+        const data = await fallback.json();
+        if (!fallback.ok) throw new Error(data.error || 'Summary request failed');
+        return data;
+    }
+    if (response.status === 503 && retries > 0) {
+        // Job queue is full; try again once the server says it may have room
+        const delay = parseInt(response.headers.get('Retry-After') || '5', 10) * 1000;
+        await new Promise(resolve => setTimeout(resolve, delay));
+        return requestSummary(projectId, retries - 1);
+    }
+    if (response.status !== 202) {
+        const data = await response.json();
+        throw new Error(data.error || 'Summary request failed');
+    }
+    
+    const { job_id } = await response.json();
+    while (true) {
+        await new Promise(resolve => setTimeout(resolve, 1000));
+        const job = await (await fetch(`/api/ai/jobs/${job_id}`)).json();
+        if (job.status === 'done') return job;
+        if (job.status === 'failed' || job.error) throw new Error(job.error || 'Summary job failed');
     }
 }
 
@@ -457,7 +594,7 @@ async function deleteProject(projectId) {
     try {
         const response = await fetch(`/api/projects/${projectId}`, { method: 'DELETE' });
         if (response.ok) {
-            loadProjects();
+            if (!changeEvents) loadProjects();
         } else {
             alert('Error deleting project');
         }
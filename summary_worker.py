@@ -0,0 +1,235 @@
+"""
+Summarization Worker Pool for Project Tracker
+Runs model inference in separate processes so summaries never block Flask threads
+
+Settings (environment variables):
+    AI_WORKERS            Worker processes, each owning one model instance (default: 1)
+    AI_MAX_PENDING_JOBS   Queued plus running jobs accepted before new ones are refused (default: 100)
+    AI_JOB_TTL            Seconds a finished job's result stays available for polling (default: 600)
+    AI_SYNC_TIMEOUT       Seconds a synchronous summary request waits for its job (default: 120)
+"""
+
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+
+WORKERS = int(os.environ.get('AI_WORKERS', 1))
+MAX_PENDING_JOBS = int(os.environ.get('AI_MAX_PENDING_JOBS', 100))
+JOB_TTL = int(os.environ.get('AI_JOB_TTL', 600))
+SYNC_TIMEOUT = int(os.environ.get('AI_SYNC_TIMEOUT', 120))
+
+# Set inside each worker process by _init_worker
+_worker_summarizer = None
+
+
+class QueueFullError(Exception):
+    """Raised when the worker pool already has MAX_PENDING_JOBS unfinished jobs"""
+
+
+def _init_worker():
+    """Load the model once per worker process, before it accepts jobs"""
+    global _worker_summarizer
+    from ai_summarizer import ProjectSummarizer
+
+    _worker_summarizer = ProjectSummarizer()
+    _worker_summarizer.load()
+
+
+def _summarize(project_data, milestones_data, risks_data):
+    summary = _worker_summarizer.generate_summary(project_data, milestones_data, risks_data)
+    return {'summary': summary.strip(), 'model_ready': _worker_summarizer.initialized}
+
+
+def _summarize_batch(batch, batch_size):
+    report = _worker_summarizer.generate_summaries(batch, batch_size=batch_size)
+    report['model_ready'] = _worker_summarizer.initialized
+    return report
+
+
+def _model_status():
+    return _worker_summarizer.status()
+
+
+class SummaryWorkerPool:
+    """Process pool owning the model, with a job registry for submit-then-poll access"""
+
+    def __init__(self, workers=WORKERS, max_pending=MAX_PENDING_JOBS, job_ttl=JOB_TTL):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.job_ttl = job_ttl
+        self._executor = None
+        self._probe = None
+        self._jobs = {}
+        # Reentrant: a done-callback can run inside submit() when its future already failed
+        self._lock = threading.RLock()
+
+    @property
+    def enabled(self):
+        return self.workers > 0
+
+    def start(self):
+        """Spawn the worker processes (they load the model in the background)"""
+        with self._lock:
+            self._ensure_executor()
+
+    def _ensure_executor(self):
+        if self._executor is None:
+            # spawn: never fork a multi-threaded Flask process
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+            )
+            # Finishes once a worker has loaded the model; backs model_status()
+            self._probe = self._watch(self._executor.submit(_model_status))
+        return self._executor
+
+    def _watch(self, future):
+        """Replace the pool as soon as one of its futures reports a dead worker"""
+        executor = self._executor
+
+        def check(done):
+            if not done.cancelled() and isinstance(done.exception(), BrokenProcessPool):
+                self._discard(executor)
+
+        future.add_done_callback(check)
+        return future
+
+    def _discard(self, executor):
+        """Shut down a broken executor; the next submit() starts a fresh one"""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        # Fails the jobs still queued on it instead of leaving them pending
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def model_status(self):
+        """Readiness of the workers' model for the /api/ai/status endpoint"""
+        with self._lock:
+            probe = self._probe
+        status = {'available': None, 'ready': False, 'loading': False, 'model': None, 'backend': None,
+                  'error': None, 'workers': self.workers}
+        if probe is None:
+            return status
+        if not probe.done():
+            status['loading'] = True
+        elif probe.exception() is not None:
+            status['error'] = str(probe.exception())
+        else:
+            status.update(probe.result())
+        return status
+
+    def submit(self, project_data, milestones_data, risks_data):
+        """
+        Queue a summary job
+
+        Returns:
+            Job id to poll with status()
+
+        Raises:
+            QueueFullError: when too many jobs are already queued or running
+        """
+        return self._submit(project_data.get('id'), _summarize, project_data, milestones_data, risks_data)
+
+    def _submit(self, project_id, fn, *args):
+        with self._lock:
+            self._prune()
+            pending = sum(1 for job in self._jobs.values() if not job['future'].done())
+            if pending >= self.max_pending:
+                raise QueueFullError(f"{pending} summary jobs are already pending")
+
+            try:
+                future = self._ensure_executor().submit(fn, *args)
+            except BrokenProcessPool:
+                # A worker died (e.g. out of memory); replace the pool and retry once
+                self._discard(self._executor)
+                future = self._ensure_executor().submit(fn, *args)
+            self._watch(future)
+
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {
+                'future': future,
+                'project_id': project_id,
+                'created_at': time.time(),
+                'finished_at': None,
+            }
+            return job_id
+
+    def _wait(self, job_id, timeout):
+        with self._lock:
+            future = self._jobs[job_id]['future']
+        return future.result(timeout=timeout)
+
+    def run(self, project_data, milestones_data, risks_data, timeout=SYNC_TIMEOUT):
+        """
+        Queue a summary job and wait for its result
+
+        Returns:
+            Dictionary with 'summary' and 'model_ready'
+
+        Raises:
+            QueueFullError: when too many jobs are already queued or running
+            TimeoutError: when the job has not finished after `timeout` seconds
+        """
+        return self._wait(self.submit(project_data, milestones_data, risks_data), timeout)
+
+    def run_batch(self, batch, batch_size=8, timeout=SYNC_TIMEOUT):
+        """
+        Summarize many projects as one job with the worker's batched pipeline and wait for it
+
+        Returns:
+            The ProjectSummarizer.generate_summaries() report plus 'model_ready'
+
+        Raises:
+            QueueFullError: when too many jobs are already queued or running
+            TimeoutError: when the job has not finished after `timeout` seconds
+        """
+        return self._wait(self._submit(None, _summarize_batch, list(batch), batch_size), timeout)
+
+    def status(self, job_id):
+        """Current state of a job, or None if it is unknown or expired"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            return None
+
+        future = job['future']
+        result = {'job_id': job_id, 'project_id': job['project_id']}
+        if not future.done():
+            result['status'] = 'running' if future.running() else 'queued'
+            return result
+
+        if job['finished_at'] is None:
+            job['finished_at'] = time.time()
+        error = CancelledError('The worker pool was shut down') if future.cancelled() else future.exception()
+        if error is not None:
+            result['status'] = 'failed'
+            result['error'] = str(error)
+        else:
+            result['status'] = 'done'
+            result.update(future.result())
+        return result
+
+    def _prune(self):
+        """Forget finished jobs older than the TTL (caller holds the lock)"""
+        now = time.time()
+        for job_id, job in list(self._jobs.items()):
+            if job['future'].done():
+                finished_at = job['finished_at'] or now
+                job['finished_at'] = finished_at
+                if now - finished_at > self.job_ttl:
+                    del self._jobs[job_id]
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+# Global instance used by the Flask app
+worker_pool = SummaryWorkerPool()
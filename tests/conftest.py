@@ -0,0 +1,34 @@
+"""
+Shared test fixtures
+Every test runs against throwaway SQLite databases, never projecttracker.db
+"""
+
+import os
+import sys
+import tempfile
+
+# Must be set before db.py builds the shared engine and app.py warms up the model
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'projecttracker.db')}"
+os.environ['AI_WARMUP'] = 'false'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+from db import build_engine
+from migrate import upgrade
+from kpi_engine import track_kpi_snapshot
+from data_version import track_data_version
+from events import track_change_events
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    """Session factory for a freshly migrated database with the app's session hooks"""
+    engine = build_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    upgrade(engine)
+    factory = sessionmaker(bind=engine)
+    track_kpi_snapshot(factory)
+    track_data_version(factory)
+    track_change_events(factory)
+    yield factory
+    engine.dispose()
@@ -0,0 +1,26 @@
+import pytest
+
+import app as app_module
+from kpi import CHARTS
+
+
+@pytest.mark.parametrize('fmt', ['png', 'svg'])
+@pytest.mark.parametrize('filename', sorted(CHARTS))
+def test_chart_on_empty_database(filename, fmt):
+    name = filename.rsplit('.', 1)[0]
+    response = app_module.app.test_client().get(f'/api/charts/{name}.{fmt}')
+    assert response.status_code == 404
+    assert response.get_json() == {'error': 'No data for this chart yet'}
+
+
+def test_chart_renderer_error_is_not_a_server_error(monkeypatch):
+    from chart_cache import chart_cache
+
+    def broken(tables):
+        raise ValueError('cannot draw')
+
+    chart_cache.clear()
+    monkeypatch.setitem(CHARTS, 'status_distribution.png', (broken, {'projects': ['Status']}))
+    response = app_module.app.test_client().get('/api/charts/status_distribution.png')
+    assert response.status_code == 404
+    chart_cache.clear()
@@ -0,0 +1,29 @@
+from datetime import datetime
+
+from sqlalchemy import delete
+
+from data_version import GLOBAL, TRACKED_TABLES, _insert_or_bump, bump_data_version, read_data_versions
+from models import DataVersion
+
+
+def test_migrations_seed_every_counter(session_factory):
+    with session_factory() as session:
+        rows = session.query(DataVersion).all()
+        assert {row.name: row.version for row in rows} == dict.fromkeys((GLOBAL,) + TRACKED_TABLES, 0)
+
+        bump_data_version(session, ['risks'])
+        session.commit()
+        assert read_data_versions(session) == {GLOBAL: 1, 'projects': 0, 'milestones': 0, 'risks': 1}
+
+
+def test_first_write_racing_another_insert_bumps_instead_of_failing(session_factory):
+    now = datetime.utcnow()
+    with session_factory() as session:
+        session.execute(delete(DataVersion))
+        connection = session.connection()
+        row = {'name': GLOBAL, 'version': 1, 'updated_at': now}
+        # The second INSERT is what a concurrent first write would issue for the same row
+        connection.execute(_insert_or_bump(connection.dialect.name, now), [row])
+        connection.execute(_insert_or_bump(connection.dialect.name, now), [row])
+        session.commit()
+        assert read_data_versions(session)[GLOBAL] == 2
@@ -0,0 +1,72 @@
+import threading
+from datetime import datetime, timedelta
+
+import kpi_engine
+from kpi_engine import rebuild_snapshot, verify_snapshot
+from models import Project, Risk, KpiSnapshot, ProjectStatus, RiskSeverity
+
+
+def test_concurrent_writers_roll_snapshot_forward_once(session_factory, monkeypatch):
+    now = datetime.utcnow()
+    with session_factory() as session:
+        project = Project(name='Crossed', owner='A', status=ProjectStatus.IN_PROGRESS,
+                          start_date=now - timedelta(days=30), deadline=now - timedelta(hours=1))
+        session.add(project)
+        session.flush()
+        project_id = project.id
+        # Snapshot taken before the deadline passed; the next writes must roll it forward
+        rebuild_snapshot(session, now - timedelta(hours=2))
+        session.commit()
+
+    # Both writers read as_of before either of them writes
+    barrier = threading.Barrier(2, timeout=10)
+    calls = []
+    crossed_deltas = kpi_engine._crossed_deltas
+
+    def racing_crossed_deltas(connection, since, until):
+        calls.append(since)
+        if len(calls) <= 2:
+            barrier.wait()
+        return crossed_deltas(connection, since, until)
+
+    monkeypatch.setattr(kpi_engine, '_crossed_deltas', racing_crossed_deltas)
+
+    errors = []
+
+    def add_risk(name):
+        try:
+            with session_factory() as session:
+                session.add(Risk(project_id=project_id, name=name, severity=RiskSeverity.HIGH, status='Open'))
+                session.commit()
+        except Exception as e:
+            errors.append(e)
+
+    writers = [threading.Thread(target=add_risk, args=(f'Risk {i}',)) for i in range(2)]
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join()
+
+    assert errors == []
+    with session_factory() as session:
+        snapshot = session.get(KpiSnapshot, kpi_engine.SNAPSHOT_ID)
+        assert snapshot.overdue_projects == 1
+        assert snapshot.high_risk_count == 2
+        assert verify_snapshot(session) == {}
+
+
+def test_served_kpis_match_compute_kpis_in_whole_days(session_factory):
+    now = datetime.utcnow()
+    with session_factory() as session:
+        # 2.5 days late on a 7.5 day plan: whole days give 2 / 7, not 2.5 / 7.5
+        session.add(Project(name='Late', owner='A', status=ProjectStatus.IN_PROGRESS,
+                            start_date=now - timedelta(days=10), deadline=now - timedelta(days=2, hours=12)))
+        session.add(Project(name='Future', owner='B', status=ProjectStatus.NOT_STARTED,
+                            start_date=now, deadline=now + timedelta(days=30)))
+        session.commit()
+
+        served = kpi_engine.read_kpis(session, now)
+        session.commit()
+        assert served == kpi_engine.compute_kpis(session, now)
+        assert served['avg_delay_percentage'] == round(2 / 7 * 100, 2)
+        assert verify_snapshot(session, now) == {}
@@ -0,0 +1,32 @@
+import os
+import subprocess
+import sys
+
+from sqlalchemy import create_engine, func, select
+
+from migrate import MIGRATIONS, schema_migrations
+
+UPGRADE = 'from db import engine; from migrate import upgrade; upgrade(engine)'
+
+
+def test_concurrent_upgrades_of_a_fresh_database(tmp_path):
+    url = f"sqlite:///{tmp_path / 'fresh.db'}"
+    env = dict(os.environ, DATABASE_URL=url, AI_WARMUP='false')
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    processes = [
+        subprocess.Popen([sys.executable, '-c', UPGRADE], cwd=root, env=env,
+                         stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        for _ in range(4)
+    ]
+    results = [process.communicate(timeout=120) for process in processes]
+
+    assert [process.returncode for process in processes] == [0] * 4, [err for _, err in results]
+    # Each migration ran exactly once across the processes
+    assert sum(out.count('Applying ') for out, _ in results) == len(MIGRATIONS)
+    engine = create_engine(url)
+    with engine.connect() as connection:
+        rows = connection.execute(
+            select(schema_migrations.c.version, func.count()).group_by(schema_migrations.c.version)
+        ).all()
+    engine.dispose()
+    assert dict(rows) == {version: 1 for version, _ in MIGRATIONS}
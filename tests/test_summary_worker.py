@@ -0,0 +1,72 @@
+import time
+
+import pytest
+
+import app as app_module
+from summary_worker import SummaryWorkerPool
+
+
+@pytest.fixture
+def pool():
+    pool = SummaryWorkerPool(workers=1, max_pending=10)
+    yield pool
+    pool.shutdown()
+
+
+def wait_for(predicate, timeout=60):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.1)
+
+
+def test_model_status_reports_the_workers_model(pool):
+    assert pool.model_status()['loading'] is False
+    assert pool.model_status()['model'] is None
+
+    pool.start()
+    wait_for(lambda: not pool.model_status()['loading'])
+    status = pool.model_status()
+    assert status['model'] is not None
+    assert status['workers'] == 1
+
+
+def test_run_batch_summarizes_in_a_worker(pool):
+    batch = [({'id': project_id, 'name': f'P{project_id}'}, [], []) for project_id in (1, 2)]
+    report = pool.run_batch(batch, batch_size=2, timeout=60)
+    assert [result['project_id'] for result in report['results']] == [1, 2]
+    assert 'model_ready' in report
+
+
+def test_bulk_and_status_endpoints_use_the_pool(monkeypatch):
+    calls = []
+    monkeypatch.setattr(app_module.worker_pool, 'workers', 1)
+    monkeypatch.setattr(app_module.worker_pool, 'run_batch',
+                        lambda batch, batch_size=8: calls.append(batch) or {'results': [], 'model_ready': True})
+    monkeypatch.setattr(app_module.worker_pool, 'model_status', lambda: {'ready': True, 'loading': False})
+    client = app_module.app.test_client()
+
+    response = client.post('/api/ai/summarize', json={})
+    assert response.status_code == 200
+    assert calls == [[]]
+    assert client.get('/api/ai/status').get_json() == {'ready': True, 'loading': False}
+
+
+def test_pool_recovers_after_a_worker_dies(pool):
+    pool.start()
+    wait_for(lambda: not pool.model_status()['loading'])
+    broken = pool._executor
+    job_id = pool._submit(None, time.sleep, 30)
+    wait_for(lambda: pool.status(job_id)['status'] == 'running')
+
+    for process in list(broken._processes.values()):
+        process.kill()
+
+    wait_for(lambda: pool.status(job_id)['status'] == 'failed')
+    assert 'terminated abruptly' in pool.status(job_id)['error']
+    # The broken executor was shut down and dropped before the next submit
+    wait_for(lambda: pool._executor is not broken)
+
+    report = pool.run({'id': 7, 'name': 'After crash'}, [], [], timeout=60)
+    assert report['summary']
+    assert pool._executor is not broken